@@ -0,0 +1,17 @@
+"""
+Variáveis de ambiente mínimas para importar os routers fora do Azure.
+Nenhuma conexão é aberta: os clientes (Mongo/OpenAI) conectam sob demanda.
+"""
+import os
+
+DEFAULTS = {
+    "MONGODB_URI": "mongodb://localhost:27017",
+    "OPENAI_ENDPOINT": "http://localhost:9",
+    "OPENAI_API_KEY": "bench",
+    "OPENAI_DEPLOYMENT": "bench",
+}
+
+
+def setup_bench_env() -> None:
+    for key, value in DEFAULTS.items():
+        os.environ.setdefault(key, value)
@@ -0,0 +1,174 @@
+"""
+Custo x ganho da compressão de respostas (core/compression.py).
+
+Serializa uma página da timeline como a API faz (_doc_to_memory_dict +
+orjson) e, para cada codificação/nível, mede:
+
+    compress_ms   tempo de CPU para comprimir o corpo inteiro (melhor de N)
+    bytes, ratio  tamanho comprimido e razão original/comprimido
+    mb_per_s      vazão do compressor
+    stream_ratio  razão no modo streaming (flush a cada --chunk bytes,
+                  como nas StreamingResponse)
+    <link>_ms     compressão + transferência estimada em cada enlace
+
+Os textos variam por memória (frases sorteadas com semente fixa) para
+não inflar a razão com documentos idênticos.
+
+Uso:
+    python -m benchmarks.bench_compression --items 200 1000 --repeat 5
+    python -m benchmarks.bench_compression --items 1000 --links 3g=1600 4g=12000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from benchmarks._env import setup_bench_env
+
+setup_bench_env()
+
+from bson import ObjectId  # noqa: E402
+
+from core.compression import brotli, compress_bytes, make_compressor  # noqa: E402
+from core.serialization import dumps  # noqa: E402
+from routers.memories import _doc_to_memory_dict  # noqa: E402
+
+SENTENCES = [
+    "Uma família reunida ao redor da mesa, sorrindo para a câmera.",
+    "A luz da tarde entra pela janela e ilumina os rostos.",
+    "Crianças brincam na areia enquanto o mar avança devagar.",
+    "Um casal de idosos dança no meio da sala decorada com balões.",
+    "O bolo de aniversário tem velas acesas e cobertura de chocolate.",
+    "Amigos caminham por uma trilha cercada de árvores altas.",
+    "Um cachorro dorme no sofá ao lado de uma manta xadrez.",
+    "A cidade aparece ao fundo, com prédios e um céu alaranjado.",
+    "Pessoas seguram copos e brindam em uma varanda iluminada.",
+    "Uma menina de vestido amarelo segura um buquê de flores.",
+]
+TAGS = ["família", "praia", "aniversário", "viagem", "amigos", "natal", "casamento", "pet"]
+
+CODECS = [("gzip", 1), ("gzip", 5), ("gzip", 9), ("br", 1), ("br", 4), ("br", 6), ("br", 11)]
+
+
+def make_docs(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    user_id = ObjectId()
+    base = datetime.utcnow()
+    docs = []
+    for i in range(n):
+        long_text = " ".join(rng.sample(SENTENCES, 5))
+        docs.append({
+            "_id": ObjectId(),
+            "user_id": user_id,
+            "main_caption": f"{rng.choice(SENTENCES)[:40]} #{i}",
+            "media_url": f"https://example.blob.core.windows.net/memories/{ObjectId()}.jpg",
+            "tags": rng.sample(TAGS, 3),
+            "alt_text": rng.choice(SENTENCES),
+            "short_description": " ".join(rng.sample(SENTENCES, 2)),
+            "long_description": long_text,
+            "created_at": base - timedelta(minutes=i),
+            "relumination_url": None,
+            "relumination_style": None,
+        })
+    return docs
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _stream_size(encoding: str, level: int, body: bytes, chunk: int) -> int:
+    compressor = make_compressor(encoding, level)
+    size = 0
+    for i in range(0, len(body), chunk):
+        size += len(compressor.compress(body[i:i + chunk]))
+    return size + len(compressor.finish())
+
+
+def bench_body(body: bytes, repeat: int, chunk: int, links: Dict[str, float]) -> List[dict]:
+    rows = []
+    identity = {"encoding": "identity", "level": None, "compress_ms": 0.0, "bytes": len(body), "ratio": 1.0}
+    for name, kbps in links.items():
+        identity[f"{name}_ms"] = round(len(body) * 8 / kbps, 1)
+    rows.append(identity)
+
+    for encoding, level in CODECS:
+        if encoding == "br" and brotli is None:
+            continue
+        out = compress_bytes(encoding, body, level)
+        seconds = _best_of(lambda: compress_bytes(encoding, body, level), repeat)
+        row = {
+            "encoding": encoding,
+            "level": level,
+            "compress_ms": round(seconds * 1000, 2),
+            "bytes": len(out),
+            "ratio": round(len(body) / len(out), 2),
+            "mb_per_s": round(len(body) / seconds / 1e6, 1),
+            "stream_ratio": round(len(body) / _stream_size(encoding, level, body, chunk), 2),
+        }
+        for name, kbps in links.items():
+            row[f"{name}_ms"] = round(seconds * 1000 + len(out) * 8 / kbps, 1)
+        rows.append(row)
+    return rows
+
+
+def _parse_links(values: List[str]) -> Dict[str, float]:
+    links = {}
+    for value in values:
+        name, _, kbps = value.partition("=")
+        links[name] = float(kbps)
+    return links
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--chunk", type=int, default=16 * 1024, help="tamanho do chunk no modo streaming")
+    parser.add_argument(
+        "--links",
+        nargs="+",
+        default=["3g=1600", "4g=12000", "wifi=50000"],
+        help="enlaces nome=kbps para estimar o tempo total",
+    )
+    parser.add_argument("--output", help="grava o resultado em JSON neste arquivo")
+    args = parser.parse_args()
+
+    links = _parse_links(args.links)
+    if brotli is None:
+        print("brotli não instalado: medindo só gzip", flush=True)
+
+    results = []
+    for n in args.items:
+        body = dumps([_doc_to_memory_dict(d) for d in make_docs(n)])
+        rows = bench_body(body, args.repeat, args.chunk, links)
+        results.append({"items": n, "raw_bytes": len(body), "codecs": rows})
+
+        print(f"\n{n} itens ({len(body) / 1024:.0f} KiB)")
+        header = ["codec", "ms", "KiB", "ratio", "stream"] + [f"{k} ms" for k in links]
+        print("".join(f"{h:>10}" for h in header))
+        for row in rows:
+            codec = row["encoding"] if row["level"] is None else f"{row['encoding']}-{row['level']}"
+            cells = [
+                codec,
+                row["compress_ms"],
+                round(row["bytes"] / 1024, 1),
+                row["ratio"],
+                row.get("stream_ratio", "-"),
+            ] + [row[f"{k}_ms"] for k in links]
+            print("".join(f"{c:>10}" for c in cells))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Tempo de import do app (boot de cada worker do gunicorn).
+
+Roda `python -X importtime -c "import main"` em um processo limpo, soma o
+tempo por pacote de topo e lista os módulos mais caros (cumulativo).
+Falha (código 1) se o total passar do orçamento ou se algum módulo que
+deveria ser carregado sob demanda (moviepy, openai) aparecer no boot.
+
+Uso:
+    python -m benchmarks.bench_import_time --budget-ms 1500
+    python -m benchmarks.bench_import_time --module main --top 30
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from benchmarks._env import DEFAULTS
+
+LAZY_MODULES = ("moviepy", "openai")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """
+    Linhas "import time: self | cumulative | módulo" -> (módulo, self_us, cum_us).
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        rows.append((name.rstrip(), int(self_us), int(cum_us)))
+    return rows
+
+
+def measure(module: str) -> List[Tuple[str, int, int]]:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**DEFAULTS, **os.environ, "PYTHONPATH": root}
+    # main monta uploads/ e media/ relativos ao cwd: usa um diretório limpo
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "uploads"))
+        os.makedirs(os.path.join(tmp, "media"))
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=tmp,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr.strip().splitlines()[-1])
+    return parse_importtime(proc.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=3, help="usa a mediana do total")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    runs.sort(key=lambda rows: sum(r[1] for r in rows))
+    rows = runs[len(runs) // 2]
+
+    total_ms = sum(r[1] for r in rows) / 1000
+    by_package: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in rows:
+        by_package[name.strip().split(".")[0]] += self_us
+
+    loaded = {name.strip() for name, _, _ in rows}
+    eager = sorted(
+        m for m in LAZY_MODULES if any(n == m or n.startswith(m + ".") for n in loaded)
+    )
+
+    report = {
+        "module": args.module,
+        "total_ms": round(total_ms, 1),
+        "budget_ms": args.budget_ms,
+        "modules_imported": len(rows),
+        "top_packages_ms": {
+            pkg: round(us / 1000, 1)
+            for pkg, us in sorted(by_package.items(), key=lambda kv: -kv[1])[: args.top]
+        },
+        "top_modules_cumulative_ms": [
+            {"module": name.strip(), "ms": round(cum / 1000, 1)}
+            for name, _, cum in sorted(rows, key=lambda r: -r[2])[: args.top]
+        ],
+        "eager_lazy_modules": eager,
+    }
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import de {args.module}: {total_ms:.0f} ms > orçamento {args.budget_ms:.0f} ms")
+    if eager:
+        failures.append(f"módulos que deveriam ser sob demanda carregados no boot: {', '.join(eager)}")
+    if failures:
+        print("FALHA:\n" + "\n".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Micro-benchmark do render de Reluminação (core/reluminations.py) isolado.
+
+Para cada combinação de resolução de entrada (MP), tamanho de legenda,
+FPS, duração e preset do x264, gera uma imagem sintética e roda
+generate_relumination_style1 em um subprocesso próprio (pico de RSS
+isolado). Mede:
+
+    decode_ms          leitura + redimensionamento + crop da imagem
+    text_ms            legenda renderizada com Pillow
+    composite_frame_ms média de CompositeVideoClip.get_frame (amostra)
+    encode_ms          write_videofile (composição de todos os frames + x264)
+    package_ms         ladder HLS (só com --hls)
+    total_ms, peak_rss_mb, output_bytes
+
+Uso:
+    python -m benchmarks.bench_relumination --megapixels 1 12 48 --output rel.json
+    python -m benchmarks.bench_relumination --baseline rel.json --tolerance 0.25
+    python -m benchmarks.bench_relumination --megapixels 12 --hls
+
+Com --baseline, sai com código 1 se total_ms ou peak_rss_mb de algum caso
+piorar mais que a tolerância (fração).
+"""
+import argparse
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+CAPTIONS = {
+    "short": "Aniversário da vó.",
+    "medium": (
+        "Toda a família reunida no quintal para comemorar os 80 anos da vó, "
+        "com bolo de fubá e muita música."
+    ),
+    "long": (
+        "Toda a família reunida no quintal para comemorar os 80 anos da vó. "
+        "Teve bolo de fubá, café passado na hora, os primos tocando violão e "
+        "as crianças correndo atrás do cachorro. No fim da tarde, a luz dourada "
+        "atravessou as árvores e todo mundo parou para a foto que ficou na sala."
+    ),
+}
+
+COMPOSITE_SAMPLE_FRAMES = 8
+
+
+def _case_key(case: Dict[str, Any]) -> str:
+    key = (
+        f"{case['megapixels']}mp-{case['caption']}-"
+        f"{case['fps']}fps-{case['duration']}s-{case['preset']}"
+    )
+    return f"{key}-hls" if case.get("hls") else key
+
+
+def _synthetic_image(path: str, megapixels: float) -> None:
+    """
+    JPEG 4:3 com gradiente + ruído (comprime como foto, não como cor chapada).
+    """
+    import numpy as np
+    from PIL import Image
+
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    rng = np.random.default_rng(int(megapixels * 1000))
+
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    for c, (a, b) in enumerate(((1.0, 0.0), (0.0, 1.0), (0.5, 0.5))):
+        channel = a * x + b * y
+        channel += rng.normal(0, 12, size=(height, width)).astype(np.float32)
+        img[..., c] = np.clip(channel, 0, 255)
+    Image.fromarray(img).save(path, format="JPEG", quality=90)
+
+
+# ----------------------------------------------------------------------
+# Worker (um caso por processo)
+# ----------------------------------------------------------------------
+def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        # core.reluminations cria media/reluminations relativo ao cwd
+        os.chdir(tmp)
+        os.makedirs("uploads")
+        _synthetic_image(os.path.join("uploads", "input.jpg"), case["megapixels"])
+
+        from benchmarks._env import setup_bench_env
+
+        setup_bench_env()
+        from moviepy.editor import CompositeVideoClip
+
+        import core.reluminations as rel
+
+        caption = CAPTIONS[case["caption"]]
+
+        # Composição por frame (amostra), fora do encode
+        local_img = os.path.join("uploads", "input.jpg")
+        final = CompositeVideoClip(
+            [
+                rel._build_base_clip(local_img, case["duration"]),
+                rel._build_text_clip(caption, case["duration"]),
+            ],
+            size=(rel.VIDEO_WIDTH, rel.VIDEO_HEIGHT),
+        )
+        step = case["duration"] / COMPOSITE_SAMPLE_FRAMES
+        t0 = time.perf_counter()
+        for i in range(COMPOSITE_SAMPLE_FRAMES):
+            final.get_frame(i * step)
+        composite_frame_ms = (time.perf_counter() - t0) * 1000 / COMPOSITE_SAMPLE_FRAMES
+        del final
+
+        timings: Dict[str, float] = {}
+        t0 = time.perf_counter()
+        out_path = rel.generate_relumination_style1(
+            "uploads/input.jpg",
+            caption,
+            "Benchmark",
+            fps=case["fps"],
+            duration=case["duration"],
+            preset=case["preset"],
+            hls=case.get("hls", False),
+            timings=timings,
+        )
+        total_ms = (time.perf_counter() - t0) * 1000
+        output_bytes = os.path.getsize(out_path)
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024
+    return {
+        **case,
+        "decode_ms": round(timings["decode"] * 1000, 1),
+        "text_ms": round(timings["text"] * 1000, 1),
+        "composite_frame_ms": round(composite_frame_ms, 1),
+        "encode_ms": round(timings["encode"] * 1000, 1),
+        "package_ms": round(timings.get("package", 0.0) * 1000, 1),
+        "total_ms": round(total_ms, 1),
+        "peak_rss_mb": round(peak / 1024, 1),
+        "output_bytes": output_bytes,
+    }
+
+
+def _spawn(case: Dict[str, Any]) -> Dict[str, Any]:
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_relumination", "--case", json.dumps(case)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        return {**case, "error": proc.stderr.strip().splitlines()[-1:] or ["?"]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# ----------------------------------------------------------------------
+# Comparação com baseline
+# ----------------------------------------------------------------------
+def compare_with_baseline(
+    results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float
+) -> List[str]:
+    reference = {_case_key(r): r for r in baseline if "error" not in r}
+    regressions = []
+    for current in results:
+        ref = reference.get(_case_key(current))
+        if ref is None or "error" in current:
+            continue
+        for metric in ("total_ms", "peak_rss_mb"):
+            limit = ref[metric] * (1 + tolerance)
+            if current[metric] > limit:
+                regressions.append(
+                    f"{_case_key(current)}: {metric} {current[metric]} > {limit:.1f} "
+                    f"(baseline {ref[metric]} +{tolerance:.0%})"
+                )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[1, 12, 24, 48])
+    parser.add_argument("--captions", nargs="+", choices=sorted(CAPTIONS), default=["short", "long"])
+    parser.add_argument("--fps", type=int, nargs="+", default=[24])
+    parser.add_argument("--duration", type=float, nargs="+", default=[10])
+    parser.add_argument("--preset", nargs="+", default=["medium"])
+    parser.add_argument("--hls", action="store_true", help="inclui o empacotamento HLS")
+    parser.add_argument("--output", help="grava o resultado em JSON neste arquivo")
+    parser.add_argument("--baseline", help="JSON de referência para detectar regressão")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return
+
+    results = []
+    for mp, caption, fps, duration, preset in itertools.product(
+        args.megapixels, args.captions, args.fps, args.duration, args.preset
+    ):
+        case = {
+            "megapixels": mp,
+            "caption": caption,
+            "fps": fps,
+            "duration": duration,
+            "preset": preset,
+            "hls": args.hls,
+        }
+        result = _spawn(case)
+        print(f"{_case_key(case)}: {json.dumps(result)}", file=sys.stderr)
+        results.append(result)
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print("REGRESSÃO:\n" + "\n".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
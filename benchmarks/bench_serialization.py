@@ -0,0 +1,103 @@
+"""
+Custo de serialização por item da timeline (GET /memories/).
+
+Compara o caminho antigo (MemoryPublic por documento + validação do
+response_model + encoder padrão) com o caminho rápido
+(_doc_to_memory_dict + orjson).
+
+Uso:
+    python -m benchmarks.bench_serialization --items 10000 --repeat 5
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from benchmarks._env import setup_bench_env
+
+setup_bench_env()
+
+from bson import ObjectId  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from core.serialization import dumps  # noqa: E402
+from models.memory import MemoryPublic  # noqa: E402
+from routers.memories import _doc_to_memory, _doc_to_memory_dict  # noqa: E402
+
+
+def make_docs(n: int) -> list:
+    user_id = ObjectId()
+    base = datetime.utcnow()
+    long_text = (
+        "Uma família reunida ao redor da mesa, sorrindo para a câmera. "
+        "A luz da tarde entra pela janela e ilumina os rostos. "
+    ) * 3
+    return [
+        {
+            "_id": ObjectId(),
+            "user_id": user_id,
+            "main_caption": f"Memória {i}",
+            "media_url": f"https://example.blob.core.windows.net/memories/{i}.jpg",
+            "tags": ["família", "mesa", "sorriso"],
+            "alt_text": "Família sorrindo ao redor de uma mesa.",
+            "short_description": "Família reunida em um almoço de domingo.",
+            "long_description": long_text,
+            "created_at": base - timedelta(minutes=i),
+            "relumination_url": None,
+            "relumination_style": None,
+        }
+        for i in range(n)
+    ]
+
+
+def legacy_path(docs: list, adapter: TypeAdapter) -> bytes:
+    models = [_doc_to_memory(d) for d in docs]
+    validated = adapter.validate_python(models)
+    content = adapter.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False).encode("utf-8")
+
+
+def fast_path(docs: list) -> bytes:
+    return dumps([_doc_to_memory_dict(d) for d in docs])
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    docs = make_docs(args.items)
+    adapter = TypeAdapter(List[MemoryPublic])
+
+    assert json.loads(legacy_path(docs[:50], adapter)) == json.loads(fast_path(docs[:50]))
+
+    results = {}
+    for name, fn in (
+        ("legacy", lambda: legacy_path(docs, adapter)),
+        ("fast", lambda: fast_path(docs)),
+    ):
+        total = _best_of(fn, args.repeat)
+        results[name] = {
+            "total_ms": round(total * 1000, 2),
+            "per_item_us": round(total / args.items * 1e6, 3),
+        }
+
+    results["speedup"] = round(
+        results["legacy"]["total_ms"] / results["fast"]["total_ms"], 2
+    )
+    print(json.dumps({"items": args.items, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Latência de consulta top-k do índice vetorial local (core/vector_index.py).
+
+Gera N vetores normalizados, grava o índice em um diretório temporário
+e mede p50/p99 de search() (matmul + argpartition sobre o memmap).
+
+Uso:
+    python -m benchmarks.bench_vector_index --items 10000 --dim 256 --queries 200
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from bson import ObjectId
+
+from core.vector_index import UserVectorIndex
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    matrix = rng.standard_normal((args.items, args.dim)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    ids = [str(ObjectId()) for _ in range(args.items)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = UserVectorIndex("bench", args.dim, base_dir=tmp)
+
+        t0 = time.perf_counter()
+        index.upsert(ids, matrix)
+        append_ms = (time.perf_counter() - t0) * 1000
+
+        index.search(matrix[0], k=args.k)  # mapeia o arquivo
+
+        timings = []
+        for i in range(args.queries):
+            q = matrix[i % args.items]
+            t0 = time.perf_counter()
+            hits = index.search(q, k=args.k)
+            timings.append((time.perf_counter() - t0) * 1000)
+            assert hits[0][0] == ids[i % args.items]
+
+        timings.sort()
+        print(json.dumps({
+            "items": args.items,
+            "dim": args.dim,
+            "k": args.k,
+            "append_ms": round(append_ms, 2),
+            "query_p50_ms": round(statistics.median(timings), 3),
+            "query_p99_ms": round(timings[int(len(timings) * 0.99) - 1], 3),
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""
+Teste de carga offline: sobe main.app em processo contra substitutos locais
+(benchmarks/standins.py) e mede cada cenário com N workers concorrentes.
+
+Cenários: login, list_timeline, upload, accessibility, relumination e
+mixed (mistura ponderada de todos). Para cada um reporta p50/p95/p99,
+RPS, erros e RSS (atual e pico) em JSON.
+
+Uso:
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.load_test --scenario all --requests 200 --concurrency 16
+    python -m benchmarks.load_test --output atual.json
+    python -m benchmarks.load_test --baseline atual.json --tolerance 0.2
+
+Com --baseline, sai com código 1 se o p95 de algum cenário piorar mais
+que a tolerância (fração) em relação ao arquivo de referência.
+"""
+import argparse
+import asyncio
+import io
+import json
+import random
+import resource
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from benchmarks.standins import Latency, install_standins
+
+SCENARIOS = ("login", "list_timeline", "upload", "accessibility", "relumination")
+
+# Peso de cada operação no cenário "mixed" (uso típico do app)
+MIX_WEIGHTS = {
+    "list_timeline": 60,
+    "login": 10,
+    "upload": 15,
+    "accessibility": 14,
+    "relumination": 1,
+}
+
+PASSWORD = "bench-password"
+
+
+def _rss_mb() -> Dict[str, float]:
+    current = 0.0
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1]) / 1024
+                    break
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024  # bytes no macOS, KiB no Linux
+    return {"rss_mb": round(current, 1), "peak_rss_mb": round(peak / 1024, 1)}
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[idx]
+
+
+def _sample_image(seed: int) -> bytes:
+    from PIL import Image
+
+    rng = random.Random(seed)
+    img = Image.new("RGB", (640, 480), tuple(rng.randrange(256) for _ in range(3)))
+    for _ in range(20):
+        x, y = rng.randrange(600), rng.randrange(440)
+        img.paste(tuple(rng.randrange(256) for _ in range(3)), (x, y, x + 40, y + 40))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+
+class LoadTest:
+    def __init__(self, client, users: int, memories_per_user: int) -> None:
+        self.client = client
+        self.users = users
+        self.memories_per_user = memories_per_user
+        self.accounts: List[Dict[str, Any]] = []
+        self.images = [_sample_image(i) for i in range(8)]
+
+    # ------------------------------------------------------------------
+    # Preparação
+    # ------------------------------------------------------------------
+    async def seed(self) -> None:
+        import core.database
+        from bson import ObjectId
+
+        for i in range(self.users):
+            email = f"bench{i}@example.com"
+            r = await self.client.post(
+                "/auth/register",
+                json={"name": f"Bench {i}", "email": email, "password": PASSWORD},
+            )
+            r.raise_for_status()
+            user_id = r.json()["id"]
+            # Créditos para a reluminação não esbarrar na cota mensal
+            await core.database.db.users.update_one(
+                {"_id": ObjectId(user_id)}, {"$set": {"relumination_credits": 10_000}}
+            )
+            token = await self._login(email)
+            headers = {"Authorization": f"Bearer {token}"}
+
+            items = [
+                {
+                    "main_caption": f"Memória {j} de {email}",
+                    "tags": ["bench", f"t{j % 7}"],
+                    "alt_text": "Pessoas reunidas em volta de uma mesa.",
+                }
+                for j in range(self.memories_per_user)
+            ]
+            if items:
+                r = await self.client.post("/memories/bulk", json=items, headers=headers)
+                r.raise_for_status()
+
+            # Uma memória com mídia local para a reluminação
+            upload = await self.client.post(
+                "/memories/upload-file",
+                files={"file": ("seed.jpg", self.images[i % len(self.images)], "image/jpeg")},
+                headers=headers,
+            )
+            upload.raise_for_status()
+            mem = await self.client.post(
+                "/memories/",
+                json={
+                    "main_caption": "Um momento especial",
+                    "media_url": upload.json()["media_url"],
+                    "short_description": "Amigos reunidos em um fim de tarde.",
+                },
+                headers=headers,
+            )
+            mem.raise_for_status()
+
+            self.accounts.append({
+                "email": email,
+                "headers": headers,
+                "media_memory_id": mem.json()["id"],
+            })
+
+    async def _login(self, email: str) -> str:
+        r = await self.client.post("/auth/login", json={"email": email, "password": PASSWORD})
+        r.raise_for_status()
+        return r.json()["access_token"]
+
+    # ------------------------------------------------------------------
+    # Operações (retornam o status HTTP)
+    # ------------------------------------------------------------------
+    async def op_login(self, n: int) -> int:
+        acc = self.accounts[n % len(self.accounts)]
+        r = await self.client.post(
+            "/auth/login", json={"email": acc["email"], "password": PASSWORD}
+        )
+        return r.status_code
+
+    async def op_list_timeline(self, n: int) -> int:
+        acc = self.accounts[n % len(self.accounts)]
+        view = "summary" if n % 2 else "full"
+        r = await self.client.get(
+            "/memories/", params={"view": view}, headers=acc["headers"]
+        )
+        return r.status_code
+
+    async def op_upload(self, n: int) -> int:
+        acc = self.accounts[n % len(self.accounts)]
+        image = self.images[n % len(self.images)]
+        r = await self.client.post(
+            "/upload",
+            files={"file": (f"foto{n}.jpg", image, "image/jpeg")},
+            headers=acc["headers"],
+        )
+        return r.status_code
+
+    async def op_accessibility(self, n: int) -> int:
+        from benchmarks.standins import VISION_RESPONSE
+
+        r = await self.client.post(
+            "/accessibility",
+            json={
+                "blob_url": f"https://fakeaccount.blob.core.windows.net/memories/{n}.jpg",
+                "vision_result": VISION_RESPONSE,
+                "user_caption": "Aniversário da vó",
+            },
+        )
+        return r.status_code
+
+    async def op_relumination(self, n: int) -> int:
+        acc = self.accounts[n % len(self.accounts)]
+        r = await self.client.post(
+            f"/memories/{acc['media_memory_id']}/relumination", headers=acc["headers"]
+        )
+        return r.status_code
+
+    def operation(self, scenario: str) -> Callable[[int], Awaitable[int]]:
+        if scenario != "mixed":
+            return getattr(self, f"op_{scenario}")
+
+        names = list(MIX_WEIGHTS)
+        weights = [MIX_WEIGHTS[name] for name in names]
+        rng = random.Random(1234)
+
+        async def mixed(n: int) -> int:
+            name = rng.choices(names, weights)[0]
+            return await getattr(self, f"op_{name}")(n)
+
+        return mixed
+
+    # ------------------------------------------------------------------
+    # Execução
+    # ------------------------------------------------------------------
+    async def run(self, scenario: str, requests: int, concurrency: int) -> Dict[str, Any]:
+        op = self.operation(scenario)
+        latencies: List[float] = []
+        errors = 0
+        counter = iter(range(requests))
+
+        async def worker() -> None:
+            nonlocal errors
+            for n in counter:
+                t0 = time.perf_counter()
+                try:
+                    status = await op(n)
+                except Exception:
+                    status = 599
+                latencies.append((time.perf_counter() - t0) * 1000)
+                if status >= 400:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        return {
+            "requests": len(latencies),
+            "concurrency": concurrency,
+            "errors": errors,
+            "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(_percentile(latencies, 50), 1),
+            "p95_ms": round(_percentile(latencies, 95), 1),
+            "p99_ms": round(_percentile(latencies, 99), 1),
+            **_rss_mb(),
+        }
+
+
+def compare_with_baseline(
+    results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    regressions = []
+    for scenario, current in results["scenarios"].items():
+        ref = baseline.get("scenarios", {}).get(scenario)
+        if not ref or not ref.get("p95_ms"):
+            continue
+        limit = ref["p95_ms"] * (1 + tolerance)
+        if current["p95_ms"] > limit:
+            regressions.append(
+                f"{scenario}: p95 {current['p95_ms']} ms > {limit:.1f} ms "
+                f"(baseline {ref['p95_ms']} ms +{tolerance:.0%})"
+            )
+    return regressions
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, Any]:
+    latency = install_standins(
+        Latency(openai=args.openai_latency, vision=args.vision_latency, blob=args.blob_latency)
+    )
+
+    # Render curto: a reluminação real (10 s, 24 fps) domina qualquer mistura
+    import core.reluminations
+
+    core.reluminations.FPS = args.render_fps
+    core.reluminations.DURATION = args.render_duration
+
+    import httpx
+
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        test = LoadTest(client, users=args.users, memories_per_user=args.memories)
+        await test.seed()
+
+        scenarios = SCENARIOS + ("mixed",) if args.scenario == "all" else (args.scenario,)
+        results: Dict[str, Any] = {}
+        for scenario in scenarios:
+            n = args.requests
+            if scenario == "relumination":
+                n = max(1, min(n, args.relumination_requests))
+            results[scenario] = await test.run(scenario, n, args.concurrency)
+            print(f"{scenario}: {json.dumps(results[scenario])}", file=sys.stderr)
+
+    return {
+        "config": {
+            "users": args.users,
+            "memories_per_user": args.memories,
+            "latency_s": vars(latency),
+            "render_fps": args.render_fps,
+            "render_duration": args.render_duration,
+        },
+        "scenarios": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=SCENARIOS + ("mixed", "all"), default="all")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--memories", type=int, default=200, help="memórias por usuário")
+    parser.add_argument("--relumination-requests", type=int, default=4)
+    parser.add_argument("--render-fps", type=int, default=6)
+    parser.add_argument("--render-duration", type=float, default=2)
+    parser.add_argument("--openai-latency", type=float, default=0.4)
+    parser.add_argument("--vision-latency", type=float, default=0.25)
+    parser.add_argument("--blob-latency", type=float, default=0.05)
+    parser.add_argument("--output", help="grava o resultado em JSON neste arquivo")
+    parser.add_argument("--baseline", help="JSON de referência para detectar regressão")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = asyncio.run(_main(args))
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print("REGRESSÃO:\n" + "\n".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
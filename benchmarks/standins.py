@@ -0,0 +1,158 @@
+"""
+Substitutos locais dos serviços externos para benchmarks/testes de carga:
+
+- Mongo: mongomock-motor (em processo), no lugar de core.database.db
+- Azure OpenAI: FakeOpenAI (sync/async) com latência configurável
+- Vision: servidor HTTP local (thread) que responde como /vision/v3.2/analyze
+- Blob: FakeBlobClient em memória, no lugar de azure.storage.blob.BlobClient
+
+install_standins() precisa rodar ANTES de importar main/routers.
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+from benchmarks._env import setup_bench_env
+
+
+class Latency:
+    """
+    Latências simuladas (segundos) de cada dependência.
+    """
+
+    def __init__(self, openai: float = 0.4, vision: float = 0.25, blob: float = 0.05) -> None:
+        self.openai = openai
+        self.vision = vision
+        self.blob = blob
+
+
+# ----------------------------------------------------------------------
+# Azure OpenAI
+# ----------------------------------------------------------------------
+def _completion(text: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+        usage=SimpleNamespace(prompt_tokens=120, completion_tokens=40),
+    )
+
+
+class _FakeCompletions:
+    def __init__(self, latency: Latency, is_async: bool) -> None:
+        self.latency = latency
+        self.is_async = is_async
+
+    def _text(self, kwargs) -> str:
+        return f"Texto gerado ({kwargs.get('max_tokens')} tokens máx)."
+
+    def create(self, **kwargs):
+        if self.is_async:
+            return self._acreate(**kwargs)
+        time.sleep(self.latency.openai)
+        return _completion(self._text(kwargs))
+
+    async def _acreate(self, **kwargs):
+        await asyncio.sleep(self.latency.openai)
+        return _completion(self._text(kwargs))
+
+
+class FakeOpenAI:
+    def __init__(self, latency: Latency, is_async: bool = False) -> None:
+        self.chat = SimpleNamespace(completions=_FakeCompletions(latency, is_async))
+
+
+# ----------------------------------------------------------------------
+# Vision (servidor HTTP real, para exercitar requests.post)
+# ----------------------------------------------------------------------
+VISION_RESPONSE = {
+    "description": {
+        "captions": [{"text": "a group of people sitting at a table", "confidence": 0.9}],
+        "tags": ["person", "table", "indoor"],
+    },
+    "tags": [{"name": "person", "confidence": 0.99}, {"name": "table", "confidence": 0.95}],
+    "faces": [],
+}
+
+
+def start_fake_vision(latency: Latency) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):  # noqa: N802
+            length = int(self.headers.get("Content-Length") or 0)
+            self.rfile.read(length)
+            time.sleep(latency.vision)
+            body = json.dumps(VISION_RESPONSE).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ----------------------------------------------------------------------
+# Blob
+# ----------------------------------------------------------------------
+class FakeBlobClient:
+    store: Dict[str, bytes] = {}
+    latency: Optional[Latency] = None
+
+    def __init__(self, blob_name: str) -> None:
+        self.blob_name = blob_name
+        self.account_name = "fakeaccount"
+
+    @classmethod
+    def from_connection_string(cls, conn_str=None, container_name=None, blob_name=None, **kw):
+        return cls(blob_name)
+
+    def upload_blob(self, data, overwrite=False, **kw):
+        if self.latency:
+            time.sleep(self.latency.blob)
+        self.store[self.blob_name] = bytes(data)
+
+
+# ----------------------------------------------------------------------
+# Instalação
+# ----------------------------------------------------------------------
+def install_standins(latency: Optional[Latency] = None) -> Latency:
+    latency = latency or Latency()
+    setup_bench_env()
+
+    import os
+
+    os.environ.setdefault("EMBEDDING_BACKEND", "local")
+    os.environ.setdefault("AZURE_STORAGE_URL", "https://fakeaccount.blob.core.windows.net/memories")
+    os.makedirs("uploads", exist_ok=True)
+    os.makedirs("media", exist_ok=True)
+
+    from mongomock_motor import AsyncMongoMockClient
+
+    from core.database import DB_NAME, use_database
+
+    use_database(AsyncMongoMockClient()[DB_NAME])
+
+    import core.llm
+    import core.vision
+
+    core.llm.openai_client = FakeOpenAI(latency)
+    core.llm.openai_async_client = FakeOpenAI(latency, is_async=True)
+
+    vision = start_fake_vision(latency)
+    core.vision.VISION_ENDPOINT = f"http://127.0.0.1:{vision.server_address[1]}"
+
+    FakeBlobClient.latency = latency
+
+    # routers.core importa BlobClient diretamente: ajusta a referência.
+    import routers.core
+
+    routers.core.BlobClient = FakeBlobClient
+
+    return latency
@@ -0,0 +1,185 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from core.llm import OPENAI_TIMEOUT_SECONDS
+from core.metrics import record_openai_usage
+from core.resilience import acall_with_policy
+
+ACCESSIBILITY_FIELDS = ("alt_text", "short_description", "long_description")
+
+ENRICHMENT_CONCURRENCY = int(os.getenv("ENRICHMENT_CONCURRENCY", "8"))
+ENRICHMENT_WRITE_BATCH = 100
+
+
+def extract_vision_caption_and_tags(vision_result: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    Vision → (legenda principal, tags separadas por vírgula).
+    """
+    desc = vision_result.get("description") or {}
+    captions: List[Dict[str, Any]] = desc.get("captions") or []
+    vision_caption = (
+        captions[0].get("text") if captions and isinstance(captions[0], dict)
+        else "Imagem."
+    )
+
+    tags_raw = vision_result.get("tags") or []
+    tag_names: List[str] = []
+    for t in tags_raw:
+        if isinstance(t, dict):
+            if t.get("name"):
+                tag_names.append(t["name"])
+        else:
+            tag_names.append(str(t))
+
+    tags_str = ", ".join(tag_names) if tag_names else "memória pessoal"
+    return vision_caption, tags_str
+
+
+def build_accessibility_requests(
+    user_caption: str,
+    vision_caption: str,
+    tags_str: str,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Parâmetros das três chamadas (ALT, SHORT, LONG), por campo.
+    """
+    context = (
+        f"Descrição do usuário: {user_caption or '[vazia]'}\n"
+        f"Legenda do Vision: {vision_caption}\n"
+        f"Tags: {tags_str}\n"
+    )
+
+    # ALT TEXT (1 frase)
+    alt_prompt = (
+        "Gere um texto alternativo (alt text) em UMA frase, útil para uma pessoa "
+        "com deficiência visual, usando apenas o que o usuário descreveu e o que o Vision detectou.\n\n"
+        + context
+    )
+
+    # SHORT DESCRIPTION (1–2 frases)
+    short_prompt = (
+        "Descreva a imagem em 1–2 frases, de forma objetiva e acessível.\n"
+        "Use apenas o que o usuário disse e o que o Vision detectou. Não invente nada.\n\n"
+        + context
+    )
+
+    # LONG DESCRIPTION (3–6 frases)
+    long_prompt = (
+        "Crie uma descrição acessível e detalhada (3–6 frases), "
+        "usando APENAS o texto do usuário, a legenda do Vision e as tags detectadas.\n"
+        "Não invente nomes, locais ou relações familiares não citadas.\n"
+        "Se o usuário mencionou 'mãos do meu avô', você pode repetir exatamente.\n\n"
+        + context
+    )
+
+    return {
+        "alt_text": {"prompt": alt_prompt, "max_tokens": 60, "temperature": 0.2},
+        "short_description": {"prompt": short_prompt, "max_tokens": 80, "temperature": 0.3},
+        "long_description": {"prompt": long_prompt, "max_tokens": 220, "temperature": 0.3},
+    }
+
+
+async def agenerate_accessibility(
+    async_client,
+    deployment: str,
+    user_caption: str,
+    vision_caption: str,
+    tags_str: str,
+    allow_partial: bool = False,
+) -> Dict[str, Optional[str]]:
+    """
+    As três completions em paralelo, sob a política de core/resilience.py.
+
+    Com allow_partial=True, campos que falharem voltam como None (a falha
+    só é propagada se todos falharem); senão, qualquer falha é propagada.
+    """
+    requests = build_accessibility_requests(user_caption, vision_caption, tags_str)
+
+    async def _complete(field: str, req: Dict[str, Any]) -> str:
+        async def _call(timeout: float):
+            return await async_client.chat.completions.create(
+                model=deployment,
+                messages=[{"role": "user", "content": req["prompt"]}],
+                max_tokens=req["max_tokens"],
+                temperature=req["temperature"],
+                timeout=timeout,
+            )
+
+        resp = await acall_with_policy(
+            "openai", f"completion:{field}", _call, OPENAI_TIMEOUT_SECONDS
+        )
+        record_openai_usage(deployment, resp)
+        return resp.choices[0].message.content.strip()
+
+    texts = await asyncio.gather(
+        *(_complete(f, r) for f, r in requests.items()),
+        return_exceptions=allow_partial,
+    )
+    errors = [t for t in texts if isinstance(t, BaseException)]
+    if errors and len(errors) == len(texts):
+        raise errors[0]
+    return {
+        field: None if isinstance(text, BaseException) else text
+        for field, text in zip(requests.keys(), texts)
+    }
+
+
+async def enrich_memories(
+    db,
+    async_client,
+    deployment: str,
+    docs: List[Dict[str, Any]],
+    concurrency: int = ENRICHMENT_CONCURRENCY,
+) -> int:
+    """
+    Preenche alt_text/short_description/long_description de várias memórias.
+
+    Fan-out assíncrono limitado por `concurrency` memórias simultâneas
+    (3 completions cada) e gravação em lote com bulk_write de UpdateOne.
+    Falhas individuais são ignoradas: a memória fica para o próximo lote.
+    Só grava se a memória (do mesmo usuário) continua sem alt_text: o que
+    o usuário escreveu enquanto o job rodava não é sobrescrito.
+    Retorna o número de memórias atualizadas.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    pending: List[UpdateOne] = []
+    updated = 0
+
+    async def _flush() -> None:
+        nonlocal updated
+        if not pending:
+            return
+        ops = pending[:]
+        pending.clear()
+        result = await db.timeline_items.bulk_write(ops, ordered=False)
+        updated += result.modified_count
+
+    async def _enrich_one(doc: Dict[str, Any]) -> None:
+        async with semaphore:
+            try:
+                texts = await agenerate_accessibility(
+                    async_client,
+                    deployment,
+                    doc.get("main_caption") or "",
+                    "Imagem.",
+                    ", ".join(doc.get("tags") or []) or "memória pessoal",
+                )
+            except Exception:
+                return
+
+        pending.append(
+            UpdateOne(
+                {"_id": doc["_id"], "user_id": doc["user_id"], "alt_text": {"$in": [None, ""]}},
+                {"$set": {**texts, "updated_at": datetime.utcnow()}},
+            )
+        )
+        if len(pending) >= ENRICHMENT_WRITE_BATCH:
+            await _flush()
+
+    await asyncio.gather(*(_enrich_one(d) for d in docs))
+    await _flush()
+    return updated
@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from core.accessibility import agenerate_accessibility, extract_vision_caption_and_tags
+from core.llm import OPENAI_DEPLOYMENT, get_openai_async_client
+from core.metrics import ACCESSIBILITY_CACHE
+from core.resilience import without_deadline
+
+# ----------------------------------------------------------------------
+# Acessibilidade especulativa.
+#
+# O /upload já tem a legenda e as tags do Vision: assim que ele responde,
+# a geração de alt/short/long começa em background (user_caption vazio)
+# e o resultado fica guardado por blob_url:
+#   - em memória (task em andamento ou concluída, neste worker);
+#   - na coleção accessibility_cache (TTL), para os outros workers.
+# O /accessibility devolve o resultado pronto, espera a task em
+# andamento ou, se as entradas mudaram (ex.: o usuário escreveu uma
+# legenda), gera de novo e substitui o que estava guardado.
+# ----------------------------------------------------------------------
+SPECULATIVE_ACCESSIBILITY = os.getenv("SPECULATIVE_ACCESSIBILITY", "1") == "1"
+ACCESSIBILITY_CACHE_TTL_SECONDS = int(os.getenv("ACCESSIBILITY_CACHE_TTL_SECONDS", str(24 * 3600)))
+ACCESSIBILITY_CACHE_MAX_ENTRIES = int(os.getenv("ACCESSIBILITY_CACHE_MAX_ENTRIES", "512"))
+# Quanto esperar por uma geração em andamento em OUTRO worker
+ACCESSIBILITY_REMOTE_WAIT_SECONDS = float(os.getenv("ACCESSIBILITY_REMOTE_WAIT_SECONDS", "15"))
+REMOTE_POLL_SECONDS = 0.25
+
+logger = logging.getLogger(__name__)
+
+
+def _cache_id(blob_url: str) -> str:
+    return hashlib.sha256(blob_url.encode("utf-8")).hexdigest()
+
+
+def accessibility_fingerprint(user_caption: str, vision_caption: str, tags_str: str) -> str:
+    raw = "\x1f".join((user_caption, vision_caption, tags_str))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _Entry:
+    def __init__(self, fingerprint: str, task: asyncio.Task) -> None:
+        self.fingerprint = fingerprint
+        self.task = task
+        self.created_at = time.monotonic()
+
+    def expired(self) -> bool:
+        return time.monotonic() - self.created_at > ACCESSIBILITY_CACHE_TTL_SECONDS
+
+    def partial(self) -> bool:
+        # Concluída com algum campo faltando: vale tentar de novo
+        task = self.task
+        if not task.done() or task.cancelled() or task.exception() is not None:
+            return False
+        return any(text is None for text in task.result().values())
+
+
+_entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+
+def _remember(blob_url: str, entry: _Entry) -> None:
+    _entries[blob_url] = entry
+    _entries.move_to_end(blob_url)
+    while len(_entries) > ACCESSIBILITY_CACHE_MAX_ENTRIES:
+        _entries.popitem(last=False)
+
+
+async def _generate(
+    db,
+    blob_url: str,
+    fingerprint: str,
+    user_caption: str,
+    vision_caption: str,
+    tags_str: str,
+) -> Dict[str, Optional[str]]:
+    cache_id = _cache_id(blob_url)
+    now = datetime.utcnow()
+    try:
+        await db.accessibility_cache.replace_one(
+            {"_id": cache_id},
+            {"blob_url": blob_url, "fingerprint": fingerprint, "status": "pending", "created_at": now},
+            upsert=True,
+        )
+    except Exception:
+        logger.warning("accessibility_cache indisponível (pending)", exc_info=True)
+
+    try:
+        result = await agenerate_accessibility(
+            get_openai_async_client(),
+            OPENAI_DEPLOYMENT,
+            user_caption,
+            vision_caption,
+            tags_str,
+            allow_partial=True,
+        )
+    except BaseException:
+        # Libera quem espera em outros workers
+        await _forget_pending(db, cache_id, fingerprint)
+        raise
+
+    if any(text is None for text in result.values()):
+        # Resultado parcial não é guardado: a próxima chamada tenta de novo
+        await _forget_pending(db, cache_id, fingerprint)
+        return result
+
+    try:
+        await db.accessibility_cache.update_one(
+            {"_id": cache_id, "fingerprint": fingerprint},
+            {"$set": {"status": "done", "result": result, "created_at": datetime.utcnow()}},
+        )
+    except Exception:
+        logger.warning("accessibility_cache indisponível (done)", exc_info=True)
+    return result
+
+
+async def _forget_pending(db, cache_id: str, fingerprint: str) -> None:
+    try:
+        await db.accessibility_cache.delete_one(
+            {"_id": cache_id, "fingerprint": fingerprint, "status": "pending"}
+        )
+    except Exception:
+        logger.warning("accessibility_cache indisponível (limpeza)", exc_info=True)
+
+
+def _start(
+    db,
+    blob_url: str,
+    user_caption: str,
+    vision_caption: str,
+    tags_str: str,
+) -> _Entry:
+    fingerprint = accessibility_fingerprint(user_caption, vision_caption, tags_str)
+    task = asyncio.get_running_loop().create_task(
+        _generate(db, blob_url, fingerprint, user_caption, vision_caption, tags_str)
+    )
+    # Falha de uma task que ninguém aguardou não vira "exception never retrieved"
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    entry = _Entry(fingerprint, task)
+    _remember(blob_url, entry)
+    return entry
+
+
+def start_speculative_accessibility(db, blob_url: str, vision_result: Dict[str, Any]) -> bool:
+    """
+    Chamado pelo /upload logo após o Vision. Não bloqueia nem lança:
+    retorna False se a especulação não foi iniciada.
+    """
+    if not SPECULATIVE_ACCESSIBILITY or not vision_result or "error" in vision_result:
+        return False
+    try:
+        get_openai_async_client()
+    except RuntimeError:
+        return False  # OpenAI não configurado
+
+    vision_caption, tags_str = extract_vision_caption_and_tags(vision_result)
+    # Roda depois da resposta do upload: não herda o prazo da requisição
+    with without_deadline():
+        _start(db, blob_url, "", vision_caption, tags_str)
+    return True
+
+
+async def _wait_remote(db, cache_id: str, fingerprint: str, doc: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Outro worker está gerando: espera o resultado no Mongo (com limite).
+    """
+    give_up_at = doc["created_at"] + timedelta(seconds=ACCESSIBILITY_REMOTE_WAIT_SECONDS)
+    while doc and doc.get("fingerprint") == fingerprint:
+        if doc.get("status") == "done":
+            return doc["result"]
+        if datetime.utcnow() >= give_up_at:
+            return None
+        await asyncio.sleep(REMOTE_POLL_SECONDS)
+        doc = await db.accessibility_cache.find_one({"_id": cache_id})
+    return None
+
+
+async def get_or_generate_accessibility(
+    db,
+    blob_url: str,
+    user_caption: str,
+    vision_caption: str,
+    tags_str: str,
+) -> Tuple[Dict[str, Optional[str]], str]:
+    """
+    (resultado, origem). Origem: memory | joined | mongo | remote | miss | stale.
+    O dict retornado é compartilhado: copie antes de alterar.
+    """
+    fingerprint = accessibility_fingerprint(user_caption, vision_caption, tags_str)
+    outcome = "miss"
+
+    entry = _entries.get(blob_url)
+    if entry is not None and entry.fingerprint != fingerprint:
+        outcome, entry = "stale", None
+    elif entry is not None and (entry.expired() or entry.partial()):
+        entry = None
+    if entry is not None:
+        source = "memory" if entry.task.done() else "joined"
+        try:
+            # shield: cliente que desiste não cancela a geração compartilhada
+            result = await asyncio.shield(entry.task)
+            ACCESSIBILITY_CACHE.labels(source).inc()
+            return result, source
+        except asyncio.CancelledError:
+            if not entry.task.cancelled():
+                raise
+        except Exception:
+            pass  # especulação falhou: gera de novo abaixo
+
+    if outcome == "miss":
+        cache_id = _cache_id(blob_url)
+        doc = await db.accessibility_cache.find_one({"_id": cache_id})
+        if doc is not None and doc.get("fingerprint") == fingerprint:
+            source = "mongo" if doc.get("status") == "done" else "remote"
+            result = await _wait_remote(db, cache_id, fingerprint, doc)
+            if result is not None:
+                ACCESSIBILITY_CACHE.labels(source).inc()
+                return result, source
+        elif doc is not None:
+            outcome = "stale"
+
+    ACCESSIBILITY_CACHE.labels(outcome).inc()
+    entry = _start(db, blob_url, user_caption, vision_caption, tags_str)
+    return await asyncio.shield(entry.task), outcome
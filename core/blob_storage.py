@@ -1,33 +1,300 @@
+import io
 import os
+import tempfile
 import uuid
-from azure.storage.blob import BlobServiceClient
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import BlobSasPermissions, BlobServiceClient, generate_blob_sas
 from fastapi import UploadFile
 
+from core.metrics import observe_dependency
+
+# ----------------------------------------------------------------------
+# Upload direto (cliente -> Blob) com SAS emitido pelo servidor
+# ----------------------------------------------------------------------
+UPLOAD_SAS_EXPIRE_MINUTES = int(os.getenv("UPLOAD_SAS_EXPIRE_MINUTES", "15"))
+MAX_DIRECT_UPLOAD_BYTES = int(os.getenv("MAX_DIRECT_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+THUMBNAIL_MAX_SIZE = 512
+# Formatos que o Pillow 9.5 decodifica (HEIC/AVIF não: ficam sem miniatura)
+THUMBNAIL_MEDIA_TYPES = {
+    "image/jpeg",
+    "image/png",
+    "image/gif",
+    "image/bmp",
+    "image/tiff",
+    "image/webp",
+}
+READ_SAS_EXPIRE_MINUTES = 10
 
-async def upload_file_to_blob(file: UploadFile, user_id: str) -> str:
-    """
-    Upload para Azure Blob e retorna URL pública.
-    """
-    connection_string = os.getenv("AZURE_BLOB_CONNECTION_STRING")
-    container_name = os.getenv("AZURE_BLOB_CONTAINER", "memories")
 
+def _get_service_client() -> BlobServiceClient:
+    connection_string = os.getenv("AZURE_BLOB_CONNECTION_STRING")
     if not connection_string:
         raise RuntimeError("AZURE_BLOB_CONNECTION_STRING não definido.")
+    return BlobServiceClient.from_connection_string(connection_string)
 
-    blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-    container_client = blob_service_client.get_container_client(container_name)
 
-    original = file.filename or "file"
-    ext = ""
+def _get_container_name() -> str:
+    return os.getenv("AZURE_BLOB_CONTAINER", "memories")
+
+
+def _public_blob_url(account_name: str, container_name: str, blob_name: str) -> str:
+    return f"https://{account_name}.blob.core.windows.net/{container_name}/{blob_name}"
+
+
+def is_own_blob_url(url: str) -> bool:
+    """
+    True se a URL aponta para o container configurado da nossa conta
+    (https://<conta>.blob.core.windows.net/<container>/...).
+    """
+    try:
+        account_name = _get_service_client().account_name
+    except (RuntimeError, ValueError):
+        return False
+    parsed = urlparse(url)
+    return (
+        parsed.scheme == "https"
+        and parsed.hostname == f"{account_name}.blob.core.windows.net"
+        and parsed.port is None
+        and parsed.path.startswith(f"/{_get_container_name()}/")
+        and ".." not in parsed.path
+    )
+
+
+def _file_extension(filename: Optional[str]) -> str:
+    original = filename or "file"
     if "." in original:
-        ext = "." + original.split(".")[-1].lower()
+        return "." + original.split(".")[-1].lower()
+    return ""
 
+
+async def upload_file_to_blob(file: UploadFile, user_id: str) -> str:
+    """
+    Upload para Azure Blob e retorna URL pública.
+    """
+    blob_service_client = _get_service_client()
+    container_name = _get_container_name()
+    container_client = blob_service_client.get_container_client(container_name)
+
+    ext = _file_extension(file.filename)
     blob_name = f"{user_id}_{uuid.uuid4()}{ext}"
 
     data = await file.read()
     blob_client = container_client.get_blob_client(blob_name)
-    blob_client.upload_blob(data, overwrite=True)
+    with observe_dependency("blob", "upload"):
+        blob_client.upload_blob(data, overwrite=True)
 
     account_name = blob_client.account_name
-    url = f"https://{account_name}.blob.core.windows.net/{container_name}/{blob_name}"
+    url = _public_blob_url(account_name, container_name, blob_name)
     return url
+
+
+def is_user_blob_name(user_id: str, blob_name: str) -> bool:
+    """
+    Garante que o blob pertence ao prefixo do usuário ({user_id}/...).
+    """
+    return (
+        blob_name.startswith(f"{user_id}/")
+        and ".." not in blob_name
+        and "/thumbs/" not in blob_name
+    )
+
+
+def create_upload_sas(user_id: str, filename: Optional[str]) -> Dict[str, Any]:
+    """
+    Gera uma URL SAS de curta duração, somente escrita, para o cliente
+    enviar o arquivo direto ao Blob em {user_id}/{uuid}{ext}.
+    """
+    service = _get_service_client()
+    container_name = _get_container_name()
+    account_key = getattr(service.credential, "account_key", None)
+    if not account_key:
+        raise RuntimeError("Connection string do Blob sem AccountKey; SAS indisponível.")
+
+    blob_name = f"{user_id}/{uuid.uuid4()}{_file_extension(filename)}"
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(minutes=UPLOAD_SAS_EXPIRE_MINUTES)
+
+    sas = generate_blob_sas(
+        account_name=service.account_name,
+        container_name=container_name,
+        blob_name=blob_name,
+        account_key=account_key,
+        permission=BlobSasPermissions(create=True, write=True),
+        start=now - timedelta(minutes=5),  # tolerância de relógio
+        expiry=expires_at,
+    )
+
+    blob_url = _public_blob_url(service.account_name, container_name, blob_name)
+    return {
+        "blob_name": blob_name,
+        "blob_url": blob_url,
+        "upload_url": f"{blob_url}?{sas}",
+        "expires_at": expires_at,
+        "required_headers": {"x-ms-blob-type": "BlockBlob"},
+    }
+
+
+def get_uploaded_blob_properties(blob_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Retorna tamanho/content-type/URL de um blob enviado pelo cliente,
+    ou None se ele não existir.
+    """
+    service = _get_service_client()
+    container_name = _get_container_name()
+    blob_client = service.get_blob_client(container_name, blob_name)
+
+    try:
+        with observe_dependency("blob", "get_properties"):
+            props = blob_client.get_blob_properties()
+    except ResourceNotFoundError:
+        return None
+
+    return {
+        "size": props.size,
+        "content_type": props.content_settings.content_type or "",
+        "url": _public_blob_url(service.account_name, container_name, blob_name),
+    }
+
+
+def delete_uploaded_blob(blob_name: str) -> None:
+    """
+    Remove um blob enviado pelo cliente (ex.: rejeitado no upload-complete).
+    """
+    service = _get_service_client()
+    blob_client = service.get_blob_client(_get_container_name(), blob_name)
+    try:
+        with observe_dependency("blob", "delete"):
+            blob_client.delete_blob()
+    except ResourceNotFoundError:
+        pass
+
+
+# O SAS não restringe o content-type: o tipo real vem dos primeiros bytes
+SNIFF_BYTES = 32
+_IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+)
+_HEIF_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"mif1", b"msf1", b"avif"}
+
+
+def sniff_media_type(head: bytes) -> Optional[str]:
+    """
+    Content-type real pelo cabeçalho do arquivo (imagem/vídeo suportados),
+    ou None se não reconhecido.
+    """
+    for signature, media_type in _IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return media_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+        return "video/x-msvideo"
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in _HEIF_BRANDS:
+            return "image/avif" if brand == b"avif" else "image/heic"
+        return "video/quicktime" if brand == b"qt  " else "video/mp4"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "video/webm"
+    return None
+
+
+def read_blob_head(blob_name: str, length: int = SNIFF_BYTES) -> bytes:
+    service = _get_service_client()
+    blob_client = service.get_blob_client(_get_container_name(), blob_name)
+    with observe_dependency("blob", "download"):
+        return blob_client.download_blob(offset=0, length=length).readall()
+
+
+def thumbnail_blob_name(blob_name: str) -> str:
+    user_prefix, _, name = blob_name.partition("/")
+    stem = name.rsplit(".", 1)[0]
+    return f"{user_prefix}/thumbs/{stem}.jpg"
+
+
+def create_read_sas_url(blob_name: str) -> str:
+    """
+    URL de leitura de curta duração (ex.: para o ffmpeg ler o vídeo direto
+    do Blob, com range requests, sem baixar o arquivo inteiro).
+    """
+    service = _get_service_client()
+    container_name = _get_container_name()
+    account_key = getattr(service.credential, "account_key", None)
+    if not account_key:
+        raise RuntimeError("Connection string do Blob sem AccountKey; SAS indisponível.")
+
+    now = datetime.now(timezone.utc)
+    sas = generate_blob_sas(
+        account_name=service.account_name,
+        container_name=container_name,
+        blob_name=blob_name,
+        account_key=account_key,
+        permission=BlobSasPermissions(read=True),
+        start=now - timedelta(minutes=5),
+        expiry=now + timedelta(minutes=READ_SAS_EXPIRE_MINUTES),
+    )
+    return f"{_public_blob_url(service.account_name, container_name, blob_name)}?{sas}"
+
+
+def _upload_derivative(blob_name: str, data: bytes) -> str:
+    service = _get_service_client()
+    container_name = _get_container_name()
+    thumb_name = thumbnail_blob_name(blob_name)
+    target = service.get_blob_client(container_name, thumb_name)
+    with observe_dependency("blob", "upload"):
+        target.upload_blob(data, overwrite=True)
+    return _public_blob_url(service.account_name, container_name, thumb_name)
+
+
+def generate_blob_video_poster(blob_name: str) -> Dict[str, Any]:
+    """
+    Metadados (core/video_probe.py) e pôster JPEG de um vídeo já no Blob;
+    o pôster é gravado em {user_id}/thumbs/, como as miniaturas.
+    Lança ValueError/RuntimeError/OSError/TimeoutExpired se falhar.
+    """
+    from core.video_probe import extract_poster_frame, poster_timestamp, probe_video
+
+    source_url = create_read_sas_url(blob_name)
+    meta = probe_video(source_url)
+    with tempfile.TemporaryDirectory() as tmp:
+        poster_path = extract_poster_frame(
+            source_url,
+            os.path.join(tmp, "poster.jpg"),
+            poster_timestamp(meta["duration"]),
+        )
+        with open(poster_path, "rb") as f:
+            poster_url = _upload_derivative(blob_name, f.read())
+    return {"poster_url": poster_url, "video_metadata": meta}
+
+
+def generate_blob_thumbnail(blob_name: str) -> str:
+    """
+    Gera a miniatura JPEG (máx. 512px) de uma imagem já no Blob e a grava
+    em {user_id}/thumbs/. Retorna a URL só depois de gravada.
+    """
+    from PIL import Image as PILImage
+
+    service = _get_service_client()
+    container_name = _get_container_name()
+    source = service.get_blob_client(container_name, blob_name)
+    with observe_dependency("blob", "download"):
+        data = source.download_blob().readall()
+
+    img = PILImage.open(io.BytesIO(data))
+    img.draft("RGB", (THUMBNAIL_MAX_SIZE, THUMBNAIL_MAX_SIZE))  # JPEG: decodifica já reduzido
+    img = img.convert("RGB")
+    img.thumbnail((THUMBNAIL_MAX_SIZE, THUMBNAIL_MAX_SIZE))
+
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=85)
+    return _upload_derivative(blob_name, out.getvalue())
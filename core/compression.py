@@ -0,0 +1,230 @@
+import os
+import time
+import zlib
+from typing import Any, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from core.metrics import RESPONSE_COMPRESSION_BYTES, RESPONSE_COMPRESSION_SECONDS
+
+try:
+    import brotli
+except ImportError:  # opcional: sem o pacote, só gzip
+    brotli = None
+
+# ----------------------------------------------------------------------
+# Compressão negociada (br/gzip) das respostas.
+#
+# - Codificação escolhida pelo Accept-Encoding (q-values); br tem
+#   preferência no empate, se o pacote `brotli` estiver instalado.
+# - Respostas de corpo único abaixo de COMPRESSION_MIN_BYTES saem como
+#   estão; acima de COMPRESSION_THREAD_BYTES a compressão vai para o
+#   threadpool (um JSON grande da timeline não trava o event loop).
+# - Respostas em streaming (StreamingResponse) são comprimidas chunk a
+#   chunk com flush, sem juntar o corpo inteiro.
+# - Mídia, ZIP e respostas já codificadas passam direto.
+# ----------------------------------------------------------------------
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_THREAD_BYTES = int(os.getenv("COMPRESSION_THREAD_BYTES", str(256 * 1024)))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "5"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+# Já comprimidos (ou binários): recomprimir só gasta CPU
+SKIP_CONTENT_TYPES = (
+    "image/",
+    "video/",
+    "audio/",
+    "font/woff",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/octet-stream",
+    "application/pdf",
+)
+
+
+def supported_encodings() -> tuple:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def select_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Melhor codificação suportada aceita pelo cliente (None = identity).
+    """
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+
+    best, best_q = None, 0.0
+    for encoding in supported_encodings():
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class _GzipCompressor:
+    def __init__(self, level: int = COMPRESSION_GZIP_LEVEL) -> None:
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = cabeçalho gzip
+
+    def compress(self, data: bytes) -> bytes:
+        return self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._z.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self, quality: int = COMPRESSION_BROTLI_QUALITY) -> None:
+        self._c = brotli.Compressor(quality=quality, mode=brotli.MODE_TEXT)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.process(data) + self._c.flush()
+
+    def finish(self) -> bytes:
+        return self._c.finish()
+
+
+def make_compressor(encoding: str, level: Optional[int] = None):
+    if encoding == "br":
+        return _BrotliCompressor(COMPRESSION_BROTLI_QUALITY if level is None else level)
+    return _GzipCompressor(COMPRESSION_GZIP_LEVEL if level is None else level)
+
+
+def compress_bytes(encoding: str, data: bytes, level: Optional[int] = None) -> bytes:
+    """
+    Corpo inteiro de uma vez (sem flushes intermediários).
+    """
+    if encoding == "br":
+        quality = COMPRESSION_BROTLI_QUALITY if level is None else level
+        return brotli.compress(data, quality=quality, mode=brotli.MODE_TEXT)
+    z = zlib.compressobj(COMPRESSION_GZIP_LEVEL if level is None else level, zlib.DEFLATED, 31)
+    return z.compress(data) + z.flush()
+
+
+def _should_compress(status: int, headers: Headers) -> bool:
+    if status < 200 or status in (204, 206, 304):
+        return False
+    if "content-encoding" in headers or "content-range" in headers:
+        return False
+    content_type = headers.get("content-type", "").lower()
+    return bool(content_type) and not content_type.startswith(SKIP_CONTENT_TYPES)
+
+
+class _CompressionResponder:
+    def __init__(self, app: Any, encoding: str, minimum_size: int) -> None:
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Any = None
+        self.start_message: Optional[dict] = None
+        self.mode = "pending"  # pending -> passthrough | stream
+        self.compressor: Any = None
+
+    async def __call__(self, scope, receive, send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_wrapper)
+
+    async def _compress(self, fn, data: bytes) -> bytes:
+        started = time.perf_counter()
+        if len(data) >= COMPRESSION_THREAD_BYTES:
+            out = await run_in_threadpool(fn, data)
+        else:
+            out = fn(data)
+        RESPONSE_COMPRESSION_SECONDS.labels(self.encoding).inc(time.perf_counter() - started)
+        RESPONSE_COMPRESSION_BYTES.labels(self.encoding, "in").inc(len(data))
+        RESPONSE_COMPRESSION_BYTES.labels(self.encoding, "out").inc(len(out))
+        return out
+
+    def _encoded_headers(self) -> MutableHeaders:
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        return headers
+
+    async def send_wrapper(self, message: dict) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            self.start_message = message
+            if not _should_compress(message["status"], Headers(raw=message["headers"])):
+                self.mode = "passthrough"
+                await self.send(message)
+            return
+
+        if self.mode == "passthrough":
+            await self.send(message)
+            return
+
+        if message_type != "http.response.body":
+            # Ex.: pathsend/trailers: não dá para comprimir, segue como veio
+            if self.mode == "pending":
+                self.mode = "passthrough"
+                await self.send(self.start_message)
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.mode == "pending":
+            if not more_body:
+                # Corpo único (JSONResponse etc.)
+                if len(body) < self.minimum_size:
+                    self.mode = "passthrough"
+                    await self.send(self.start_message)
+                    await self.send(message)
+                    return
+                compressed = await self._compress(lambda d: compress_bytes(self.encoding, d), body)
+                headers = self._encoded_headers()
+                headers["Content-Length"] = str(len(compressed))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+
+            # Streaming: tamanho final desconhecido, comprime por chunk
+            self.mode = "stream"
+            self.compressor = make_compressor(self.encoding)
+            headers = self._encoded_headers()
+            del headers["Content-Length"]
+            await self.send(self.start_message)
+
+        data = await self._compress(self.compressor.compress, body) if body else b""
+        if not more_body:
+            data += self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+
+class CompressionMiddleware:
+    """
+    Comprime respostas com br/gzip conforme o Accept-Encoding do cliente.
+    """
+
+    def __init__(self, app: Any, minimum_size: int = COMPRESSION_MIN_BYTES) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = select_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self.app, encoding, self.minimum_size)
+        await responder(scope, receive, send)
@@ -3,9 +3,35 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
+# ------------------------------
+# MongoDB (ver core/database.py)
+# ------------------------------
+MONGODB_URI = os.getenv("MONGODB_URI", "")
 MONGODB_DB = os.getenv("MONGODB_DB", "relluna")
 
+# Pool por worker do gunicorn (4 workers => até 4x MONGO_MAX_POOL_SIZE conexões)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000"))
+
+# Compressão do protocolo (zstd via pymongo[zstd]; snappy exige python-snappy)
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd,zlib")
+
+MONGO_TLS = os.getenv("MONGO_TLS", "1") == "1"
+MONGO_TLS_ALLOW_INVALID_CERTIFICATES = os.getenv("MONGO_TLS_ALLOW_INVALID_CERTIFICATES", "0") == "1"
+
+# Leituras da timeline (listagem, busca, tags, export): "primary",
+# "secondaryPreferred", "nearest"... Fora de primary, a defasagem máxima
+# aceita vem de MONGO_TIMELINE_MAX_STALENESS_SECONDS (mín. 90 s no Mongo).
+MONGO_TIMELINE_READ_PREFERENCE = os.getenv("MONGO_TIMELINE_READ_PREFERENCE", "primary")
+MONGO_TIMELINE_MAX_STALENESS_SECONDS = int(os.getenv("MONGO_TIMELINE_MAX_STALENESS_SECONDS", "-1"))
+
 JWT_SECRET = os.getenv("JWT_SECRET", "mude-esta-chave-em-producao")
 JWT_ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
@@ -1,19 +1,150 @@
-import os
-from motor.motor_asyncio import AsyncIOMotorClient
-from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
 
-load_dotenv()
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
+
+from core.config import (
+    MONGO_COMPRESSORS,
+    MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_MAX_IDLE_TIME_MS,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_SOCKET_TIMEOUT_MS,
+    MONGO_TIMELINE_MAX_STALENESS_SECONDS,
+    MONGO_TIMELINE_READ_PREFERENCE,
+    MONGO_TLS,
+    MONGO_TLS_ALLOW_INVALID_CERTIFICATES,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    MONGODB_DB,
+    MONGODB_URI,
+)
+from core.metrics import MongoCommandMetrics, MongoPoolMetrics
 
-MONGO_URI = os.getenv("MONGODB_URI")
-if not MONGO_URI:
-    raise RuntimeError("MONGODB_URI não definido")
+DB_NAME = MONGODB_DB
 
-DB_NAME = os.getenv("MONGODB_DB", "relluna")
+# ----------------------------------------------------------------------
+# Cliente aberto/fechado no lifespan do app (main.py). O motor só conecta
+# na primeira operação, então abrir antes do fork (preload) é seguro.
+# ----------------------------------------------------------------------
+client: Optional[AsyncIOMotorClient] = None
+_database: Optional[AsyncIOMotorDatabase] = None
+
+
+def create_client(uri: str = MONGODB_URI, **overrides: Any) -> AsyncIOMotorClient:
+    if not uri:
+        raise RuntimeError("MONGODB_URI não definido")
+
+    options = dict(
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+        compressors=MONGO_COMPRESSORS,
+        tls=MONGO_TLS,
+        tlsAllowInvalidCertificates=MONGO_TLS_ALLOW_INVALID_CERTIFICATES,
+        event_listeners=[MongoCommandMetrics(), MongoPoolMetrics()],
+    )
+    options.update(overrides)
+    return AsyncIOMotorClient(uri, **options)
+
+
+def open_database() -> AsyncIOMotorDatabase:
+    global client, _database
+    if _database is None:
+        client = create_client()
+        _database = client[DB_NAME]
+    return _database
+
+
+def close_database() -> None:
+    global client, _database
+    if client is not None:
+        client.close()
+    client = None
+    _database = None
+
+
+def use_database(database: Any) -> None:
+    """
+    Substitui o banco (benchmarks/testes, ex.: mongomock-motor).
+    """
+    global client, _database
+    close_database()
+    _database = database
+
+
+def get_database() -> AsyncIOMotorDatabase:
+    # Fora do lifespan (scripts, ASGITransport) abre sob demanda
+    return _database if _database is not None else open_database()
+
+
+class _DatabaseProxy:
+    """
+    `from core.database import db` continua valendo: os atributos são
+    resolvidos no banco aberto pelo lifespan a cada acesso.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_database(), name)
+
+    def __getitem__(self, name: str) -> Any:
+        return get_database()[name]
+
+
+db = _DatabaseProxy()
+
+
+# ----------------------------------------------------------------------
+# Read preference das leituras da timeline
+# ----------------------------------------------------------------------
+_READ_PREFERENCES = {
+    "primarypreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondarypreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def _timeline_read_preference():
+    mode = _READ_PREFERENCES.get(MONGO_TIMELINE_READ_PREFERENCE.lower())
+    if mode is None:
+        return Primary()
+    return mode(max_staleness=MONGO_TIMELINE_MAX_STALENESS_SECONDS)
+
+
+TIMELINE_READ_PREFERENCE = _timeline_read_preference()
+
+
+def timeline_read_db() -> Any:
+    """
+    Banco com a read preference das leituras da timeline (pode ir a um
+    secundário). Escritas e leituras "read-your-writes" usam `db`.
+    """
+    if isinstance(TIMELINE_READ_PREFERENCE, Primary):
+        return db
+    return get_database().with_options(read_preference=TIMELINE_READ_PREFERENCE)
 
-client = AsyncIOMotorClient(
-    MONGO_URI,
-    tls=True,
-    tlsAllowInvalidCertificates=False,
-)
 
-db = client[DB_NAME]
+@asynccontextmanager
+async def timeline_read_session() -> AsyncIterator[Any]:
+    """
+    Sessão causal para leituras em secundários que precisam ser coerentes
+    entre si (ex.: versão da timeline -> itens do ETag): cada leitura vê
+    pelo menos o estado da anterior. Em primary, não abre sessão (None).
+    """
+    if isinstance(TIMELINE_READ_PREFERENCE, Primary) or client is None:
+        yield None
+        return
+    async with await client.start_session(causal_consistency=True) as session:
+        yield session
@@ -0,0 +1,34 @@
+from typing import Optional
+
+from fastapi import Header, HTTPException, status
+
+from core.security import decode_access_token
+
+# ----------------------------------------------------------------------
+# Dependências de autenticação compartilhadas pelos routers
+# ----------------------------------------------------------------------
+
+
+def get_optional_user_id(authorization: Optional[str] = Header(None)) -> Optional[str]:
+    """
+    Para rotas que funcionam sem login mas fazem mais com ele.
+    """
+    if not authorization:
+        return None
+    return get_current_user_id(authorization)
+
+
+def get_current_user_id(authorization: str = Header(...)) -> str:
+    if not authorization.startswith("Bearer "):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token ausente ou inválido.",
+        )
+    token = authorization.split(" ", 1)[1]
+    try:
+        return decode_access_token(token)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido ou expirado.",
+        )
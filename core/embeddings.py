@@ -0,0 +1,170 @@
+import hashlib
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+from bson import Binary, ObjectId
+from fastapi.concurrency import run_in_threadpool
+from pymongo import UpdateOne
+
+from core.metrics import record_openai_usage
+from core.resilience import acall_with_policy
+from core.vector_index import get_user_index
+
+# "azure" usa o deployment de embeddings do Azure OpenAI;
+# "local" usa o LocalHashingEmbedder (determinístico, para testes/benchmarks).
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "azure")
+OPENAI_EMBEDDING_DEPLOYMENT = os.getenv("OPENAI_EMBEDDING_DEPLOYMENT", "")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "256"))
+EMBEDDING_BATCH_SIZE = 64
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def memory_embedding_text(doc: Dict[str, Any]) -> str:
+    """
+    Texto usado para o embedding: legenda + descrições de acessibilidade + tags.
+    """
+    parts = [
+        doc.get("main_caption") or "",
+        doc.get("alt_text") or "",
+        doc.get("short_description") or "",
+        doc.get("long_description") or "",
+        " ".join(doc.get("tags") or []),
+    ]
+    return "\n".join(p for p in parts if p)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class LocalHashingEmbedder:
+    """
+    Embedding determinístico por feature hashing (palavras + trigramas).
+    Não tem qualidade semântica de um modelo, mas textos parecidos ficam
+    próximos — suficiente para testes e benchmarks sem rede.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM) -> None:
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = _TOKEN_RE.findall(text.lower())
+        grams = [w[i:i + 3] for w in words if len(w) > 3 for i in range(len(w) - 2)]
+        return words + grams
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feat in self._features(text):
+                h = int.from_bytes(
+                    hashlib.blake2b(feat.encode("utf-8"), digest_size=8).digest(),
+                    "little",
+                )
+                sign = 1.0 if h & 1 else -1.0
+                out[row, (h >> 1) % self.dim] += sign
+        return _normalize(out)
+
+
+async def embed_texts(texts: Sequence[str]) -> np.ndarray:
+    """
+    Matriz (n, EMBEDDING_DIM) float32, linhas com norma 1.
+    """
+    if EMBEDDING_BACKEND == "local":
+        return LocalHashingEmbedder(EMBEDDING_DIM).embed(texts)
+
+    if not OPENAI_EMBEDDING_DEPLOYMENT:
+        raise RuntimeError("OPENAI_EMBEDDING_DEPLOYMENT não definido.")
+
+    from core.llm import OPENAI_TIMEOUT_SECONDS, get_openai_async_client
+
+    async def _call(timeout: float):
+        return await get_openai_async_client().embeddings.create(
+            model=OPENAI_EMBEDDING_DEPLOYMENT,
+            input=list(texts),
+            dimensions=EMBEDDING_DIM,
+            timeout=timeout,
+        )
+
+    resp = await acall_with_policy("openai", "embeddings", _call, OPENAI_TIMEOUT_SECONDS)
+    record_openai_usage(OPENAI_EMBEDDING_DEPLOYMENT, resp)
+    vectors = [item.embedding for item in sorted(resp.data, key=lambda d: d.index)]
+    return _normalize(np.asarray(vectors, dtype=np.float32))
+
+
+def vector_from_binary(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.float32)
+
+
+async def embed_memories(db, user_id: str, docs: List[Dict[str, Any]]) -> int:
+    """
+    Calcula e grava o embedding (float32) de cada memória em
+    memory_embeddings e atualiza o índice vetorial local do usuário. Retorna quantas foram processadas.
+    """
+    docs = [d for d in docs if memory_embedding_text(d)]
+    done = 0
+
+    for start in range(0, len(docs), EMBEDDING_BATCH_SIZE):
+        batch = docs[start:start + EMBEDDING_BATCH_SIZE]
+        vectors = await embed_texts([memory_embedding_text(d) for d in batch])
+
+        now = datetime.utcnow()
+        await db.memory_embeddings.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": d["_id"]},
+                    {
+                        "$set": {
+                            "user_id": ObjectId(user_id),
+                            "vector": Binary(vec.tobytes()),
+                            "dim": EMBEDDING_DIM,
+                            "updated_at": now,
+                        }
+                    },
+                    upsert=True,
+                )
+                for d, vec in zip(batch, vectors)
+            ],
+            ordered=False,
+        )
+        # Só um marcador na memória: o vetor não pesa nas leituras da timeline.
+        await db.timeline_items.update_many(
+            {"_id": {"$in": [d["_id"] for d in batch]}},
+            {"$set": {"embedded_at": now}},
+        )
+        # flock + escrita em disco: fora do event loop
+        await run_in_threadpool(
+            get_user_index(user_id, EMBEDDING_DIM).upsert,
+            [str(d["_id"]) for d in batch],
+            vectors,
+        )
+        done += len(batch)
+
+    return done
+
+
+async def rebuild_user_index(db, user_id: str) -> int:
+    """
+    Reconstrói o índice local a partir dos embeddings gravados no Mongo
+    (ex.: worker novo, disco efêmero, troca de EMBEDDING_DIM).
+    """
+    ids: List[str] = []
+    rows: List[np.ndarray] = []
+    cursor = db.memory_embeddings.find(
+        {"user_id": ObjectId(user_id), "dim": EMBEDDING_DIM},
+        {"vector": 1},
+    ).batch_size(1000)
+    async for doc in cursor:
+        vec = vector_from_binary(doc["vector"])
+        if vec.shape[0] == EMBEDDING_DIM:
+            ids.append(str(doc["_id"]))
+            rows.append(vec)
+
+    matrix = np.vstack(rows) if rows else np.zeros((0, EMBEDDING_DIM), np.float32)
+    await run_in_threadpool(get_user_index(user_id, EMBEDDING_DIM).rebuild, ids, matrix)
+    return len(ids)
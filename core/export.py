@@ -0,0 +1,223 @@
+import io
+import os
+import zipfile
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+import requests
+from bson import ObjectId
+from fastapi.concurrency import run_in_threadpool
+
+from core.blob_storage import is_own_blob_url
+from core.reluminations import RELUMINATION_OUTPUT_DIR, _resolve_local_source_path
+from core.serialization import dumps
+
+# Lotes pequenos do cursor: a memória do worker não cresce com a conta.
+EXPORT_BATCH_SIZE = 100
+EXPORT_CHUNK_SIZE = 64 * 1024
+REMOTE_TIMEOUT_SECONDS = 30
+# Únicos diretórios locais exportáveis (media_url/relumination_url vêm do
+# cliente: um caminho relativo qualquer não pode virar leitura de disco)
+EXPORT_LOCAL_ROOTS = ("uploads", RELUMINATION_OUTPUT_DIR)
+
+
+class _ZipSink(io.RawIOBase):
+    """
+    Destino não-seekable do ZipFile: acumula apenas o que foi escrito
+    desde o último drain(). O zipfile passa a usar data descriptors,
+    então nenhum arquivo temporário é necessário.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._written = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        data = bytes(b)
+        self._chunks.append(data)
+        self._written += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._written
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _user_cursor(db, user_id: str):
+    return (
+        db.timeline_items.find({"user_id": ObjectId(user_id)})
+        .sort("created_at", 1)
+        .batch_size(EXPORT_BATCH_SIZE)
+    )
+
+
+async def iter_memories_ndjson(
+    db,
+    user_id: str,
+    to_dict: Callable[[Dict[str, Any]], Dict[str, Any]],
+) -> AsyncIterator[bytes]:
+    """
+    Uma memória por linha, direto do cursor do Motor.
+    """
+    async for doc in _user_cursor(db, user_id):
+        yield dumps(to_dict(doc)) + b"\n"
+
+
+def _extension(url: str, default: str) -> str:
+    path = url.split("?", 1)[0]
+    name = path.rsplit("/", 1)[-1]
+    if "." in name:
+        return "." + name.rsplit(".", 1)[-1].lower()
+    return default
+
+
+def _allowed_local_path(path: str) -> Optional[str]:
+    real = os.path.realpath(path)
+    for root in EXPORT_LOCAL_ROOTS:
+        real_root = os.path.realpath(root)
+        if real != real_root and os.path.commonpath([real, real_root]) == real_root:
+            return real
+    return None
+
+
+async def _iter_source(url: str) -> AsyncIterator[bytes]:
+    """
+    Lê um arquivo local (uploads/, media/reluminations/) ou do nosso Blob
+    em blocos, sempre fora do event loop. Qualquer outra origem (caminho
+    fora desses diretórios, outro host) lança ValueError sem ser lida.
+    """
+    local_path = _resolve_local_source_path(url)
+    if local_path is not None:
+        local_path = _allowed_local_path(local_path)
+        if local_path is None:
+            raise ValueError("origem local não permitida")
+        try:
+            f = await run_in_threadpool(open, local_path, "rb")
+        except OSError:
+            raise ValueError("arquivo local indisponível")
+        try:
+            while True:
+                chunk = await run_in_threadpool(f.read, EXPORT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            f.close()
+        return
+
+    if not is_own_blob_url(url):
+        raise ValueError("origem remota não permitida")
+
+    resp = await run_in_threadpool(
+        requests.get,
+        url,
+        stream=True,
+        timeout=REMOTE_TIMEOUT_SECONDS,
+        allow_redirects=False,
+    )
+    try:
+        resp.raise_for_status()
+        it: Iterator[bytes] = resp.iter_content(EXPORT_CHUNK_SIZE)
+        while True:
+            chunk = await run_in_threadpool(next, it, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        resp.close()
+
+
+async def iter_memories_zip(
+    db,
+    user_id: str,
+    to_dict: Callable[[Dict[str, Any]], Dict[str, Any]],
+) -> AsyncIterator[bytes]:
+    """
+    ZIP em streaming: memories.ndjson + arquivos de mídia e reluminações.
+    Cada entrada é escrita bloco a bloco e enviada assim que produzida.
+    """
+    sink = _ZipSink()
+    zf = zipfile.ZipFile(sink, mode="w", allowZip64=True)
+    now = datetime.utcnow().timetuple()[:6]
+
+    def _entry(name: str, compress: bool):
+        info = zipfile.ZipInfo(name, date_time=now)
+        info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        return zf.open(info, mode="w", force_zip64=True)
+
+    # 1) Metadados (primeira passada no cursor)
+    with _entry("memories.ndjson", compress=True) as out:
+        async for line in iter_memories_ndjson(db, user_id, to_dict):
+            out.write(line)
+            data = sink.drain()
+            if data:
+                yield data
+
+    # 2) Mídias (segunda passada, só os campos de URL)
+    errors: List[str] = []
+    cursor = db.timeline_items.find(
+        {"user_id": ObjectId(user_id)},
+        {"media_url": 1, "relumination_url": 1, "relumination_mp4_url": 1},
+    ).sort("created_at", 1).batch_size(EXPORT_BATCH_SIZE)
+
+    async for doc in cursor:
+        memory_id = str(doc["_id"])
+        sources: List[tuple] = []
+        if doc.get("media_url"):
+            url = doc["media_url"]
+            sources.append((url, f"media/{memory_id}{_extension(url, '.jpg')}"))
+        # O .m3u8 (HLS) não é um arquivo exportável: usa o MP4
+        url = doc.get("relumination_mp4_url") or doc.get("relumination_url")
+        if url:
+            sources.append((url, f"reluminations/{memory_id}{_extension(url, '.mp4')}"))
+
+        for url, name in sources:
+            chunks = _iter_source(url)
+            # Abre a origem antes da entrada: o que falha logo (origem não
+            # permitida, 404, arquivo ausente) não deixa entrada vazia no ZIP
+            try:
+                chunk = await anext(chunks, b"")
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+                await chunks.aclose()
+                continue
+
+            # Num ZIP em streaming a entrada aberta não pode ser desfeita:
+            # a falha no meio fica registrada em export_errors.txt
+            written = 0
+            try:
+                with _entry(name, compress=False) as out:
+                    while chunk:
+                        out.write(chunk)
+                        written += len(chunk)
+                        yield sink.drain()
+                        chunk = await anext(chunks, b"")
+            except Exception as e:
+                errors.append(f"{name}: incompleto ({written} bytes): {e}")
+            finally:
+                await chunks.aclose()
+            data = sink.drain()
+            if data:
+                yield data
+
+    if errors:
+        with _entry("export_errors.txt", compress=True) as out:
+            out.write("\n".join(errors).encode("utf-8"))
+
+    zf.close()
+    yield sink.drain()
+
+
+def export_filename(user_id: str, ext: str, now: Optional[datetime] = None) -> str:
+    stamp = (now or datetime.utcnow()).strftime("%Y%m%d-%H%M%S")
+    return f"relluna-{user_id}-{stamp}.{ext}"
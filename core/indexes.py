@@ -0,0 +1,128 @@
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+from core.accessibility_cache import ACCESSIBILITY_CACHE_TTL_SECONDS
+from core.search import (
+    TAG_FACET_INDEX,
+    TEXT_SEARCH_INDEX,
+    TEXT_SEARCH_LANGUAGE,
+    TEXT_SEARCH_WEIGHTS,
+)
+from core.sync import TOMBSTONE_RETENTION_DAYS
+
+# Campos da visão "summary" da timeline (grid de miniaturas).
+# Todos estão no índice de cobertura abaixo: a consulta é respondida
+# só pelo índice, sem ler os documentos.
+TIMELINE_SUMMARY_FIELDS = (
+    "main_caption",
+    "media_url",
+    "poster_url",
+    "created_at",
+    "relumination_url",
+)
+
+TIMELINE_SUMMARY_INDEX = [
+    ("user_id", ASCENDING),
+    ("created_at", DESCENDING),
+    ("_id", ASCENDING),
+    ("main_caption", ASCENDING),
+    ("media_url", ASCENDING),
+    ("poster_url", ASCENDING),
+    ("relumination_url", ASCENDING),
+]
+
+# Versões anteriores do índice de cobertura (removidas ao subir a nova)
+TIMELINE_SUMMARY_LEGACY_INDEXES = ("timeline_summary_covering",)
+
+
+async def ensure_indexes(db) -> None:
+    """
+    Cria (idempotente) os índices usados pelas consultas da API.
+    """
+    await db.timeline_items.create_index(
+        TIMELINE_SUMMARY_INDEX,
+        name="timeline_summary_covering_v2",
+    )
+    for legacy in TIMELINE_SUMMARY_LEGACY_INDEXES:
+        try:
+            await db.timeline_items.drop_index(legacy)
+        except OperationFailure:
+            pass  # já removido
+
+    # Delta-sync: alterações e tombstones por (user_id, timestamp, _id)
+    await db.timeline_items.create_index(
+        [("user_id", ASCENDING), ("updated_at", ASCENDING), ("_id", ASCENDING)],
+        name="timeline_sync",
+    )
+    await db.timeline_tombstones.create_index(
+        [("user_id", ASCENDING), ("deleted_at", ASCENDING), ("_id", ASCENDING)],
+        name="tombstones_sync",
+    )
+    await db.timeline_tombstones.create_index(
+        "deleted_at",
+        name="tombstones_ttl",
+        expireAfterSeconds=TOMBSTONE_RETENTION_DAYS * 24 * 3600,
+    )
+
+    # Busca textual (pt) e facetas de tags
+    await db.timeline_items.create_index(
+        TEXT_SEARCH_INDEX,
+        name="timeline_text_search",
+        default_language=TEXT_SEARCH_LANGUAGE,
+        weights=TEXT_SEARCH_WEIGHTS,
+    )
+    await db.timeline_items.create_index(TAG_FACET_INDEX, name="timeline_tags")
+
+    # Embeddings (reconstrução do índice vetorial por usuário)
+    await db.memory_embeddings.create_index(
+        [("user_id", ASCENDING), ("dim", ASCENDING)],
+        name="embeddings_user",
+    )
+
+    # Acessibilidade especulativa (por blob_url): expira sozinha
+    await db.accessibility_cache.create_index(
+        "created_at",
+        name="accessibility_cache_ttl",
+        expireAfterSeconds=ACCESSIBILITY_CACHE_TTL_SECONDS,
+    )
+
+    # Refresh tokens: expiram sozinhos; revogação por sessão e por device
+    await db.refresh_tokens.create_index(
+        "expires_at",
+        name="refresh_tokens_ttl",
+        expireAfterSeconds=0,
+    )
+    await db.refresh_tokens.create_index(
+        [("user_id", ASCENDING), ("family_id", ASCENDING)],
+        name="refresh_tokens_session",
+    )
+    await db.refresh_tokens.create_index(
+        [("user_id", ASCENDING), ("device_id", ASCENDING)],
+        name="refresh_tokens_device",
+    )
+
+    # Hashes perceptuais (quase-duplicatas), relidos por usuário em ordem de created_at
+    await db.media_hashes.create_index(
+        [("user_id", ASCENDING), ("created_at", ASCENDING)],
+        name="media_hashes_user_created",
+    )
+    try:
+        await db.media_hashes.drop_index("media_hashes_user")  # antigo, por _id
+    except OperationFailure:
+        pass
+    # Exclusão da memória remove o hash da mídia correspondente
+    await db.media_hashes.create_index(
+        [("user_id", ASCENDING), ("media_url", ASCENDING)],
+        name="media_hashes_user_media",
+    )
+
+
+async def backfill_updated_at(db) -> None:
+    """
+    Memórias antigas (sem updated_at) herdam created_at, para entrarem
+    no keyset do delta-sync.
+    """
+    await db.timeline_items.update_many(
+        {"updated_at": {"$exists": False}},
+        [{"$set": {"updated_at": "$created_at"}}],
+    )
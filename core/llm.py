@@ -0,0 +1,57 @@
+import os
+import threading
+from typing import Any, Optional
+
+OPENAI_ENDPOINT = os.getenv("OPENAI_ENDPOINT", "")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+OPENAI_DEPLOYMENT = os.getenv("OPENAI_DEPLOYMENT", "")
+OPENAI_API_VERSION = "2024-12-01-preview"
+
+# Teto por chamada; retries ficam com core/resilience.py (SDK sem retries)
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "20"))
+
+# ----------------------------------------------------------------------
+# Clientes criados no primeiro uso: o SDK `openai` custa ~0.3 s de import
+# e não deve pesar no boot de cada worker. Os benchmarks podem atribuir
+# substitutos diretamente a openai_client / openai_async_client.
+# ----------------------------------------------------------------------
+openai_client: Optional[Any] = None
+
+# Cliente assíncrono para fan-out concorrente (jobs em lote)
+openai_async_client: Optional[Any] = None
+
+_lock = threading.Lock()
+
+
+def _client_kwargs() -> dict:
+    if not OPENAI_ENDPOINT or not OPENAI_API_KEY or not OPENAI_DEPLOYMENT:
+        raise RuntimeError("OPENAI configs não definidas corretamente.")
+    return {
+        "azure_endpoint": OPENAI_ENDPOINT,
+        "api_key": OPENAI_API_KEY,
+        "api_version": OPENAI_API_VERSION,
+        "timeout": OPENAI_TIMEOUT_SECONDS,
+        "max_retries": 0,
+    }
+
+
+def get_openai_client():
+    global openai_client
+    if openai_client is None:
+        with _lock:
+            if openai_client is None:
+                from openai import AzureOpenAI
+
+                openai_client = AzureOpenAI(**_client_kwargs())
+    return openai_client
+
+
+def get_openai_async_client():
+    global openai_async_client
+    if openai_async_client is None:
+        with _lock:
+            if openai_async_client is None:
+                from openai import AsyncAzureOpenAI
+
+                openai_async_client = AsyncAzureOpenAI(**_client_kwargs())
+    return openai_async_client
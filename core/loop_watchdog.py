@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.metrics import EVENT_LOOP_LAG, EVENT_LOOP_STALLS, route_label
+
+# ----------------------------------------------------------------------
+# Detector de bloqueio do event loop (opt-in).
+#
+# LOOP_WATCHDOG_MS=0 (padrão) desliga tudo. Com um limite > 0:
+#   - uma corrotina "heartbeat" mede o atraso (lag) do loop;
+#   - uma thread vigia o heartbeat e, se o loop ficar parado além do
+#     limite, captura a pilha da thread do loop e a rota da task atual;
+#   - o log é limitado por (rota, frame) a 1 a cada LOOP_WATCHDOG_LOG_INTERVAL s.
+# LOOP_WATCHDOG_STRICT=1 (testes): a requisição que bloqueou falha com
+# LoopBlockedError.
+# ----------------------------------------------------------------------
+LOOP_WATCHDOG_MS = float(os.getenv("LOOP_WATCHDOG_MS", "0"))
+LOOP_WATCHDOG_STRICT = os.getenv("LOOP_WATCHDOG_STRICT", "0") == "1"
+LOOP_WATCHDOG_LOG_INTERVAL = float(os.getenv("LOOP_WATCHDOG_LOG_INTERVAL", "60"))
+
+STACK_LIMIT = 25
+
+logger = logging.getLogger("relluna.loop_watchdog")
+
+
+class LoopBlockedError(RuntimeError):
+    pass
+
+
+class Stall:
+    def __init__(self, route: str, stack: List[str], started_at: float) -> None:
+        self.route = route
+        self.stack = stack
+        self.started_at = started_at
+        self.duration_ms: Optional[float] = None
+
+    def describe(self) -> str:
+        duration = f"{self.duration_ms:.0f} ms" if self.duration_ms else "em andamento"
+        return f"{self.route} bloqueou o event loop ({duration})\n" + "".join(self.stack)
+
+
+class LoopWatchdog:
+    def __init__(self, threshold_ms: float) -> None:
+        self.threshold = threshold_ms / 1000
+        self.interval = max(self.threshold / 4, 0.005)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._beat = time.perf_counter()
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+        self._lock = threading.Lock()
+        self._scopes: Dict[asyncio.Task, dict] = {}
+        self._task_stalls: Dict[asyncio.Task, List[Stall]] = {}
+        self._pending: Optional[Tuple[float, Stall]] = None
+        self._last_logged: Dict[Tuple[str, str], float] = {}
+        self._suppressed: Dict[Tuple[str, str], int] = {}
+        self.stalls: List[Stall] = []
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.perf_counter()
+        self._heartbeat = self._loop.create_task(self._run_heartbeat())
+        self._thread = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._heartbeat:
+            self._heartbeat.cancel()
+        if self._thread:
+            self._thread.join(timeout=1)
+
+    # ------------------------------------------------------------------
+    # Atribuição de rota
+    # ------------------------------------------------------------------
+    def register_task(self, scope: dict) -> Optional[asyncio.Task]:
+        task = asyncio.current_task()
+        if task is not None:
+            with self._lock:
+                self._scopes[task] = scope
+        return task
+
+    def release_task(self, task: Optional[asyncio.Task]) -> List[Stall]:
+        if task is None:
+            return []
+        with self._lock:
+            self._scopes.pop(task, None)
+            return self._task_stalls.pop(task, [])
+
+    # ------------------------------------------------------------------
+    # Heartbeat (no loop) e vigia (thread)
+    # ------------------------------------------------------------------
+    async def _run_heartbeat(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            self._beat = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - expected, 0.0)
+            EVENT_LOOP_LAG.observe(lag)
+
+            with self._lock:
+                pending, self._pending = self._pending, None
+            if pending is not None:
+                pending[1].duration_ms = (time.perf_counter() - pending[1].started_at) * 1000
+                self._report(pending[1])
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.interval):
+            beat = self._beat
+            blocked_for = time.perf_counter() - beat
+            if blocked_for < self.threshold + self.interval:
+                continue
+            with self._lock:
+                if self._pending is not None and self._pending[0] == beat:
+                    continue  # já capturado neste bloqueio
+            self._capture(beat)
+
+    def _capture(self, beat: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame, limit=STACK_LIMIT) if frame else []
+
+        task = asyncio.current_task(self._loop)
+        with self._lock:
+            scope = self._scopes.get(task) if task is not None else None
+            route = route_label(scope) if scope is not None else "<background>"
+            stall = Stall(route, stack, beat + self.interval)
+            self._pending = (beat, stall)
+            if scope is not None:
+                self._task_stalls.setdefault(task, []).append(stall)
+
+    def _report(self, stall: Stall) -> None:
+        self.stalls.append(stall)
+        del self.stalls[:-100]
+        EVENT_LOOP_STALLS.labels(stall.route).inc()
+
+        top = stall.stack[-1].strip().splitlines()[0] if stall.stack else "?"
+        key = (stall.route, top)
+        now = time.monotonic()
+        if now - self._last_logged.get(key, 0.0) < LOOP_WATCHDOG_LOG_INTERVAL:
+            self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            return
+
+        suppressed = self._suppressed.pop(key, 0)
+        self._last_logged[key] = now
+        logger.warning(
+            "%s%s",
+            stall.describe(),
+            f"\n(+{suppressed} ocorrências suprimidas)" if suppressed else "",
+        )
+
+
+_watchdog: Optional[LoopWatchdog] = None
+
+
+def get_watchdog() -> Optional[LoopWatchdog]:
+    return _watchdog
+
+
+def start_watchdog(threshold_ms: float = LOOP_WATCHDOG_MS) -> Optional[LoopWatchdog]:
+    global _watchdog
+    if threshold_ms <= 0 or _watchdog is not None:
+        return _watchdog
+    _watchdog = LoopWatchdog(threshold_ms)
+    _watchdog.start()
+    return _watchdog
+
+
+async def stop_watchdog() -> None:
+    global _watchdog
+    if _watchdog is not None:
+        await _watchdog.stop()
+        _watchdog = None
+
+
+@contextmanager
+def fail_on_blocking():
+    """
+    Para testes/benchmarks: falha se algum bloqueio acima do limite
+    ocorrer dentro do bloco.
+    """
+    watchdog = get_watchdog()
+    if watchdog is None:
+        raise RuntimeError("Watchdog desligado (LOOP_WATCHDOG_MS=0).")
+    before = len(watchdog.stalls)
+    yield watchdog
+    new = watchdog.stalls[before:]
+    with watchdog._lock:
+        if watchdog._pending is not None:
+            new.append(watchdog._pending[1])
+    if new:
+        raise LoopBlockedError("\n\n".join(s.describe() for s in new))
+
+
+class LoopWatchdogMiddleware:
+    """
+    Associa a task da requisição ao scope (para atribuir bloqueios à rota)
+    e, em modo estrito, falha a requisição que bloqueou o loop.
+    Sem watchdog ativo, apenas repassa a chamada.
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        watchdog = _watchdog
+        if watchdog is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        task = watchdog.register_task(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            stalls = watchdog.release_task(task)
+
+        if LOOP_WATCHDOG_STRICT and stalls:
+            raise LoopBlockedError("\n\n".join(s.describe() for s in stalls))
@@ -0,0 +1,61 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from bson import ObjectId
+
+# ----------------------------------------------------------------------
+# Derivados de mídia calculados no upload (tipo, pôster, metadados de
+# vídeo), guardados por media_url na coleção media_derivatives.
+#
+# A criação da memória copia daqui para o documento: o cliente só envia
+# a media_url, e poster_url/video_metadata nunca vêm do corpo da
+# requisição (a Reluminação baixa o pôster, então ele não pode ser uma
+# URL qualquer escolhida pelo cliente).
+# ----------------------------------------------------------------------
+DERIVED_FIELDS = ("media_type", "poster_url", "video_metadata")
+
+
+async def record_media_derivatives(
+    db,
+    user_id: str,
+    media_url: str,
+    media_type: str,
+    poster_url: Optional[str] = None,
+    video_metadata: Optional[Dict[str, Any]] = None,
+) -> None:
+    """
+    media_type: "image" ou "video" (mesmos valores de MemoryPublic).
+    """
+    await db.media_derivatives.replace_one(
+        {"_id": media_url},
+        {
+            "user_id": ObjectId(user_id),
+            "media_type": media_type,
+            "poster_url": poster_url,
+            "video_metadata": video_metadata,
+            "created_at": datetime.utcnow(),
+        },
+        upsert=True,
+    )
+
+
+async def find_media_derivatives(
+    db,
+    user_id: str,
+    media_urls: Iterable[Optional[str]],
+) -> Dict[str, Dict[str, Any]]:
+    """
+    {media_url: {media_type, poster_url, video_metadata}} do usuário;
+    URLs sem registro (ex.: mídia externa) ficam de fora.
+    """
+    urls = list({url for url in media_urls if url})
+    if not urls:
+        return {}
+    cursor = db.media_derivatives.find(
+        {"_id": {"$in": urls}, "user_id": ObjectId(user_id)},
+        {field: 1 for field in DERIVED_FIELDS},
+    )
+    return {
+        doc["_id"]: {field: doc.get(field) for field in DERIVED_FIELDS}
+        async for doc in cursor
+    }
@@ -0,0 +1,317 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from pymongo import monitoring
+
+# ----------------------------------------------------------------------
+# Com vários workers do gunicorn (startup.sh), cada processo grava suas
+# métricas em PROMETHEUS_MULTIPROC_DIR e o /metrics agrega todos.
+# ----------------------------------------------------------------------
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "relluna_http_request_duration_seconds",
+    "Latência por rota (template do path).",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+DEPENDENCY_CALL_DURATION = Histogram(
+    "relluna_dependency_call_duration_seconds",
+    "Duração de chamadas externas (mongo, blob, vision, openai, render).",
+    ["dependency", "operation", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+
+OPENAI_TOKENS = Counter(
+    "relluna_openai_tokens_total",
+    "Tokens consumidos no Azure OpenAI.",
+    ["deployment", "kind"],
+)
+
+# Pool do Mongo (por worker; no modo multiprocess as gauges somam os vivos)
+MONGO_POOL_CHECKOUT_WAIT = Histogram(
+    "relluna_mongo_pool_checkout_wait_seconds",
+    "Espera para obter uma conexão do pool do Mongo.",
+    ["outcome"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+
+MONGO_POOL_CHECKED_OUT = Gauge(
+    "relluna_mongo_pool_checked_out_connections",
+    "Conexões do Mongo em uso (checked out).",
+    multiprocess_mode="livesum",
+)
+
+MONGO_POOL_OPEN = Gauge(
+    "relluna_mongo_pool_open_connections",
+    "Conexões do Mongo abertas (em uso + ociosas).",
+    multiprocess_mode="livesum",
+)
+
+DEPENDENCY_RETRIES = Counter(
+    "relluna_dependency_retries_total",
+    "Novas tentativas de chamadas externas (core/resilience.py).",
+    ["dependency"],
+)
+
+DEPENDENCY_REJECTED = Counter(
+    "relluna_dependency_rejected_total",
+    "Chamadas externas recusadas sem tentar (circuito aberto / prazo esgotado).",
+    ["dependency", "reason"],
+)
+
+CIRCUIT_BREAKER_OPEN = Gauge(
+    "relluna_circuit_breaker_open",
+    "1 se o circuit breaker da dependência está aberto.",
+    ["dependency"],
+    multiprocess_mode="livemax",
+)
+
+# Fila de renderização (core/render_scheduler.py)
+RENDER_QUEUE_WAIT = Histogram(
+    "relluna_render_queue_wait_seconds",
+    "Espera na fila até o render começar, por classe de plano.",
+    ["priority"],
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+
+RENDER_REJECTED = Counter(
+    "relluna_render_rejected_total",
+    "Renders recusados na admissão (429), por motivo.",
+    ["reason"],
+)
+
+RENDER_QUEUE_DEPTH = Gauge(
+    "relluna_render_queue_depth",
+    "Renders aguardando vaga.",
+    multiprocess_mode="livesum",
+)
+
+RENDER_RUNNING = Gauge(
+    "relluna_render_running",
+    "Renders em execução.",
+    multiprocess_mode="livesum",
+)
+
+USER_STATS_DRIFT = Counter(
+    "relluna_user_stats_drift_total",
+    "Correções feitas pela reconciliação de user_stats, por campo.",
+    ["field"],
+)
+
+RESPONSE_COMPRESSION_BYTES = Counter(
+    "relluna_response_compression_bytes_total",
+    "Bytes de resposta antes (in) e depois (out) da compressão, por codificação.",
+    ["encoding", "stage"],
+)
+
+RESPONSE_COMPRESSION_SECONDS = Counter(
+    "relluna_response_compression_seconds_total",
+    "Tempo de CPU gasto comprimindo respostas, por codificação.",
+    ["encoding"],
+)
+
+ACCESSIBILITY_CACHE = Counter(
+    "relluna_accessibility_cache_total",
+    "Pedidos de /accessibility por origem do resultado (geração especulativa).",
+    ["outcome"],
+)
+
+EVENT_LOOP_LAG = Histogram(
+    "relluna_event_loop_lag_seconds",
+    "Atraso do event loop medido pelo heartbeat do watchdog.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+
+EVENT_LOOP_STALLS = Counter(
+    "relluna_event_loop_stalls_total",
+    "Bloqueios do event loop acima de LOOP_WATCHDOG_MS, por rota.",
+    ["route"],
+)
+
+# Acumulador por requisição (segundos por dependência). Só existe quando
+# alguém o ativa (ex.: profiling sob demanda); fora isso fica None.
+dependency_timing: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "dependency_timing", default=None
+)
+
+
+def _add_timing(dependency: str, elapsed: float) -> None:
+    timing = dependency_timing.get()
+    if timing is not None:
+        timing[dependency] = timing.get(dependency, 0.0) + elapsed
+
+
+# ----------------------------------------------------------------------
+# Dependências externas
+# ----------------------------------------------------------------------
+class observe_dependency:
+    """
+    Cronometra uma chamada externa (uso síncrono ou dentro de async def):
+
+        with observe_dependency("vision", "analyze") as call:
+            ...
+            call.outcome = "error"   # opcional, p/ falhas sem exceção
+    """
+
+    def __init__(self, dependency: str, operation: str) -> None:
+        self.dependency = dependency
+        self.operation = operation
+        self.outcome = "ok"
+        self.elapsed = 0.0
+        self._start = 0.0
+
+    def __enter__(self) -> "observe_dependency":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.outcome = "error"
+        self.elapsed = time.perf_counter() - self._start
+        DEPENDENCY_CALL_DURATION.labels(
+            self.dependency, self.operation, self.outcome
+        ).observe(self.elapsed)
+        _add_timing(self.dependency, self.elapsed)
+
+
+def record_openai_usage(deployment: str, resp: Any) -> None:
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return
+    OPENAI_TOKENS.labels(deployment, "prompt").inc(usage.prompt_tokens or 0)
+    OPENAI_TOKENS.labels(deployment, "completion").inc(
+        getattr(usage, "completion_tokens", 0) or 0
+    )
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    Duração de cada comando Mongo (find, insert, aggregate...),
+    registrada via event_listeners do cliente.
+    """
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        elapsed = event.duration_micros / 1e6
+        DEPENDENCY_CALL_DURATION.labels("mongo", event.command_name, "ok").observe(elapsed)
+        _add_timing("mongo", elapsed)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        elapsed = event.duration_micros / 1e6
+        DEPENDENCY_CALL_DURATION.labels("mongo", event.command_name, "error").observe(elapsed)
+        _add_timing("mongo", elapsed)
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Espera por conexão (checkout) e ocupação do pool, para dimensionar
+    MONGO_MAX_POOL_SIZE por worker.
+    """
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        MONGO_POOL_OPEN.inc()
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        MONGO_POOL_OPEN.dec()
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+    def connection_check_out_failed(self, event) -> None:
+        MONGO_POOL_CHECKOUT_WAIT.labels(event.reason).observe(event.duration or 0.0)
+
+    def connection_checked_out(self, event) -> None:
+        MONGO_POOL_CHECKOUT_WAIT.labels("ok").observe(event.duration or 0.0)
+        MONGO_POOL_CHECKED_OUT.inc()
+
+    def connection_checked_in(self, event) -> None:
+        MONGO_POOL_CHECKED_OUT.dec()
+
+
+# ----------------------------------------------------------------------
+# Latência por rota (middleware ASGI puro: não bufferiza o corpo)
+# ----------------------------------------------------------------------
+def route_label(scope: dict) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path:
+        return path
+    # Mounts (/uploads, /media) e 404: não usa o path cru (cardinalidade)
+    raw = scope.get("path", "")
+    for prefix in ("/uploads", "/media"):
+        if raw.startswith(prefix + "/"):
+            return prefix
+    return "<unmatched>"
+
+
+class MetricsMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def _send(message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], route_label(scope), str(status["code"])
+            ).observe(time.perf_counter() - start)
+
+
+# ----------------------------------------------------------------------
+# Exposição (/metrics)
+# ----------------------------------------------------------------------
+def render_metrics(registry: Optional[CollectorRegistry] = None) -> Tuple[bytes, str]:
+    if registry is None:
+        if PROMETHEUS_MULTIPROC_DIR:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,173 @@
+import asyncio
+import io
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+from bson import ObjectId
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image as PILImage
+
+# dHash 64 bits: distância de Hamming <= limite => provável quase-duplicata
+# (rajadas, re-edições, recompressão).
+NEAR_DUPLICATE_MAX_DISTANCE = int(os.getenv("NEAR_DUPLICATE_MAX_DISTANCE", "10"))
+NEAR_DUPLICATE_MAX_RESULTS = 5
+# Índices em memória: LRU por usuário; recarga completa de tempos em tempos
+# para refletir exclusões feitas em outros workers
+PHASH_INDEX_MAX_USERS = int(os.getenv("PHASH_INDEX_MAX_USERS", "1000"))
+PHASH_INDEX_MAX_AGE_SECONDS = float(os.getenv("PHASH_INDEX_MAX_AGE_SECONDS", "600"))
+# ObjectIds de workers diferentes não são monotônicos no mesmo segundo:
+# a releitura incremental usa created_at recuando esta janela (+ dedupe por _id)
+PHASH_REFRESH_OVERLAP_SECONDS = float(os.getenv("PHASH_REFRESH_OVERLAP_SECONDS", "5"))
+
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def dhash(data: bytes) -> int:
+    """
+    Difference hash (9x8 em tons de cinza) de uma imagem em bytes.
+    Para JPEG, draft() decodifica já reduzido (1/8), mesmo para 48 MP.
+    """
+    img = PILImage.open(io.BytesIO(data))
+    img.draft("L", (64, 64))
+    img = img.convert("L").resize((9, 8), PILImage.LANCZOS)
+
+    px = np.asarray(img, dtype=np.int16)
+    bits = (px[:, 1:] > px[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def _to_int64(h: int) -> int:
+    # Mongo só guarda int64 com sinal
+    return h - (1 << 64) if h >= (1 << 63) else h
+
+
+def hamming_distances(hashes: np.ndarray, h: int) -> np.ndarray:
+    """
+    Distância de Hamming de `h` para todos os hashes (uint64) de uma vez.
+    """
+    x = np.bitwise_xor(hashes, np.uint64(h))
+    return _POPCOUNT8[x.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+class _UserHashIndex:
+    """
+    Hashes de um usuário em memória (np.uint64) + URLs correspondentes.
+    Atualizado de forma incremental por created_at (com sobreposição e
+    dedupe por _id), então uploads feitos em outros workers também
+    aparecem, mesmo com _id menor que o último lido.
+    """
+
+    def __init__(self) -> None:
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self.urls: List[str] = []
+        self.seen: Set[ObjectId] = set()
+        self.last_created_at: Optional[datetime] = None
+        self.loaded_at = time.monotonic()
+        # Uploads simultâneos do mesmo usuário não leem o mesmo trecho duas vezes
+        self._lock = asyncio.Lock()
+
+    def expired(self) -> bool:
+        return time.monotonic() - self.loaded_at > PHASH_INDEX_MAX_AGE_SECONDS
+
+    async def refresh(self, db, user_id: str) -> None:
+        async with self._lock:
+            query: Dict[str, Any] = {"user_id": ObjectId(user_id)}
+            if self.last_created_at is not None:
+                since = self.last_created_at - timedelta(seconds=PHASH_REFRESH_OVERLAP_SECONDS)
+                query["created_at"] = {"$gte": since}
+
+            new_hashes, new_urls = [], []
+            cursor = db.media_hashes.find(
+                query, {"hash": 1, "media_url": 1, "created_at": 1}
+            ).sort("created_at", 1)
+            async for doc in cursor:
+                created_at = doc.get("created_at")
+                if created_at is not None and (
+                    self.last_created_at is None or created_at > self.last_created_at
+                ):
+                    self.last_created_at = created_at
+                if doc["_id"] in self.seen:
+                    continue  # já lido na janela de sobreposição
+                self.seen.add(doc["_id"])
+                new_hashes.append(doc["hash"] & ((1 << 64) - 1))
+                new_urls.append(doc.get("media_url"))
+
+            if new_hashes:
+                self.hashes = np.concatenate(
+                    [self.hashes, np.array(new_hashes, dtype=np.uint64)]
+                )
+                self.urls.extend(new_urls)
+
+    def discard(self, media_url: str) -> None:
+        keep = [i for i, url in enumerate(self.urls) if url != media_url]
+        if len(keep) != len(self.urls):
+            self.hashes = self.hashes[keep]
+            self.urls = [self.urls[i] for i in keep]
+
+    def lookup(self, h: int, max_distance: int) -> List[Dict[str, Any]]:
+        if len(self.hashes) == 0:
+            return []
+        dist = hamming_distances(self.hashes, h)
+        hits = np.nonzero(dist <= max_distance)[0]
+        hits = hits[np.argsort(dist[hits], kind="stable")][:NEAR_DUPLICATE_MAX_RESULTS]
+        return [{"media_url": self.urls[i], "distance": int(dist[i])} for i in hits]
+
+
+_indexes: "OrderedDict[str, _UserHashIndex]" = OrderedDict()
+
+
+def _user_index(user_id: str) -> _UserHashIndex:
+    index = _indexes.get(user_id)
+    if index is None or index.expired():
+        index = _indexes[user_id] = _UserHashIndex()
+    _indexes.move_to_end(user_id)
+    while len(_indexes) > PHASH_INDEX_MAX_USERS:
+        _indexes.popitem(last=False)
+    return index
+
+
+async def find_and_record_near_duplicates(
+    db,
+    user_id: str,
+    data: bytes,
+    media_url: str,
+) -> Optional[Dict[str, Any]]:
+    """
+    Calcula o dHash do upload, procura quase-duplicatas do usuário e
+    registra o novo hash. Retorna None se o arquivo não for uma imagem legível.
+    """
+    try:
+        h = await run_in_threadpool(dhash, data)
+    except Exception:
+        return None
+
+    index = _user_index(user_id)
+    await index.refresh(db, user_id)
+    matches = index.lookup(h, NEAR_DUPLICATE_MAX_DISTANCE)
+
+    await db.media_hashes.insert_one(
+        {
+            "user_id": ObjectId(user_id),
+            "hash": _to_int64(h),
+            "media_url": media_url,
+            "created_at": datetime.utcnow(),
+        }
+    )
+
+    return {"phash": f"{h:016x}", "near_duplicates": matches}
+
+
+async def remove_media_hashes(db, user_id: str, media_url: Optional[str]) -> None:
+    """
+    Memória apagada: a mídia deixa de contar como quase-duplicata.
+    """
+    if not media_url:
+        return
+    await db.media_hashes.delete_many({"user_id": ObjectId(user_id), "media_url": media_url})
+    index = _indexes.get(user_id)
+    if index is not None:
+        index.discard(media_url)
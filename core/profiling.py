@@ -0,0 +1,230 @@
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from core.metrics import dependency_timing, route_label
+
+# ----------------------------------------------------------------------
+# Profiling sob demanda de uma requisição real.
+#
+# Sem PROFILING_TOKEN o middleware só repassa a chamada. Com ele, a
+# requisição é perfilada quando traz o token em X-Relluna-Profile (ou
+# ?__profile=<token>). Modo "sample" (padrão): amostragem da pilha da
+# thread do event loop; modo "cprofile": cProfile determinístico além
+# das amostras.
+#
+# Atenção: ambos observam a thread do loop inteira, então requisições
+# concorrentes no mesmo worker também aparecem no perfil.
+# ----------------------------------------------------------------------
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILE_OUTPUT_DIR = os.getenv("PROFILE_OUTPUT_DIR", os.path.join("data", "profiles"))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "2")) / 1000
+PROFILE_TOP_N = 25
+
+PROFILE_HEADER = b"x-relluna-profile"
+PROFILE_MODE_HEADER = b"x-relluna-profile-mode"
+
+# Dependências que são chamadas HTTP externas
+HTTP_DEPENDENCIES = ("blob", "vision", "openai")
+
+
+def is_authorized(token: Optional[str]) -> bool:
+    return bool(PROFILING_TOKEN and token) and hmac.compare_digest(token, PROFILING_TOKEN)
+
+
+class _StackSampler(threading.Thread):
+    """
+    Amostra a pilha de uma thread em intervalos fixos e agrega no
+    formato "collapsed" (frame;frame;frame contagem) dos flamegraphs.
+    """
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join(timeout=1)
+
+
+def collapsed_text(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def top_summary(stacks: Counter, n: int = PROFILE_TOP_N) -> str:
+    """
+    Top-N por amostras próprias (folha) e cumulativas.
+    """
+    samples = sum(stacks.values())
+    total = samples or 1
+    self_counts: Counter = Counter()
+    cumulative: Counter = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        self_counts[frames[-1]] += count
+        for frame in set(frames):
+            cumulative[frame] += count
+
+    lines = [f"amostras: {samples}", "", "self%   função"]
+    for name, count in self_counts.most_common(n):
+        lines.append(f"{100 * count / total:5.1f}  {name}")
+    lines += ["", "cum%    função"]
+    for name, count in cumulative.most_common(n):
+        lines.append(f"{100 * count / total:5.1f}  {name}")
+    return "\n".join(lines) + "\n"
+
+
+class _RequestProfile:
+    def __init__(self, mode: str) -> None:
+        self.id = uuid.uuid4().hex[:16]
+        self.mode = mode
+        self.timing: Dict[str, float] = {}
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.thread_time()
+        self._sampler = _StackSampler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL)
+        self._cprofile = cProfile.Profile() if mode == "cprofile" else None
+
+    def start(self) -> None:
+        self._sampler.start()
+        if self._cprofile:
+            self._cprofile.enable()
+
+    def split(self) -> Dict[str, float]:
+        """
+        Divisão do tempo (ms): total, mongo, http externo, CPU do loop, resto.
+        """
+        wall = time.perf_counter() - self._wall0
+        cpu = time.thread_time() - self._cpu0
+        mongo = self.timing.get("mongo", 0.0)
+        http = sum(self.timing.get(d, 0.0) for d in HTTP_DEPENDENCIES)
+        other = max(wall - mongo - http - cpu, 0.0)
+        return {
+            "total": wall * 1000,
+            "mongo": mongo * 1000,
+            "http": http * 1000,
+            "cpu": cpu * 1000,
+            "other": other * 1000,
+        }
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{k};dur={v:.1f}" for k, v in self.split().items())
+
+    def finish(self, route: str) -> None:
+        if self._cprofile:
+            self._cprofile.disable()
+        self._sampler.stop()
+
+        os.makedirs(PROFILE_OUTPUT_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_OUTPUT_DIR, self.id)
+
+        with open(base + ".collapsed", "w") as f:
+            f.write(collapsed_text(self._sampler.stacks))
+
+        summary = io.StringIO()
+        summary.write(f"rota: {route}\nmodo: {self.mode}\n")
+        summary.write(
+            "tempo (ms): "
+            + ", ".join(f"{k}={v:.1f}" for k, v in self.split().items())
+            + "\n\n"
+        )
+        summary.write(top_summary(self._sampler.stacks))
+        if self._cprofile:
+            summary.write("\n")
+            stats = pstats.Stats(self._cprofile, stream=summary)
+            stats.sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+        with open(base + ".txt", "w") as f:
+            f.write(summary.getvalue())
+
+
+def _trigger(scope: dict) -> Optional[Tuple[str, str]]:
+    """
+    (token, modo) se a requisição pediu profiling, senão None.
+    """
+    token = mode = None
+    for name, value in scope.get("headers", []):
+        if name == PROFILE_HEADER:
+            token = value.decode("latin-1")
+        elif name == PROFILE_MODE_HEADER:
+            mode = value.decode("latin-1")
+
+    qs = scope.get("query_string", b"")
+    if token is None and b"__profile=" in qs:
+        params = parse_qs(qs.decode("latin-1"))
+        token = (params.get("__profile") or [None])[0]
+        mode = mode or (params.get("__profile_mode") or [None])[0]
+
+    if token is None:
+        return None
+    return token, (mode if mode in ("sample", "cprofile") else "sample")
+
+
+def read_profile(profile_id: str, kind: str) -> Optional[str]:
+    if not profile_id.isalnum() or kind not in ("txt", "collapsed"):
+        return None
+    path = os.path.join(PROFILE_OUTPUT_DIR, f"{profile_id}.{kind}")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read()
+
+
+class ProfilingMiddleware:
+    """
+    Perfila a requisição quando autorizada e devolve X-Profile-Id e
+    Server-Timing (mongo/http/cpu). O perfil completo é gravado ao fim
+    da resposta e lido em GET /debug/profiles/{id}.
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if not PROFILING_TOKEN or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trigger = _trigger(scope)
+        if trigger is None or not is_authorized(trigger[0]):
+            await self.app(scope, receive, send)
+            return
+
+        profile = _RequestProfile(trigger[1])
+        ctx_token = dependency_timing.set(profile.timing)
+
+        async def _send(message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile.id.encode()))
+                headers.append((b"server-timing", profile.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        profile.start()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            dependency_timing.reset(ctx_token)
+            profile.finish(route_label(scope))
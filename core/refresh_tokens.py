@@ -0,0 +1,144 @@
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from core.config import REFRESH_TOKEN_EXPIRE_DAYS
+
+# ----------------------------------------------------------------------
+# Refresh tokens rotativos (coleção refresh_tokens).
+#
+# - O token é aleatório (256 bits); no banco fica só o SHA-256 dele como
+#   _id. Com essa entropia, um hash rápido basta (sem pbkdf2).
+# - Cada login abre uma "sessão" (family_id) ligada ao device_id. Cada
+#   /auth/refresh consome o token atual e emite o próximo da mesma sessão.
+# - Reuso de um token já consumido = possível roubo: a sessão inteira é
+#   revogada.
+# - O índice TTL em expires_at remove tokens vencidos (ver core/indexes.py).
+# ----------------------------------------------------------------------
+
+
+class RefreshTokenError(ValueError):
+    def __init__(self, message: str, reuse_detected: bool = False) -> None:
+        super().__init__(message)
+        self.reuse_detected = reuse_detected
+
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def issue_refresh_token(
+    db,
+    user_id: str,
+    device_id: Optional[str] = None,
+    family: Optional[Dict[str, Any]] = None,
+) -> Tuple[str, datetime]:
+    """
+    Emite um refresh token. Sem `family`, abre uma nova sessão; com ela
+    (documento do token anterior), continua a mesma sessão.
+    """
+    token = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    expires_at = now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+
+    await db.refresh_tokens.insert_one({
+        "_id": hash_refresh_token(token),
+        "user_id": ObjectId(user_id),
+        "family_id": family["family_id"] if family else uuid.uuid4().hex,
+        "device_id": family.get("device_id") if family else device_id,
+        "session_created_at": family["session_created_at"] if family else now,
+        "created_at": now,
+        "expires_at": expires_at,
+        "used_at": None,
+        "revoked_at": None,
+    })
+    return token, expires_at
+
+
+async def rotate_refresh_token(db, token: str) -> Tuple[str, str, datetime]:
+    """
+    Consome o token e emite o próximo da mesma sessão.
+    Retorna (user_id, novo_token, expira_em); lança RefreshTokenError.
+    """
+    token_hash = hash_refresh_token(token)
+    now = datetime.utcnow()
+
+    # Consumo atômico: duas chamadas com o mesmo token -> só uma vence
+    doc = await db.refresh_tokens.find_one_and_update(
+        {
+            "_id": token_hash,
+            "used_at": None,
+            "revoked_at": None,
+            "expires_at": {"$gt": now},
+        },
+        {"$set": {"used_at": now}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc is None:
+        existing = await db.refresh_tokens.find_one({"_id": token_hash})
+        if existing and existing.get("used_at") and not existing.get("revoked_at"):
+            await revoke_session(db, str(existing["user_id"]), existing["family_id"])
+            raise RefreshTokenError("Refresh token reutilizado; sessão revogada.", reuse_detected=True)
+        raise RefreshTokenError("Refresh token inválido ou expirado.")
+
+    user_id = str(doc["user_id"])
+    new_token, expires_at = await issue_refresh_token(db, user_id, family=doc)
+    return user_id, new_token, expires_at
+
+
+async def revoke_session(db, user_id: str, family_id: str) -> int:
+    result = await db.refresh_tokens.update_many(
+        {"user_id": ObjectId(user_id), "family_id": family_id, "revoked_at": None},
+        {"$set": {"revoked_at": datetime.utcnow()}},
+    )
+    return result.modified_count
+
+
+async def revoke_device_sessions(db, user_id: str, device_id: str) -> int:
+    result = await db.refresh_tokens.update_many(
+        {"user_id": ObjectId(user_id), "device_id": device_id, "revoked_at": None},
+        {"$set": {"revoked_at": datetime.utcnow()}},
+    )
+    return result.modified_count
+
+
+async def revoke_by_token(db, token: str) -> bool:
+    """
+    Logout: revoga a sessão do token informado (consumido ou não).
+    """
+    doc = await db.refresh_tokens.find_one({"_id": hash_refresh_token(token)})
+    if not doc:
+        return False
+    await revoke_session(db, str(doc["user_id"]), doc["family_id"])
+    return True
+
+
+async def list_sessions(db, user_id: str) -> List[Dict[str, Any]]:
+    """
+    Sessões ativas (um token vigente por sessão), mais recentes primeiro.
+    """
+    cursor = db.refresh_tokens.find(
+        {
+            "user_id": ObjectId(user_id),
+            "used_at": None,
+            "revoked_at": None,
+            "expires_at": {"$gt": datetime.utcnow()},
+        },
+        {"family_id": 1, "device_id": 1, "session_created_at": 1, "created_at": 1, "expires_at": 1},
+    ).sort("created_at", -1)
+
+    return [
+        {
+            "session_id": doc["family_id"],
+            "device_id": doc.get("device_id"),
+            "created_at": doc["session_created_at"],
+            "last_refreshed_at": doc["created_at"],
+            "expires_at": doc["expires_at"],
+        }
+        async for doc in cursor
+    ]
@@ -1,17 +1,23 @@
+import logging
+import mimetypes
 import os
 import shutil
+import subprocess
 from uuid import uuid4
 from datetime import datetime
 from typing import Any
 from urllib.parse import urlparse
 
+from functools import lru_cache
+
 import requests
-import numpy as np
 from fastapi import HTTPException
-from moviepy.editor import ImageClip, CompositeVideoClip
 
 from PIL import Image as PILImage, ImageDraw, ImageFont
 
+from core.metrics import observe_dependency
+from core.user_stats import update_user_stats
+
 # ----------------------------------------------------------------------
 # Compatibilidade Pillow >= 10 (ANTIALIAS removido)
 # ----------------------------------------------------------------------
@@ -30,6 +36,30 @@ DURATION = 10  # segundos
 RELUMINATION_OUTPUT_DIR = os.path.join("media", "reluminations")
 os.makedirs(RELUMINATION_OUTPUT_DIR, exist_ok=True)
 
+# ----------------------------------------------------------------------
+# Saída para streaming
+# - MP4 sempre com +faststart (moov no início: o player começa a tocar
+#   sem baixar o arquivo inteiro).
+# - RELUMINATION_HLS=1: também empacota um ladder HLS ao lado do MP4
+#   (<id>_style1_hls/master.m3u8), com as renditions abaixo re-encodadas
+#   e a 1080p copiada do MP4 (sem novo encode). O GOP do MP4 passa a ser
+#   fixo em HLS_SEGMENT_SECONDS para os segmentos alinharem.
+# ----------------------------------------------------------------------
+RELUMINATION_HLS = os.getenv("RELUMINATION_HLS", "0") == "1"
+HLS_SEGMENT_SECONDS = int(os.getenv("HLS_SEGMENT_SECONDS", "2"))
+HLS_RENDITIONS = (  # (largura, bitrate) - vídeo vertical: 480p = 480x854
+    (480, "900k"),
+    (720, "2200k"),
+)
+HLS_PRESET = os.getenv("HLS_PRESET", "veryfast")
+HLS_TIMEOUT_SECONDS = float(os.getenv("HLS_TIMEOUT_SECONDS", "120"))
+
+# O StaticFiles de /media usa mimetypes; .ts viria como "text/vnd.trolltech.linguist"
+mimetypes.add_type("video/mp2t", ".ts")
+mimetypes.add_type("application/vnd.apple.mpegurl", ".m3u8")
+
+logger = logging.getLogger(__name__)
+
 
 def _resolve_local_source_path(url: str) -> str | None:
     """
@@ -101,6 +131,23 @@ def download_image_to_local(url: str) -> str:
     return dest_path
 
 
+# ----------------------------------------------------------------------
+# moviepy (e numpy/imageio/ffmpeg por tabela) só é importado no primeiro
+# render: o import custa ~0.3 s e só é útil em quem de fato renderiza.
+# ----------------------------------------------------------------------
+def load_render_stack() -> None:
+    import moviepy.editor  # noqa: F401
+
+
+@lru_cache(maxsize=8)
+def _get_font(size: int = 50):
+    # Tentar Arial; se não existir, usa fonte padrão
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except Exception:
+        return ImageFont.load_default()
+
+
 def _create_text_image(
     text: str,
     max_width: int,
@@ -110,11 +157,7 @@ def _create_text_image(
     Cria uma imagem RGBA com fundo semi-transparente e texto centralizado,
     usando Pillow (sem ImageMagick).
     """
-    # Tentar Arial; se não existir, usa fonte padrão
-    try:
-        font = ImageFont.truetype("arial.ttf", 50)
-    except Exception:
-        font = ImageFont.load_default()
+    font = _get_font(50)
 
     # Quebra de linha simples
     import textwrap
@@ -157,14 +200,12 @@ def _create_text_image(
     return img
 
 
-def generate_relumination_style1(image_url: str, narrative: str, title: str) -> str:
+def _build_base_clip(local_img: str, duration: float):
     """
-    Gera vídeo vertical ~10s com zoom suave + texto no terço inferior.
-    Retorna caminho local do MP4 gerado.
+    Decodifica a imagem e a enquadra em 1080x1920 com zoom leve (1.0 -> 1.08).
     """
-    local_img = download_image_to_local(image_url)
+    from moviepy.editor import ImageClip
 
-    # Imagem base em 1080x1920 com duração ajustada
     base_clip = ImageClip(local_img)
     base_clip = base_clip.resize(height=VIDEO_HEIGHT)
     base_clip = base_clip.crop(
@@ -173,16 +214,23 @@ def generate_relumination_style1(image_url: str, narrative: str, title: str) ->
         width=VIDEO_WIDTH,
         height=VIDEO_HEIGHT,
     )
-    base_clip = base_clip.set_duration(DURATION)
+    base_clip = base_clip.set_duration(duration)
 
     # Zoom leve ao longo do tempo (1.0 -> 1.08)
     def zoom(t):
-        factor = 1.0 + 0.08 * (t / DURATION)
+        factor = 1.0 + 0.08 * (t / duration)
         return factor
 
-    zoom_clip = base_clip.resize(zoom)
+    return base_clip.resize(zoom)
+
+
+def _build_text_clip(narrative: str, duration: float):
+    """
+    Legenda no terço inferior (texto truncado em 260 caracteres).
+    """
+    import numpy as np
+    from moviepy.editor import ImageClip
 
-    # Texto
     text_content = (narrative or "").strip()
     if len(text_content) > 260:
         text_content = text_content[:257] + "..."
@@ -198,28 +246,174 @@ def generate_relumination_style1(image_url: str, narrative: str, title: str) ->
     )
     text_arr = np.array(text_img)
 
-    text_clip = (
+    return (
         ImageClip(text_arr)
-        .set_duration(DURATION)
+        .set_duration(duration)
         .set_position(("center", VIDEO_HEIGHT - 400))
     )
 
-    final = CompositeVideoClip(
-        [zoom_clip, text_clip],
-        size=(VIDEO_WIDTH, VIDEO_HEIGHT),
-    )
+
+def hls_master_path(mp4_path: str) -> str:
+    return os.path.join(f"{os.path.splitext(mp4_path)[0]}_hls", "master.m3u8")
+
+
+def discard_relumination_output(mp4_path: str) -> None:
+    """
+    Apaga o MP4 e o diretório HLS de um render que ninguém vai usar
+    (ex.: requisição cancelada com o render em andamento).
+    """
+    shutil.rmtree(os.path.dirname(hls_master_path(mp4_path)), ignore_errors=True)
+    try:
+        os.remove(mp4_path)
+    except FileNotFoundError:
+        pass
+
+
+def _keyframe_params(fps: int) -> list[str]:
+    # Keyframe a cada segmento, sem keyframes extras por troca de cena
+    gop = str(fps * HLS_SEGMENT_SECONDS)
+    return ["-g", gop, "-keyint_min", gop, "-sc_threshold", "0"]
+
+
+def package_hls(mp4_path: str, fps: int) -> str:
+    """
+    Gera o ladder HLS (HLS_RENDITIONS + a original copiada) e o master
+    playlist a partir do MP4 já renderizado. Retorna o caminho do master.
+    """
+    from moviepy.config import get_setting
+
+    master_path = hls_master_path(mp4_path)
+    out_dir = os.path.dirname(master_path)
+    os.makedirs(out_dir, exist_ok=True)
+
+    n = len(HLS_RENDITIONS)
+    split = f"[0:v]split={n}" + "".join(f"[s{i}]" for i in range(n))
+    scales = [f"[s{i}]scale={w}:-2[v{i}]" for i, (w, _) in enumerate(HLS_RENDITIONS)]
+
+    args = [
+        get_setting("FFMPEG_BINARY"), "-hide_banner", "-v", "error", "-y",
+        "-i", mp4_path,
+        "-filter_complex", ";".join([split] + scales),
+    ]
+    for i in range(n):
+        args += ["-map", f"[v{i}]"]
+    args += ["-map", "0:v"]
+
+    for i, (_, bitrate) in enumerate(HLS_RENDITIONS):
+        args += [
+            f"-c:v:{i}", "libx264",
+            f"-b:v:{i}", bitrate,
+            f"-maxrate:v:{i}", bitrate,
+            f"-bufsize:v:{i}", bitrate,
+        ]
+    args += [f"-c:v:{n}", "copy", "-preset", HLS_PRESET, "-pix_fmt", "yuv420p"]
+    args += _keyframe_params(fps)
+
+    args += [
+        "-f", "hls",
+        "-hls_time", str(HLS_SEGMENT_SECONDS),
+        "-hls_playlist_type", "vod",
+        "-hls_flags", "independent_segments",
+        "-hls_segment_filename", os.path.join(out_dir, "v%v", "seg_%03d.ts"),
+        "-master_pl_name", os.path.basename(master_path),
+        "-var_stream_map", " ".join(f"v:{i}" for i in range(n + 1)),
+        os.path.join(out_dir, "v%v", "index.m3u8"),
+    ]
+
+    try:
+        proc = subprocess.run(args, capture_output=True, text=True, timeout=HLS_TIMEOUT_SECONDS)
+    except subprocess.TimeoutExpired:
+        shutil.rmtree(out_dir, ignore_errors=True)
+        raise RuntimeError("Tempo excedido ao empacotar HLS.")
+    if proc.returncode != 0 or not os.path.exists(master_path):
+        shutil.rmtree(out_dir, ignore_errors=True)
+        raise RuntimeError(proc.stderr.strip() or "Falha ao empacotar HLS.")
+    return master_path
+
+
+class _timed_stage(observe_dependency):
+    """
+    observe_dependency("render", etapa) que também anota a duração em
+    `timings` (quando fornecido).
+    """
+
+    def __init__(self, name: str, timings: dict[str, float] | None) -> None:
+        super().__init__("render", name)
+        self._timings = timings
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        super().__exit__(exc_type, exc, tb)
+        if self._timings is not None:
+            self._timings[self.operation] = self.elapsed
+
+
+def generate_relumination_style1(
+    image_url: str,
+    narrative: str,
+    title: str,
+    *,
+    fps: int | None = None,
+    duration: float | None = None,
+    preset: str = "medium",
+    hls: bool | None = None,
+    timings: dict[str, float] | None = None,
+) -> str:
+    """
+    Gera vídeo vertical ~10s com zoom suave + texto no terço inferior.
+    Retorna caminho local do MP4 gerado (faststart); com HLS ativo, o
+    master playlist fica em hls_master_path(<mp4>).
+
+    fps/duration/preset/hls sobrescrevem os padrões (usado pelo benchmark);
+    se `timings` for passado, recebe a duração (s) de cada etapa.
+    """
+    from moviepy.editor import CompositeVideoClip
+
+    fps = fps or FPS
+    duration = duration or DURATION
+    hls = RELUMINATION_HLS if hls is None else hls
+
+    with _timed_stage("download", timings):
+        local_img = download_image_to_local(image_url)
+
+    with _timed_stage("decode", timings):
+        zoom_clip = _build_base_clip(local_img, duration)
+
+    with _timed_stage("text", timings):
+        text_clip = _build_text_clip(narrative, duration)
+
+    with _timed_stage("compose", timings):
+        final = CompositeVideoClip(
+            [zoom_clip, text_clip],
+            size=(VIDEO_WIDTH, VIDEO_HEIGHT),
+        )
 
     out_filename = f"{uuid4().hex}_style1.mp4"
     out_path = os.path.join(RELUMINATION_OUTPUT_DIR, out_filename)
 
-    final.write_videofile(
-        out_path,
-        fps=FPS,
-        codec="libx264",
-        audio=False,
-        verbose=False,
-        logger=None,
-    )
+    ffmpeg_params = ["-movflags", "+faststart"]
+    if hls:
+        ffmpeg_params += _keyframe_params(fps)
+
+    # Inclui a composição de cada frame (feita sob demanda pelo moviepy)
+    with _timed_stage("encode", timings):
+        final.write_videofile(
+            out_path,
+            fps=fps,
+            codec="libx264",
+            preset=preset,
+            audio=False,
+            verbose=False,
+            logger=None,
+            ffmpeg_params=ffmpeg_params,
+        )
+
+    if hls:
+        # Sem HLS a Reluminação continua válida: fica só o MP4
+        try:
+            with _timed_stage("package", timings):
+                package_hls(out_path, fps)
+        except RuntimeError as e:
+            logger.warning("HLS não gerado para %s: %s", out_path, e)
 
     return out_path
 
@@ -233,13 +427,15 @@ BETA_MONTHLY_LIMIT = 10
 async def check_and_consume_relumination_quota(
     user_doc: dict[str, Any],
     db,
-) -> None:
+) -> dict[str, Any] | None:
     """
     Aplica regras de cota/créditos de Reluminação.
 
     Regras MVP:
       - Se relumination_credits > 0: consome 1 crédito.
       - Senão, aplica limite mensal BETA_MONTHLY_LIMIT para plano beta_free.
+
+    Retorna o que foi debitado (para refund_relumination_quota), ou None.
     """
     now_ref = datetime.utcnow().strftime("%Y-%m")
     month_ref = user_doc.get("relumination_month_ref")
@@ -261,6 +457,11 @@ async def check_and_consume_relumination_quota(
                 }
             },
         )
+        await update_user_stats(
+            db,
+            str(user_id),
+            set_fields={"relumination_month_ref": now_ref, "relumination_used_this_month": 0},
+        )
 
     # Créditos pagos
     if credits > 0:
@@ -268,7 +469,8 @@ async def check_and_consume_relumination_quota(
             {"_id": user_id},
             {"$inc": {"relumination_credits": -1}},
         )
-        return
+        await update_user_stats(db, str(user_id), inc={"relumination_credits": -1})
+        return {"kind": "credit"}
 
     # Plano beta_free com limite mensal
     if plan == "beta_free":
@@ -285,6 +487,39 @@ async def check_and_consume_relumination_quota(
                 "$set": {"relumination_month_ref": now_ref},
             },
         )
-        return
+        await update_user_stats(
+            db,
+            str(user_id),
+            inc={"relumination_used_this_month": 1},
+            set_fields={"relumination_month_ref": now_ref},
+        )
+        return {"kind": "monthly", "month_ref": now_ref}
 
     # Futuro: planos com regras específicas (plus/pro etc.)
+    return None
+
+
+async def refund_relumination_quota(db, user_id, charge: dict[str, Any] | None) -> None:
+    """
+    Devolve o débito de check_and_consume_relumination_quota quando o
+    render falha ou é cancelado. O uso mensal só volta se o mês ainda for
+    o mesmo do débito (após a virada ele já foi zerado).
+    """
+    if not charge:
+        return
+
+    if charge["kind"] == "credit":
+        await db.users.update_one({"_id": user_id}, {"$inc": {"relumination_credits": 1}})
+        await update_user_stats(db, str(user_id), inc={"relumination_credits": 1})
+        return
+
+    result = await db.users.update_one(
+        {
+            "_id": user_id,
+            "relumination_month_ref": charge["month_ref"],
+            "relumination_used_this_month": {"$gt": 0},
+        },
+        {"$inc": {"relumination_used_this_month": -1}},
+    )
+    if result.modified_count:
+        await update_user_stats(db, str(user_id), inc={"relumination_used_this_month": -1})
@@ -0,0 +1,377 @@
+import asyncio
+import contextvars
+import fcntl
+import heapq
+import itertools
+import logging
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.metrics import (
+    RENDER_QUEUE_DEPTH,
+    RENDER_QUEUE_WAIT,
+    RENDER_REJECTED,
+    RENDER_RUNNING,
+)
+
+# ----------------------------------------------------------------------
+# Fila de renderização de Reluminações.
+#
+# - Teto por nó: RENDER_MAX_CONCURRENCY renders simultâneos somando todos
+#   os workers do gunicorn. Cada render ocupa uma "vaga" = flock em um
+#   arquivo de RENDER_SLOTS_DIR (liberada sozinha se o processo morrer).
+#   Sem valor explícito, o teto sai de núcleos e memória disponíveis.
+# - Fila justa ponderada (WFQ) por usuário: cada job recebe um tempo de
+#   término virtual max(V, último do usuário) + 1/peso; sai primeiro o
+#   menor. Usuário com créditos/plano pago pesa RENDER_PAID_WEIGHT.
+#   ATENÇÃO: a fila (heap, tempo virtual, limites por usuário) é POR
+#   WORKER. Só o teto de concorrência é do nó. Com N workers, um usuário
+#   cujas requisições caem em todos eles tem até N filas a seu favor: a
+#   justiça entre usuários vale dentro de cada worker, não no nó inteiro.
+# - Admissão: fila cheia, usuário com jobs demais ou ETA acima de
+#   RENDER_MAX_WAIT_SECONDS -> RenderQueueFull (429 com Retry-After).
+#   RENDER_MAX_QUEUE / RENDER_MAX_QUEUE_PER_USER também são por worker.
+# - Cancelamento: job ainda na fila sai dela; job já rodando não pode ser
+#   interrompido (thread), então termina e o resultado vai para
+#   on_abandoned (ex.: apagar o vídeo que ninguém vai usar).
+# ----------------------------------------------------------------------
+RENDER_MEMORY_MB_PER_JOB = int(os.getenv("RENDER_MEMORY_MB_PER_JOB", "700"))
+RENDER_MAX_QUEUE = int(os.getenv("RENDER_MAX_QUEUE", "20"))
+RENDER_MAX_QUEUE_PER_USER = int(os.getenv("RENDER_MAX_QUEUE_PER_USER", "3"))
+RENDER_MAX_WAIT_SECONDS = float(os.getenv("RENDER_MAX_WAIT_SECONDS", "120"))
+RENDER_INITIAL_ESTIMATE_SECONDS = float(os.getenv("RENDER_INITIAL_ESTIMATE_SECONDS", "20"))
+RENDER_PAID_WEIGHT = float(os.getenv("RENDER_PAID_WEIGHT", "4"))
+RENDER_SLOTS_DIR = os.getenv("RENDER_SLOTS_DIR", os.path.join("data", "render_slots"))
+
+SLOT_POLL_SECONDS = 0.25
+
+logger = logging.getLogger(__name__)
+
+
+def _available_memory_mb() -> Optional[int]:
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+def default_concurrency() -> int:
+    """
+    Metade dos núcleos (o x264 já usa várias threads), limitado pela
+    memória disponível / RENDER_MEMORY_MB_PER_JOB.
+    """
+    by_cpu = max(1, (os.cpu_count() or 2) // 2)
+    memory = _available_memory_mb()
+    if memory is None:
+        return by_cpu
+    return max(1, min(by_cpu, memory // RENDER_MEMORY_MB_PER_JOB))
+
+
+RENDER_MAX_CONCURRENCY = int(os.getenv("RENDER_MAX_CONCURRENCY", "0")) or default_concurrency()
+
+
+def render_priority(user_doc: Dict[str, Any]) -> Tuple[str, float]:
+    """
+    (classe, peso) do usuário na fila: créditos pagos ou plano pago na frente.
+    """
+    if user_doc.get("relumination_credits", 0) > 0 or user_doc.get("plan_tier", "beta_free") != "beta_free":
+        return "paid", RENDER_PAID_WEIGHT
+    return "free", 1.0
+
+
+class RenderQueueFull(Exception):
+    def __init__(self, reason: str, eta_seconds: float) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.eta_seconds = eta_seconds
+
+
+# ----------------------------------------------------------------------
+# Vagas por nó (flock)
+# ----------------------------------------------------------------------
+class _NodeSlots:
+    def __init__(self, directory: str, count: int) -> None:
+        self.directory = directory
+        self.count = count
+
+    def try_acquire(self) -> Optional[int]:
+        os.makedirs(self.directory, exist_ok=True)
+        for i in range(self.count):
+            fd = os.open(os.path.join(self.directory, f"slot-{i}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    @staticmethod
+    def release(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+class _Job:
+    def __init__(
+        self,
+        user_id: str,
+        priority: str,
+        finish: float,
+        fn: Callable[[], Any],
+        on_abandoned: Optional[Callable[[Any], None]] = None,
+    ) -> None:
+        self.user_id = user_id
+        self.priority = priority
+        self.finish = finish
+        self.fn = fn
+        self.on_abandoned = on_abandoned
+        self.abandoned = False
+        self.enqueued_at = time.monotonic()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class RenderScheduler:
+    """
+    Fila de renders de UM worker (ver o cabeçalho: a justiça é por worker;
+    só as vagas são compartilhadas pelo nó).
+    """
+
+    def __init__(
+        self,
+        concurrency: int = RENDER_MAX_CONCURRENCY,
+        slots_dir: str = RENDER_SLOTS_DIR,
+        max_queue: int = RENDER_MAX_QUEUE,
+        max_queue_per_user: int = RENDER_MAX_QUEUE_PER_USER,
+        max_wait: float = RENDER_MAX_WAIT_SECONDS,
+    ) -> None:
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.max_wait = max_wait
+        self._slots = _NodeSlots(slots_dir, concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="render")
+
+        self._heap: List[Tuple[float, int, _Job]] = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._per_user: Dict[str, int] = {}  # reservados + na fila + rodando
+        self._reserved = 0
+        self._running = 0
+        self._avg_seconds = RENDER_INITIAL_ESTIMATE_SECONDS
+        self._retry_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+
+    # ------------------------------------------------------------------
+    # Admissão
+    # ------------------------------------------------------------------
+    def estimate_wait(self) -> float:
+        """
+        ETA (s) de um novo job: rodadas de `concurrency` renders à frente
+        dele (visão deste worker) vezes a média móvel de duração.
+        """
+        ahead = len(self._heap) + self._reserved + self._running
+        rounds = math.ceil((ahead + 1) / self.concurrency)
+        return rounds * self._avg_seconds
+
+    def admit(self, user_id: str, user_doc: Dict[str, Any]) -> "RenderReservation":
+        return RenderReservation(self, user_id, *render_priority(user_doc))
+
+    def _reserve(self, user_id: str) -> None:
+        depth = len(self._heap) + self._reserved
+        eta = self.estimate_wait()
+        reason = None
+        if depth >= self.max_queue:
+            reason = "queue_full"
+        elif self._per_user.get(user_id, 0) >= self.max_queue_per_user:
+            reason = "user_limit"
+        elif eta > self.max_wait:
+            reason = "eta"
+        if reason:
+            RENDER_REJECTED.labels(reason).inc()
+            raise RenderQueueFull(reason, eta)
+
+        self._reserved += 1
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+
+    def _unreserve(self, user_id: str) -> None:
+        self._reserved -= 1
+        self._release_user(user_id)
+
+    def _release_user(self, user_id: str) -> None:
+        left = self._per_user.get(user_id, 0) - 1
+        if left > 0:
+            self._per_user[user_id] = left
+        else:
+            self._per_user.pop(user_id, None)
+            self._last_finish.pop(user_id, None)
+
+    # ------------------------------------------------------------------
+    # Fila justa
+    # ------------------------------------------------------------------
+    async def _submit(
+        self,
+        user_id: str,
+        priority: str,
+        weight: float,
+        fn: Callable[[], Any],
+        on_abandoned: Optional[Callable[[Any], None]] = None,
+    ) -> Any:
+        start = max(self._virtual_time, self._last_finish.get(user_id, 0.0))
+        finish = start + 1.0 / weight
+        self._last_finish[user_id] = finish
+
+        job = _Job(user_id, priority, finish, fn, on_abandoned)
+        heapq.heappush(self._heap, (finish, next(self._seq), job))
+        self._reserved -= 1
+        RENDER_QUEUE_DEPTH.inc()
+        self._dispatch()
+
+        try:
+            return await asyncio.shield(job.future)
+        except asyncio.CancelledError:
+            # Cliente desistiu: se ainda não começou, sai da fila
+            if not job.future.done() and self._remove(job):
+                self._release_user(user_id)
+            elif job.future.done():
+                # Terminou junto com o cancelamento: descarta já
+                if not job.future.cancelled() and job.future.exception() is None:
+                    self._discard_later(job, job.future.result())
+            else:
+                # Rodando: descarta o resultado quando terminar (_execute)
+                job.abandoned = True
+            raise
+
+    def _discard_later(self, job: _Job, result: Any) -> None:
+        if job.on_abandoned is None:
+            return
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(None, self._discard, job, result)
+        self._tasks.add(future)
+        future.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def _discard(job: _Job, result: Any) -> None:
+        try:
+            job.on_abandoned(result)
+        except Exception:
+            logger.exception("Falha ao descartar render abandonado")
+
+    def _remove(self, job: _Job) -> bool:
+        for i, (_, _, queued) in enumerate(self._heap):
+            if queued is job:
+                self._heap.pop(i)
+                heapq.heapify(self._heap)
+                RENDER_QUEUE_DEPTH.dec()
+                job.future.cancel()
+                return True
+        return False
+
+    def _dispatch(self) -> None:
+        while self._heap:
+            fd = self._slots.try_acquire()
+            if fd is None:
+                # Vagas ocupadas (talvez por outro worker): tenta de novo logo
+                if self._retry_handle is None:
+                    loop = asyncio.get_running_loop()
+                    self._retry_handle = loop.call_later(SLOT_POLL_SECONDS, self._retry_dispatch)
+                return
+            finish, _, job = heapq.heappop(self._heap)
+            self._virtual_time = finish
+            RENDER_QUEUE_DEPTH.dec()
+            task = asyncio.ensure_future(self._execute(job, fd))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _retry_dispatch(self) -> None:
+        self._retry_handle = None
+        self._dispatch()
+
+    async def _execute(self, job: _Job, fd: int) -> None:
+        RENDER_QUEUE_WAIT.labels(job.priority).observe(time.monotonic() - job.enqueued_at)
+        self._running += 1
+        RENDER_RUNNING.inc()
+        started = time.monotonic()
+        try:
+            ctx = contextvars.copy_context()
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, ctx.run, job.fn)
+            if job.abandoned:
+                self._discard_later(job, result)
+            elif not job.future.done():
+                job.future.set_result(result)
+        except Exception as exc:
+            if job.abandoned:
+                logger.warning("Render abandonado falhou: %s", exc)
+            elif not job.future.done():
+                job.future.set_exception(exc)
+        finally:
+            elapsed = time.monotonic() - started
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * elapsed
+            self._running -= 1
+            RENDER_RUNNING.dec()
+            _NodeSlots.release(fd)
+            self._release_user(job.user_id)
+            self._dispatch()
+
+
+class RenderReservation:
+    """
+    Lugar reservado na fila (admissão checada ANTES de consumir a cota):
+
+        async with render_scheduler.admit(user_id, user_doc) as slot:
+            await check_and_consume_relumination_quota(...)
+            path = await slot.run(generate_relumination_style1, ...)
+    """
+
+    def __init__(self, scheduler: RenderScheduler, user_id: str, priority: str, weight: float) -> None:
+        self.scheduler = scheduler
+        self.user_id = user_id
+        self.priority = priority
+        self.weight = weight
+        self._submitted = False
+
+    async def __aenter__(self) -> "RenderReservation":
+        self.scheduler._reserve(self.user_id)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if not self._submitted:
+            self.scheduler._unreserve(self.user_id)
+
+    async def run(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        on_abandoned: Optional[Callable[[Any], None]] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        on_abandoned(resultado) é chamado (em thread) se o chamador for
+        cancelado com o render já em andamento.
+        """
+        self._submitted = True
+        return await self.scheduler._submit(
+            self.user_id,
+            self.priority,
+            self.weight,
+            lambda: fn(*args, **kwargs),
+            on_abandoned,
+        )
+
+
+_scheduler: Optional[RenderScheduler] = None
+
+
+def get_render_scheduler() -> RenderScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RenderScheduler()
+    return _scheduler
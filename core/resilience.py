@@ -0,0 +1,314 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from core.metrics import CIRCUIT_BREAKER_OPEN, DEPENDENCY_REJECTED, DEPENDENCY_RETRIES, observe_dependency
+
+T = TypeVar("T")
+
+# ----------------------------------------------------------------------
+# Política de chamadas externas (Vision, Azure OpenAI):
+#   - prazo por requisição (REQUEST_DEADLINE_SECONDS), propagado via
+#     contextvar até as threads (run_in_threadpool copia o contexto);
+#   - timeout de cada tentativa = min(teto da dependência, prazo restante);
+#   - novas tentativas com jitter apenas para falhas transitórias e só
+#     se ainda couber no prazo;
+#   - circuit breaker por dependência: após N falhas seguidas, falha
+#     rápido por BREAKER_RESET_SECONDS e então deixa passar uma sonda.
+# ----------------------------------------------------------------------
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "25"))
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY_SECONDS = float(os.getenv("RETRY_BASE_DELAY_SECONDS", "0.2"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+# Tentativa com menos tempo que isso não vale a pena começar
+MIN_ATTEMPT_SECONDS = 0.5
+
+TRANSIENT_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class DependencyUnavailable(RuntimeError):
+    def __init__(self, dependency: str, message: str, retry_after: Optional[float] = None) -> None:
+        super().__init__(f"{dependency}: {message}")
+        self.dependency = dependency
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(DependencyUnavailable):
+    pass
+
+
+class CircuitOpenError(DependencyUnavailable):
+    pass
+
+
+# ----------------------------------------------------------------------
+# Prazo por requisição
+# ----------------------------------------------------------------------
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def remaining_budget(dependency: str, cap: float) -> float:
+    """
+    Timeout para a próxima tentativa: o teto da dependência limitado pelo
+    prazo restante da requisição. Lança DeadlineExceeded se não sobrar tempo.
+    """
+    deadline = request_deadline.get()
+    if deadline is None:
+        return cap
+    remaining = deadline - time.monotonic()
+    if remaining < MIN_ATTEMPT_SECONDS:
+        DEPENDENCY_REJECTED.labels(dependency, "deadline").inc()
+        raise DeadlineExceeded(dependency, "prazo da requisição esgotado")
+    return min(cap, remaining)
+
+
+@contextmanager
+def without_deadline():
+    """
+    Para tarefas em background: não herdam o prazo da requisição que
+    as agendou (rodam depois da resposta).
+    """
+    token = request_deadline.set(None)
+    try:
+        yield
+    finally:
+        request_deadline.reset(token)
+
+
+class DeadlineMiddleware:
+    """
+    Define o prazo da requisição (REQUEST_DEADLINE_SECONDS a partir da chegada).
+    """
+
+    def __init__(self, app: Any, seconds: float = REQUEST_DEADLINE_SECONDS) -> None:
+        self.app = app
+        self.seconds = seconds
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or self.seconds <= 0:
+            await self.app(scope, receive, send)
+            return
+        token = request_deadline.set(time.monotonic() + self.seconds)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_deadline.reset(token)
+
+
+# ----------------------------------------------------------------------
+# Circuit breaker
+# ----------------------------------------------------------------------
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_seconds: float = BREAKER_RESET_SECONDS,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    def before_call(self) -> bool:
+        """
+        Lança CircuitOpenError se o circuito estiver aberto.
+        Retorna True se esta chamada é a sonda da meia-abertura.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            elapsed = time.monotonic() - self._opened_at
+            if elapsed >= self.reset_seconds and not self._probing:
+                self._probing = True  # meia-abertura: uma sonda por vez
+                return True
+            retry_after = max(self.reset_seconds - elapsed, 1.0)
+        DEPENDENCY_REJECTED.labels(self.name, "circuit_open").inc()
+        raise CircuitOpenError(self.name, "circuito aberto", retry_after=retry_after)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+        CIRCUIT_BREAKER_OPEN.labels(self.name).set(0)
+
+    def release_probe(self) -> None:
+        """
+        Sonda abandonada sem resultado (ex.: cancelada): a próxima
+        chamada pode sondar; o circuito continua aberto.
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+            opened = self._opened_at is not None
+        if opened:
+            CIRCUIT_BREAKER_OPEN.labels(self.name).set(1)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(dependency: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if dependency not in _breakers:
+            _breakers[dependency] = CircuitBreaker(dependency)
+        return _breakers[dependency]
+
+
+# ----------------------------------------------------------------------
+# Classificação de falhas e backoff
+# ----------------------------------------------------------------------
+def is_transient(exc: BaseException) -> bool:
+    """
+    Timeouts, erros de conexão e HTTP 408/409/429/5xx (requests ou SDK openai).
+    """
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None)
+    if status is not None:
+        return status in TRANSIENT_STATUS
+    name = type(exc).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def _backoff(attempt: int) -> float:
+    # "full jitter": espalha as novas tentativas de vários workers
+    return random.uniform(0, RETRY_BASE_DELAY_SECONDS * (2 ** attempt))
+
+
+def _next_delay(dependency: str, attempt: int, exc: BaseException, attempts: int) -> Optional[float]:
+    """
+    Espera antes da próxima tentativa, ou None se não deve tentar de novo.
+    """
+    if attempt + 1 >= attempts or not is_transient(exc):
+        return None
+    delay = _backoff(attempt)
+    deadline = request_deadline.get()
+    if deadline is not None and deadline - time.monotonic() < delay + MIN_ATTEMPT_SECONDS:
+        return None
+    DEPENDENCY_RETRIES.labels(dependency).inc()
+    return delay
+
+
+def _record_outcome(breaker: CircuitBreaker, exc: BaseException) -> None:
+    # Erro não transitório (ex.: 400) = o serviço respondeu; não abre o circuito
+    if is_transient(exc):
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+
+def call_with_policy(
+    dependency: str,
+    operation: str,
+    fn: Callable[[float], T],
+    timeout_cap: float,
+    attempts: int = RETRY_MAX_ATTEMPTS,
+) -> T:
+    """
+    Executa fn(timeout) (síncrono) sob prazo, retries e circuit breaker.
+    """
+    breaker = get_breaker(dependency)
+    for attempt in range(attempts):
+        timeout = remaining_budget(dependency, timeout_cap)
+        breaker.before_call()
+        try:
+            with observe_dependency(dependency, operation):
+                result = fn(timeout)
+        except Exception as exc:
+            _record_outcome(breaker, exc)
+            delay = _next_delay(dependency, attempt, exc, attempts)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+    raise AssertionError("inalcançável")
+
+
+async def acall_with_policy(
+    dependency: str,
+    operation: str,
+    fn: Callable[[float], Awaitable[T]],
+    timeout_cap: float,
+    attempts: int = RETRY_MAX_ATTEMPTS,
+) -> T:
+    """
+    Versão assíncrona de call_with_policy (fn(timeout) retorna awaitable).
+    """
+    breaker = get_breaker(dependency)
+    for attempt in range(attempts):
+        timeout = remaining_budget(dependency, timeout_cap)
+        probing = breaker.before_call()
+        try:
+            with observe_dependency(dependency, operation):
+                result = await asyncio.wait_for(fn(timeout), timeout)
+        except asyncio.CancelledError:
+            if probing:
+                breaker.release_probe()
+            raise
+        except Exception as exc:
+            _record_outcome(breaker, exc)
+            delay = _next_delay(dependency, attempt, exc, attempts)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+    raise AssertionError("inalcançável")
+
+
+# ----------------------------------------------------------------------
+# Requisição "hedged" (apenas para chamadas idempotentes)
+# ----------------------------------------------------------------------
+_hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+
+def hedged(fn: Callable[[float], T], timeout: float, hedge_after: float) -> T:
+    """
+    Dispara fn(timeout); se não responder em `hedge_after` s, dispara uma
+    cópia e fica com a primeira resposta bem-sucedida.
+    """
+    if hedge_after <= 0 or hedge_after >= timeout:
+        return fn(timeout)
+
+    start = time.monotonic()
+    first = _hedge_executor.submit(fn, timeout)
+    done, _ = wait([first], timeout=hedge_after)
+    if done:
+        return first.result()
+
+    second = _hedge_executor.submit(fn, max(timeout - (time.monotonic() - start), 0.1))
+    pending = {first, second}
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+    raise error  # type: ignore[misc]
@@ -0,0 +1,94 @@
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, TEXT
+
+# Prefixo user_id: toda busca faz igualdade em user_id e o índice de
+# texto só percorre as entradas do próprio usuário.
+TEXT_SEARCH_INDEX = [
+    ("user_id", ASCENDING),
+    ("main_caption", TEXT),
+    ("tags", TEXT),
+    ("alt_text", TEXT),
+    ("short_description", TEXT),
+    ("long_description", TEXT),
+]
+TEXT_SEARCH_WEIGHTS = {
+    "main_caption": 10,
+    "tags": 5,
+    "alt_text": 3,
+    "short_description": 2,
+    "long_description": 1,
+}
+TEXT_SEARCH_LANGUAGE = "portuguese"
+
+TAG_FACET_INDEX = [("user_id", ASCENDING), ("tags", ASCENDING)]
+
+SearchCursor = Optional[Tuple[float, ObjectId]]
+
+
+def encode_search_cursor(score: float, oid: ObjectId) -> str:
+    raw = json.dumps([score, str(oid)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor: str) -> Tuple[float, ObjectId]:
+    """
+    Lança ValueError se o cursor for inválido.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        score, oid = json.loads(base64.urlsafe_b64decode(padded))
+        return float(score), ObjectId(oid)
+    except Exception:
+        raise ValueError("Cursor de busca inválido.")
+
+
+def build_search_pipeline(
+    user_id: str,
+    q: str,
+    limit: int,
+    after: SearchCursor = None,
+) -> List[Dict[str, Any]]:
+    """
+    Busca textual paginada por keyset em (score desc, _id desc).
+    Busca limit + 1 itens para saber se há próxima página.
+    """
+    pipeline: List[Dict[str, Any]] = [
+        {"$match": {"user_id": ObjectId(user_id), "$text": {"$search": q}}},
+        {"$addFields": {"_score": {"$meta": "textScore"}}},
+    ]
+    if after is not None:
+        score, oid = after
+        pipeline.append(
+            {
+                "$match": {
+                    "$or": [
+                        {"_score": {"$lt": score}},
+                        {"_score": score, "_id": {"$lt": oid}},
+                    ]
+                }
+            }
+        )
+    pipeline += [
+        {"$sort": {"_score": -1, "_id": -1}},
+        {"$limit": limit + 1},
+    ]
+    return pipeline
+
+
+def build_tag_facet_pipeline(user_id: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    Contagem de tags do usuário (nuvem de tags) em uma única agregação.
+    Cada memória conta uma vez por tag, como em user_stats.
+    """
+    return [
+        {"$match": {"user_id": ObjectId(user_id), "tags": {"$exists": True, "$ne": []}}},
+        {"$project": {"_id": 0, "tags": {"$setUnion": ["$tags", []]}}},
+        {"$unwind": "$tags"},
+        {"$group": {"_id": "$tags", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": limit},
+    ]
@@ -0,0 +1,35 @@
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Tipo não serializável: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serializa para JSON com orjson (datetime nativo, ObjectId -> str).
+    """
+    return orjson.dumps(content, default=_default)
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    Classe de resposta padrão da API (default_response_class): orjson no
+    lugar do json da stdlib, com datetime nativo e ObjectId -> str.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class TrustedJSONResponse(ORJSONResponse):
+    """
+    Resposta JSON para dados já confiáveis (montados a partir do Mongo):
+    não passa pela validação do response_model nem pelo encoder padrão.
+    """
@@ -0,0 +1,122 @@
+import base64
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from bson import ObjectId
+
+# Tombstones de memórias apagadas ficam disponíveis por este período.
+# Tokens mais antigos que isso exigem uma ressincronização completa.
+TOMBSTONE_RETENTION_DAYS = 90
+
+# updated_at/deleted_at vêm do relógio da aplicação, não da ordem de commit:
+# uma escrita carimbada em T pode ficar visível depois de outra em T+x.
+# Ao terminar uma rodada, o cursor recua para antes desta janela e as
+# alterações recentes são reenviadas (o cliente aplica por id, idempotente).
+SYNC_OVERLAP_SECONDS = float(os.getenv("SYNC_OVERLAP_SECONDS", "5"))
+
+Cursor = Optional[Tuple[datetime, ObjectId]]
+
+_MIN_OBJECT_ID = ObjectId("0" * 24)
+
+
+def _to_ms(ts: datetime) -> int:
+    # Datas do Mongo são UTC "naive": fixa o fuso antes de converter.
+    return int(ts.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def _from_ms(ms: Optional[int]) -> Optional[datetime]:
+    return None if ms is None else datetime.utcfromtimestamp(ms / 1000)
+
+
+def _encode_cursor(cursor: Cursor) -> Optional[list]:
+    if cursor is None:
+        return None
+    ts, oid = cursor
+    return [_to_ms(ts), str(oid)]
+
+
+def _decode_cursor(raw: Optional[list]) -> Cursor:
+    if not raw:
+        return None
+    ms, oid = raw
+    return _from_ms(ms), ObjectId(oid)
+
+
+def encode_sync_token(
+    changed: Cursor,
+    deleted: Cursor,
+    low_water: Optional[datetime] = None,
+) -> str:
+    """
+    Token opaco com a posição (timestamp, _id) já entregue ao cliente,
+    separadamente para memórias alteradas e para tombstones, e o instante
+    de emissão. low_water (só no meio da paginação) é o limite da janela
+    de sobreposição da primeira página da rodada.
+    """
+    payload = {
+        "c": _encode_cursor(changed),
+        "d": _encode_cursor(deleted),
+        "t": _to_ms(datetime.utcnow()),
+    }
+    if low_water is not None:
+        payload["w"] = _to_ms(low_water)
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_sync_token(token: str) -> Tuple[Cursor, Cursor, datetime, Optional[datetime]]:
+    """
+    (changed, deleted, issued_at, low_water).
+    Lança ValueError se o token for inválido (inclusive sem instante de emissão).
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        return (
+            _decode_cursor(payload.get("c")),
+            _decode_cursor(payload.get("d")),
+            _from_ms(payload["t"]),
+            _from_ms(payload.get("w")),
+        )
+    except Exception:
+        raise ValueError("Token de sincronização inválido.")
+
+
+def after_cursor(field: str, cursor: Cursor) -> Dict[str, Any]:
+    """
+    Filtro keyset: documentos estritamente depois de (field, _id).
+    """
+    if cursor is None:
+        return {}
+    ts, oid = cursor
+    return {
+        "$or": [
+            {field: {"$gt": ts}},
+            {field: ts, "_id": {"$gt": oid}},
+        ]
+    }
+
+
+def overlap_low_water(now: Optional[datetime] = None) -> datetime:
+    return (now or datetime.utcnow()) - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+
+
+def rewind_cursor(cursor: Cursor, low_water: datetime) -> Cursor:
+    """
+    Fim da rodada: recua o cursor para low_water (se estiver depois dele),
+    para que escritas carimbadas antes e confirmadas depois não se percam.
+    """
+    if cursor is None or cursor[0] <= low_water:
+        return cursor
+    return low_water, _MIN_OBJECT_ID
+
+
+def is_token_expired(issued_at: datetime) -> bool:
+    """
+    O cliente tinha tudo até a emissão do token; só se perdeu tombstones
+    se eles podem ter sido purgados desde então. Um usuário sem alterações
+    há mais de 90 dias não expira enquanto continuar sincronizando.
+    """
+    return issued_at < datetime.utcnow() - timedelta(days=TOMBSTONE_RETENTION_DAYS)
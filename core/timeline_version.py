@@ -0,0 +1,50 @@
+from typing import Optional
+
+from bson import ObjectId
+
+
+async def get_timeline_version(db, user_id: str, session=None) -> int:
+    """
+    Versão da timeline do usuário (contador em users.timeline_version).
+    Leitura de um único campo pelo _id: bem mais barata que a listagem.
+    """
+    doc = await db.users.find_one(
+        {"_id": ObjectId(user_id)},
+        {"timeline_version": 1},
+        session=session,
+    )
+    return (doc or {}).get("timeline_version", 0)
+
+
+async def bump_timeline_version(db, user_id: str) -> None:
+    """
+    Incrementa atomicamente a versão. Chamar em toda escrita em timeline_items.
+    """
+    await db.users.update_one(
+        {"_id": ObjectId(user_id)},
+        {"$inc": {"timeline_version": 1}},
+    )
+
+
+def make_etag(user_id: str, version: int, *parts: str) -> str:
+    suffix = "".join(f".{p}" for p in parts)
+    return f'W/"{user_id}.{version}{suffix}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Compara If-None-Match com o ETag (comparação fraca, aceita lista e '*').
+    """
+    if not if_none_match:
+        return False
+
+    def _opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    target = _opaque(etag)
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or _opaque(candidate) == target:
+            return True
+    return False
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from core.metrics import USER_STATS_DRIFT
+from core.search import build_tag_facet_pipeline
+
+# ----------------------------------------------------------------------
+# Estatísticas materializadas por usuário (coleção user_stats, _id = user).
+#
+# Mantidas com $inc a cada escrita (criação, lote, exclusão, Reluminação,
+# cota/créditos) para que GET /me/stats seja uma leitura pelo _id, sem
+# varrer timeline_items. Como as escritas não são transacionais, um job
+# periódico (um worker por vez, via lease em job_leases) recalcula tudo a
+# partir da fonte e corrige a diferença.
+# ----------------------------------------------------------------------
+USER_STATS_RECONCILE_SECONDS = float(os.getenv("USER_STATS_RECONCILE_SECONDS", "21600"))
+USER_STATS_MAX_TAGS = int(os.getenv("USER_STATS_MAX_TAGS", "5000"))
+
+# Campos de cota copiados de users (ver check_and_consume_relumination_quota)
+QUOTA_FIELDS = (
+    "plan_tier",
+    "relumination_credits",
+    "relumination_used_this_month",
+    "relumination_month_ref",
+)
+
+RECONCILE_LEASE_ID = "user_stats_reconcile"
+
+logger = logging.getLogger(__name__)
+
+
+def _tag_key(tag: str) -> str:
+    # Nomes de campo do Mongo não aceitam "." nem "$" no início
+    return tag.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def tag_from_key(key: str) -> str:
+    return key.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+
+async def update_user_stats(
+    db,
+    user_id: str,
+    inc: Optional[Dict[str, Any]] = None,
+    set_fields: Optional[Dict[str, Any]] = None,
+) -> None:
+    """
+    Aplica $inc/$set no documento de estatísticas (criado se não existir).
+    """
+    update: Dict[str, Any] = {
+        "$set": {**(set_fields or {}), "updated_at": datetime.utcnow()},
+        # Versão: a reconciliação só grava se ninguém escreveu desde a leitura
+        "$inc": {**(inc or {}), "version": 1},
+    }
+    await db.user_stats.update_one({"_id": ObjectId(user_id)}, update, upsert=True)
+
+
+def _memories_delta(docs: Iterable[Dict[str, Any]], sign: int) -> Dict[str, int]:
+    inc: Dict[str, int] = {}
+    for doc in docs:
+        inc["memory_count"] = inc.get("memory_count", 0) + sign
+        if doc.get("relumination_url"):
+            inc["relumination_count"] = inc.get("relumination_count", 0) + sign
+        for tag in set(doc.get("tags") or []):
+            key = f"tag_counts.{_tag_key(tag)}"
+            inc[key] = inc.get(key, 0) + sign
+    return inc
+
+
+async def record_memories_created(db, user_id: str, docs: Iterable[Dict[str, Any]]) -> None:
+    inc = _memories_delta(docs, 1)
+    if inc:
+        await update_user_stats(db, user_id, inc=inc)
+
+
+async def record_memory_deleted(db, user_id: str, doc: Dict[str, Any]) -> None:
+    await update_user_stats(db, user_id, inc=_memories_delta([doc], -1))
+
+
+async def record_relumination(db, user_id: str, first_for_memory: bool) -> None:
+    inc = {"relumination_renders": 1}
+    if first_for_memory:
+        inc["relumination_count"] = 1
+    await update_user_stats(db, user_id, inc=inc)
+
+
+# ----------------------------------------------------------------------
+# Reconciliação
+# ----------------------------------------------------------------------
+async def compute_user_stats(db, user_doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Estatísticas recalculadas da fonte (timeline_items + users).
+    """
+    uid = user_doc["_id"]
+    memory_count = await db.timeline_items.count_documents({"user_id": uid})
+    relumination_count = await db.timeline_items.count_documents(
+        {"user_id": uid, "relumination_url": {"$ne": None}}
+    )
+    tag_counts = {}
+    pipeline = build_tag_facet_pipeline(str(uid), USER_STATS_MAX_TAGS)
+    async for row in db.timeline_items.aggregate(pipeline):
+        tag_counts[_tag_key(row["_id"])] = row["count"]
+
+    return {
+        "memory_count": memory_count,
+        "relumination_count": relumination_count,
+        "tag_counts": tag_counts,
+        **{f: user_doc.get(f) for f in QUOTA_FIELDS},
+    }
+
+
+def _drifted_fields(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    drifted = []
+    for field in ("memory_count", "relumination_count", "tag_counts", *QUOTA_FIELDS):
+        old_value = old.get(field)
+        if field == "tag_counts":
+            old_value = {k: v for k, v in (old_value or {}).items() if v}
+        if old_value != new.get(field):
+            drifted.append(field)
+    return drifted
+
+
+async def reconcile_user_stats(db, user_doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Corrige com $set só os campos que divergem da fonte. A gravação é
+    condicionada à versão lida: se um $inc chegou no meio do recálculo,
+    nada é gravado e a próxima rodada tenta de novo. Retorna o documento.
+    """
+    uid = user_doc["_id"]
+    # Lido antes do recálculo: um $inc posterior muda a versão e cancela a gravação
+    old = await db.user_stats.find_one({"_id": uid}) or {}
+    new = await compute_user_stats(db, user_doc)
+
+    drifted = _drifted_fields(old, new)
+    if old and drifted:
+        for field in drifted:
+            USER_STATS_DRIFT.labels(field).inc()
+        logger.info("user_stats corrigido para %s: %s", uid, ", ".join(drifted))
+
+    now = datetime.utcnow()
+    changes: Dict[str, Any] = {field: new[field] for field in drifted}
+    if "relumination_renders" not in old:
+        # Contador cumulativo: não dá para recalcular, só inicializa
+        changes["relumination_renders"] = new["relumination_count"]
+    changes["reconciled_at"] = now
+    if drifted:
+        changes["updated_at"] = now
+
+    try:
+        result = await db.user_stats.update_one(
+            {"_id": uid, "version": old.get("version", {"$exists": False})},
+            {"$set": changes, "$inc": {"version": 1}},
+            upsert=not old,
+        )
+    except DuplicateKeyError:
+        result = None  # criado por um $inc concorrente
+    if result is None or (result.matched_count == 0 and result.upserted_id is None):
+        logger.debug("user_stats de %s mudou durante a reconciliação; fica para a próxima", uid)
+        return await db.user_stats.find_one({"_id": uid}) or {"_id": uid, **new}
+
+    version = old.get("version") or 0
+    return {**old, "_id": uid, **changes, "version": version + 1}
+
+
+async def reconcile_all_user_stats(db) -> int:
+    projection = {f: 1 for f in QUOTA_FIELDS}
+    count = 0
+    async for user_doc in db.users.find({}, projection).sort("_id", 1):
+        await reconcile_user_stats(db, user_doc)
+        count += 1
+    return count
+
+
+async def _acquire_lease(db, seconds: float) -> bool:
+    """
+    Um worker por rodada: quem conseguir o lease (expirado) reconcilia.
+    """
+    now = datetime.utcnow()
+    try:
+        await db.job_leases.find_one_and_update(
+            {"_id": RECONCILE_LEASE_ID, "expires_at": {"$lte": now}},
+            {"$set": {"expires_at": now + timedelta(seconds=seconds), "pid": os.getpid()}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False  # lease ainda válido em outro worker
+    return True
+
+
+async def _reconcile_loop(db, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if await _acquire_lease(db, interval * 0.9):
+                total = await reconcile_all_user_stats(db)
+                logger.info("user_stats reconciliado (%d usuários)", total)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Falha na reconciliação de user_stats")
+
+
+_reconciler: Optional[asyncio.Task] = None
+
+
+def start_stats_reconciler(db, interval: float = USER_STATS_RECONCILE_SECONDS) -> Optional[asyncio.Task]:
+    global _reconciler
+    if interval <= 0 or _reconciler is not None:
+        return _reconciler
+    _reconciler = asyncio.get_running_loop().create_task(_reconcile_loop(db, interval))
+    return _reconciler
+
+
+async def stop_stats_reconciler() -> None:
+    global _reconciler
+    if _reconciler is not None:
+        _reconciler.cancel()
+        try:
+            await _reconciler
+        except asyncio.CancelledError:
+            pass
+        _reconciler = None
@@ -0,0 +1,225 @@
+import fcntl
+import os
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+# Fora de media/: esse diretório é servido publicamente.
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", os.path.join("data", "vectors"))
+
+_ID_BYTES = 24  # ObjectId em hex
+_ID_DTYPE = f"S{_ID_BYTES}"
+# Linha apagada: id sentinela + vetor zerado, até o próximo rebuild
+_REMOVED_ID = b"-" * _ID_BYTES
+
+FileStamp = Tuple[Tuple[int, int, int], ...]
+
+
+class UserVectorIndex:
+    """
+    Índice vetorial por usuário em disco:
+      - {user}.{dim}.f32: matriz float32 (n, dim), lida via np.memmap
+      - {user}.{dim}.ids: ObjectIds (24 bytes ASCII por linha)
+
+    Vetores já normalizados: similaridade de cosseno = produto interno,
+    calculado com um único matmul sobre a matriz mapeada.
+
+    Escritas (upsert/remove/rebuild) bloqueiam no flock entre workers:
+    chamar via run_in_threadpool, nunca direto no event loop.
+    """
+
+    def __init__(self, user_id: str, dim: int, base_dir: str = VECTOR_INDEX_DIR) -> None:
+        self.user_id = user_id
+        self.dim = dim
+        os.makedirs(base_dir, exist_ok=True)
+        prefix = os.path.join(base_dir, f"{user_id}.{dim}")
+        self.matrix_path = prefix + ".f32"
+        self.ids_path = prefix + ".ids"
+        self.lock_path = prefix + ".lock"
+
+        self._stamp: Optional[FileStamp] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: Optional[np.ndarray] = None
+        self._rows: Dict[str, int] = {}
+        self._removed: np.ndarray = np.zeros(0, dtype=np.intp)
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+    def _file_stamp(self) -> FileStamp:
+        # Tamanho não basta: upsert/remove reescrevem linhas no lugar
+        def _stat(path: str) -> Tuple[int, int, int]:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                return 0, 0, 0
+            return st.st_size, st.st_mtime_ns, st.st_ino
+
+        return _stat(self.matrix_path), _stat(self.ids_path)
+
+    def _load(self) -> None:
+        """
+        (Re)mapeia os arquivos se outro worker os alterou.
+        """
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return
+
+        n = min(stamp[0][0] // (self.dim * 4), stamp[1][0] // _ID_BYTES)
+        if n == 0:
+            self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+            self._ids = np.zeros(0, dtype=_ID_DTYPE)
+        else:
+            self._matrix = np.memmap(
+                self.matrix_path, dtype=np.float32, mode="r", shape=(n, self.dim)
+            )
+            self._ids = np.fromfile(self.ids_path, dtype=_ID_DTYPE, count=n)
+
+        self._removed = np.flatnonzero(self._ids == _REMOVED_ID)
+        self._rows = {oid.decode(): i for i, oid in enumerate(self._ids) if oid != _REMOVED_ID}
+        self._stamp = stamp
+
+    def __len__(self) -> int:
+        self._load()
+        return len(self._rows)
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 10,
+        exclude: Optional[Set[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Top-k por similaridade de cosseno: [(memory_id, score), ...].
+        """
+        self._load()
+        n = len(self._ids)
+        if n == 0:
+            return []
+
+        scores = self._matrix @ np.asarray(query, dtype=np.float32)
+        scores[self._removed] = -np.inf
+        n -= len(self._removed)
+        want = min(n, k + len(exclude or ()))
+        if want <= 0:
+            return []
+        if want < len(scores):
+            top = np.argpartition(-scores, want - 1)[:want]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for i in top:
+            if scores[i] == -np.inf:
+                break
+            oid = self._ids[i].decode()
+            if exclude and oid in exclude:
+                continue
+            results.append((oid, float(scores[i])))
+            if len(results) == k:
+                break
+        return results
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+    @contextmanager
+    def _write_lock(self):
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def upsert(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        """
+        Sobrescreve linhas existentes no lugar e anexa as novas ao final.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._write_lock():
+            self._stamp = None
+            self._load()
+
+            new_ids: List[str] = []
+            new_rows: List[np.ndarray] = []
+            updates: List[Tuple[int, np.ndarray]] = []
+            for oid, vec in zip(ids, vectors):
+                row = self._rows.get(oid)
+                if row is None:
+                    new_ids.append(oid)
+                    new_rows.append(vec)
+                else:
+                    updates.append((row, vec))
+
+            if updates:
+                writable = np.memmap(
+                    self.matrix_path, dtype=np.float32, mode="r+",
+                    shape=(len(self._ids), self.dim),
+                )
+                for row, vec in updates:
+                    writable[row] = vec
+                writable.flush()
+                del writable
+
+            if new_ids:
+                # Trunca sobras de uma escrita interrompida antes de anexar.
+                n = len(self._ids)
+                for path, size in ((self.matrix_path, n * self.dim * 4), (self.ids_path, n * _ID_BYTES)):
+                    with open(path, "ab") as f:
+                        f.truncate(size)
+                with open(self.matrix_path, "ab") as f:
+                    f.write(np.vstack(new_rows).tobytes())
+                with open(self.ids_path, "ab") as f:
+                    f.write(np.array(new_ids, dtype=_ID_DTYPE).tobytes())
+
+            self._stamp = None
+
+    def remove(self, ids: Sequence[str]) -> int:
+        """
+        Apaga linhas no lugar (id sentinela + vetor zerado), sem reescrever
+        o índice; o espaço volta no próximo rebuild. Retorna quantas saíram.
+        """
+        with self._write_lock():
+            self._stamp = None
+            self._load()
+            rows = sorted(self._rows[oid] for oid in set(ids) if oid in self._rows)
+            if rows:
+                zeros = bytes(self.dim * 4)
+                with open(self.ids_path, "r+b") as f_ids, open(self.matrix_path, "r+b") as f_matrix:
+                    for row in rows:
+                        f_ids.seek(row * _ID_BYTES)
+                        f_ids.write(_REMOVED_ID)
+                        f_matrix.seek(row * self.dim * 4)
+                        f_matrix.write(zeros)
+            self._stamp = None
+            return len(rows)
+
+    def rebuild(self, ids: Sequence[str], matrix: np.ndarray) -> None:
+        """
+        Substitui o índice inteiro (escrita em arquivo temporário + os.replace).
+        """
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        with self._write_lock():
+            for path, data in (
+                (self.matrix_path, matrix.tobytes()),
+                (self.ids_path, np.array(list(ids), dtype=_ID_DTYPE).tobytes()),
+            ):
+                tmp = path + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            self._stamp = None
+
+
+_indexes: Dict[Tuple[str, int], UserVectorIndex] = {}
+
+
+def get_user_index(user_id: str, dim: int) -> UserVectorIndex:
+    key = (user_id, dim)
+    index = _indexes.get(key)
+    if index is None:
+        index = _indexes[key] = UserVectorIndex(user_id, dim)
+    return index
@@ -0,0 +1,174 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+from typing import Any, Dict, Optional
+
+from core.metrics import observe_dependency
+
+# ----------------------------------------------------------------------
+# Metadados e pôster de vídeos enviados.
+#
+# Usa o ffprobe se existir; senão, o ffmpeg (o mesmo binário que o moviepy
+# usa, via imageio_ffmpeg) lendo só o cabeçalho. O pôster sai de um seek
+# por keyframe (-ss antes de -i + -noaccurate_seek + -skip_frame nokey):
+# decodifica um único frame, então o custo não cresce com a duração do
+# vídeo (~0.1 s num 1080p de 60 s, contra ~5 s decodificando tudo).
+# ----------------------------------------------------------------------
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY") or shutil.which("ffprobe")
+VIDEO_PROBE_TIMEOUT_SECONDS = float(os.getenv("VIDEO_PROBE_TIMEOUT_SECONDS", "10"))
+POSTER_MAX_SECONDS = 1.0  # pula o 1º segundo (fade-in/tela preta) se houver
+
+_ffmpeg_binary: Optional[str] = None
+
+
+def _ffmpeg() -> str:
+    global _ffmpeg_binary
+    if _ffmpeg_binary is None:
+        binary = os.getenv("FFMPEG_BINARY")
+        if not binary:
+            try:
+                import imageio_ffmpeg
+
+                binary = imageio_ffmpeg.get_ffmpeg_exe()
+            except Exception:
+                binary = shutil.which("ffmpeg")
+        if not binary:
+            raise RuntimeError("ffmpeg não encontrado.")
+        _ffmpeg_binary = binary
+    return _ffmpeg_binary
+
+
+def _run(args: list) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        args,
+        capture_output=True,
+        text=True,
+        timeout=VIDEO_PROBE_TIMEOUT_SECONDS,
+    )
+
+
+def _normalize_rotation(value: Any) -> int:
+    try:
+        return int(round(float(value))) % 360
+    except (TypeError, ValueError):
+        return 0
+
+
+def _with_display_size(meta: Dict[str, Any]) -> Dict[str, Any]:
+    # Vídeo de celular em retrato costuma vir 1920x1080 com rotação 90
+    if meta["rotation"] in (90, 270):
+        meta["display_width"], meta["display_height"] = meta["height"], meta["width"]
+    else:
+        meta["display_width"], meta["display_height"] = meta["width"], meta["height"]
+    return meta
+
+
+def _probe_with_ffprobe(path: str) -> Dict[str, Any]:
+    proc = _run([
+        FFPROBE_BINARY, "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries",
+        "stream=codec_name,width,height:stream_tags=rotate:stream_side_data=rotation:format=duration",
+        "-of", "json",
+        path,
+    ])
+    if proc.returncode != 0:
+        raise ValueError(proc.stderr.strip() or "ffprobe falhou")
+
+    data = json.loads(proc.stdout or "{}")
+    streams = data.get("streams") or []
+    if not streams:
+        raise ValueError("Arquivo sem faixa de vídeo.")
+    stream = streams[0]
+
+    rotation = (stream.get("tags") or {}).get("rotate")
+    for side_data in stream.get("side_data_list") or []:
+        if "rotation" in side_data:
+            rotation = side_data["rotation"]
+
+    return {
+        "duration": float((data.get("format") or {}).get("duration") or 0.0),
+        "width": int(stream.get("width") or 0),
+        "height": int(stream.get("height") or 0),
+        "rotation": _normalize_rotation(rotation),
+        "codec": stream.get("codec_name"),
+    }
+
+
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+_VIDEO_STREAM_RE = re.compile(r"Stream #\S+.*?: Video: (\w+).*?,\s*(\d{2,5})x(\d{2,5})")
+_ROTATE_TAG_RE = re.compile(r"^\s*rotate\s*:\s*(-?\d+)", re.MULTILINE)
+_DISPLAYMATRIX_RE = re.compile(r"rotation of (-?\d+(?:\.\d+)?) degrees")
+
+
+def _probe_with_ffmpeg(path: str) -> Dict[str, Any]:
+    # Sem saída: o ffmpeg só lê o cabeçalho, imprime as infos e sai com erro
+    proc = _run([_ffmpeg(), "-hide_banner", "-i", path])
+    info = proc.stderr
+
+    stream = _VIDEO_STREAM_RE.search(info)
+    if not stream:
+        raise ValueError("Arquivo sem faixa de vídeo.")
+
+    duration = 0.0
+    match = _DURATION_RE.search(info)
+    if match:
+        h, m, s = match.groups()
+        duration = int(h) * 3600 + int(m) * 60 + float(s)
+
+    rotation: Any = 0
+    match = _ROTATE_TAG_RE.search(info) or _DISPLAYMATRIX_RE.search(info)
+    if match:
+        rotation = match.group(1)
+        # displaymatrix usa o sentido anti-horário (ex.: -90 = rotate 90)
+        if match.re is _DISPLAYMATRIX_RE:
+            rotation = -float(rotation)
+
+    return {
+        "duration": duration,
+        "width": int(stream.group(2)),
+        "height": int(stream.group(3)),
+        "rotation": _normalize_rotation(rotation),
+        "codec": stream.group(1),
+    }
+
+
+def probe_video(path: str) -> Dict[str, Any]:
+    """
+    duration (s), width/height (codificados), rotation (0/90/180/270),
+    display_width/display_height (já rotacionados) e codec.
+    Lança ValueError se o arquivo não tiver vídeo legível.
+    """
+    with observe_dependency("video", "probe"):
+        if FFPROBE_BINARY:
+            meta = _probe_with_ffprobe(path)
+        else:
+            meta = _probe_with_ffmpeg(path)
+    return _with_display_size(meta)
+
+
+def poster_timestamp(duration: float) -> float:
+    return min(POSTER_MAX_SECONDS, duration / 10) if duration > 0 else 0.0
+
+
+def extract_poster_frame(path: str, out_path: str, at_seconds: float = 0.0) -> str:
+    """
+    Grava em out_path (JPEG) o keyframe mais próximo de at_seconds.
+    O ffmpeg já aplica a rotação dos metadados no frame gerado.
+    """
+    with observe_dependency("video", "poster"):
+        proc = _run([
+            _ffmpeg(), "-hide_banner", "-v", "error",
+            "-skip_frame", "nokey",
+            "-noaccurate_seek", "-ss", f"{at_seconds:.3f}",
+            "-an", "-sn", "-dn",
+            "-i", path,
+            "-frames:v", "1",
+            "-q:v", "3",
+            "-y", out_path,
+        ])
+    if proc.returncode != 0 or not os.path.exists(out_path):
+        raise ValueError(proc.stderr.strip() or "Falha ao extrair o pôster.")
+    return out_path
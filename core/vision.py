@@ -0,0 +1,56 @@
+import os
+from typing import Any, Dict
+
+import requests
+
+from core.resilience import call_with_policy, hedged
+
+VISION_ENDPOINT = os.getenv("VISION_ENDPOINT", "").rstrip("/")
+VISION_KEY = os.getenv("VISION_KEY", "")
+
+# Teto por tentativa (limitado também pelo prazo da requisição)
+VISION_TIMEOUT_SECONDS = float(os.getenv("VISION_TIMEOUT_SECONDS", "20"))
+# >0: se a 1ª chamada não responder nesse tempo, dispara uma cópia (hedge)
+VISION_HEDGE_AFTER_MS = float(os.getenv("VISION_HEDGE_AFTER_MS", "0"))
+
+
+def _post_analyze(blob_url: str, timeout: float) -> Dict[str, Any]:
+    analyze_url = (
+        f"{VISION_ENDPOINT}/vision/v3.2/analyze"
+        "?visualFeatures=Description,Tags,Faces"
+    )
+    headers = {
+        "Ocp-Apim-Subscription-Key": VISION_KEY,
+        "Content-Type": "application/json",
+    }
+    payload = {"url": blob_url}
+
+    r = requests.post(
+        analyze_url,
+        headers=headers,
+        json=payload,
+        timeout=timeout,
+    )
+    r.raise_for_status()
+    return r.json()
+
+
+def analyze_image_url(blob_url: str) -> Dict[str, Any]:
+    """
+    Analisa uma imagem pública com o Azure Vision (Description, Tags, Faces).
+    Nunca lança exceção: em caso de falha retorna {"error": ...}.
+    """
+
+    def _attempt(timeout: float) -> Dict[str, Any]:
+        return hedged(
+            lambda t: _post_analyze(blob_url, t),
+            timeout,
+            VISION_HEDGE_AFTER_MS / 1000,
+        )
+
+    try:
+        return call_with_policy("vision", "analyze", _attempt, VISION_TIMEOUT_SECONDS)
+    except requests.HTTPError as ex:
+        return {"error": ex.response.text}
+    except Exception as ex:
+        return {"error": str(ex)}
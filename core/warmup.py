@@ -0,0 +1,43 @@
+import logging
+import os
+import time
+
+from core.llm import get_openai_async_client, get_openai_client
+from core.reluminations import _get_font, load_render_stack
+
+# ----------------------------------------------------------------------
+# Pré-aquecimento opcional no master do gunicorn (GUNICORN_PRELOAD=1,
+# ver gunicorn.conf.py): os workers nascem do fork já com fontes, SDK do
+# OpenAI e (WARMUP_RENDER=1) moviepy carregados, compartilhando as
+# páginas via copy-on-write.
+#
+# Nada aqui pode abrir conexões: sockets/threads não sobrevivem ao fork.
+# O Mongo (motor, connect=False) só conecta na primeira operação de cada
+# worker, e os clientes do OpenAI só abrem conexão na primeira chamada.
+# ----------------------------------------------------------------------
+WARMUP_RENDER = os.getenv("WARMUP_RENDER", "0") == "1"
+
+logger = logging.getLogger("relluna.warmup")
+
+
+def warmup(render: bool = WARMUP_RENDER) -> float:
+    """
+    Carrega fontes e clientes (e a stack de render, se pedido).
+    Retorna o tempo gasto em segundos.
+    """
+    start = time.perf_counter()
+
+    _get_font(50)
+
+    try:
+        get_openai_client()
+        get_openai_async_client()
+    except RuntimeError:
+        logger.warning("OpenAI não configurado; clientes não pré-carregados.")
+
+    if render:
+        load_render_stack()
+
+    elapsed = time.perf_counter() - start
+    logger.info("Warmup concluído em %.2f s (render=%s)", elapsed, render)
+    return elapsed
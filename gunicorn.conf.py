@@ -0,0 +1,20 @@
+# Configuração do gunicorn usada pelo startup.sh.
+import os
+
+# GUNICORN_PRELOAD=1: importa o app uma vez no master e roda o warmup
+# (core/warmup.py) antes do fork; os workers sobem sem repetir o import.
+preload_app = os.getenv("GUNICORN_PRELOAD", "0") == "1"
+
+
+def when_ready(server):
+    if preload_app:
+        from core.warmup import warmup
+
+        warmup()
+
+
+def child_exit(server, worker):
+    # Remove as métricas "live" do worker que saiu (modo multiprocess).
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
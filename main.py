@@ -1,13 +1,45 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
+from core.compression import CompressionMiddleware
+from core.database import close_database, open_database
+from core.indexes import backfill_updated_at, ensure_indexes
+from core.loop_watchdog import LoopWatchdogMiddleware, start_watchdog, stop_watchdog
+from core.metrics import MetricsMiddleware
+from core.profiling import ProfilingMiddleware
+from core.resilience import DeadlineMiddleware
+from core.serialization import ORJSONResponse
+from core.user_stats import start_stats_reconciler, stop_stats_reconciler
 from routers.auth import router as auth_router
 from routers.memories import router as memories_router
+from routers.me import router as me_router
 from routers.core import router as core_router
 
+# -----------------------------
+# LIFESPAN (Mongo, índices, watchdog, reconciliação de user_stats)
+# -----------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db = open_database()
+    await ensure_indexes(db)
+    await backfill_updated_at(db)
+    start_watchdog()
+    start_stats_reconciler(db)
+    try:
+        yield
+    finally:
+        await stop_stats_reconciler()
+        await stop_watchdog()
+        close_database()
+
+
 app = FastAPI(
     title="Relluna API",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     version="0.1.0",
     docs_url="/docs",
     redoc_url="/redoc",
@@ -33,6 +65,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# -----------------------------
+# COMPRESSÃO (br/gzip negociado, ver core/compression.py)
+# -----------------------------
+app.add_middleware(CompressionMiddleware)
+
+# -----------------------------
+# MÉTRICAS (latência por rota)
+# -----------------------------
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(LoopWatchdogMiddleware)
+
+# -----------------------------
+# PRAZO POR REQUISIÇÃO (chamadas externas, ver core/resilience.py)
+# -----------------------------
+app.add_middleware(DeadlineMiddleware)
+
+# -----------------------------
+# PROFILING SOB DEMANDA (PROFILING_TOKEN)
+# -----------------------------
+app.add_middleware(ProfilingMiddleware)
+
 # -----------------------------
 # STATIC FILES
 # -----------------------------
@@ -45,3 +98,4 @@ app.mount("/media", StaticFiles(directory="media"), name="media")
 app.include_router(core_router, prefix="", tags=["core"])
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.include_router(memories_router, prefix="/memories", tags=["memories"])
+app.include_router(me_router, prefix="/me", tags=["me"])
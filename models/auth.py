@@ -1,11 +1,30 @@
-from pydantic import BaseModel, EmailStr
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, EmailStr, Field
 
 
 class LoginData(BaseModel):
     email: EmailStr
     password: str
+    # Identifica o aparelho: um novo login no mesmo device substitui a sessão anterior
+    device_id: Optional[str] = Field(None, max_length=128)
 
 
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
+    refresh_expires_at: Optional[datetime] = None
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str = Field(..., min_length=16, max_length=256)
+
+
+class SessionPublic(BaseModel):
+    session_id: str
+    device_id: Optional[str] = None
+    created_at: datetime
+    last_refreshed_at: datetime
+    expires_at: datetime
@@ -1,7 +1,21 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+
+class VideoMetadata(BaseModel):
+    """
+    Lido do cabeçalho do vídeo no upload (core/video_probe.py).
+    display_* já considera a rotação.
+    """
+    duration: float
+    width: int
+    height: int
+    rotation: int = 0
+    display_width: Optional[int] = None
+    display_height: Optional[int] = None
+    codec: Optional[str] = None
 
 
 class MemoryBase(BaseModel):
@@ -20,7 +34,17 @@ class MemoryCreate(MemoryBase):
     Modelo de entrada ao criar memória.
     Campos de acessibilidade são opcionais.
     """
-    pass
+
+    # Só na entrada: MemoryPublic não revalida documentos antigos
+    @field_validator("tags")
+    @classmethod
+    def _clean_tags(cls, tags: List[str]) -> List[str]:
+        cleaned = [tag.strip() for tag in tags]
+        if any(not tag for tag in cleaned):
+            raise ValueError("Tags não podem ser vazias.")
+        if len(set(cleaned)) != len(cleaned):
+            raise ValueError("Tags repetidas na mesma memória.")
+        return cleaned
 
 
 class MemoryPublic(MemoryBase):
@@ -30,6 +54,76 @@ class MemoryPublic(MemoryBase):
     id: str
     user_id: str
     created_at: datetime
+    # Definidos pelo servidor no upload (core/media_derivatives.py);
+    # os mesmos campos no corpo de POST /memories/ são ignorados
+    media_type: Optional[Literal["image", "video"]] = None
+    poster_url: Optional[str] = None
+    video_metadata: Optional[VideoMetadata] = None
+    # MP4 ou, com HLS ativo, o master playlist (.m3u8)
+    relumination_url: Optional[str] = None
+    relumination_mp4_url: Optional[str] = None
+    relumination_style: Optional[int] = None
 
     class Config:
         orm_mode = True
+
+
+class MemorySummary(BaseModel):
+    """
+    Visão resumida (view=summary) para grids de miniaturas.
+    """
+    id: str
+    user_id: str
+    main_caption: str
+    media_url: Optional[str] = None
+    poster_url: Optional[str] = None
+    created_at: datetime
+    relumination_url: Optional[str] = None
+
+
+class MemorySyncResponse(BaseModel):
+    """
+    Resposta do delta-sync: memórias criadas/alteradas e IDs apagados
+    desde o sync_token enviado pelo cliente. Alterações dos últimos
+    segundos podem ser reenviadas na rodada seguinte: aplicar por id.
+    """
+    changed: List[MemoryPublic] = []
+    deleted: List[str] = []
+    sync_token: str
+    has_more: bool = False
+    full_resync: bool = False
+
+
+class BulkCreateError(BaseModel):
+    index: int
+    message: str
+
+
+class MemoryBulkCreateResponse(BaseModel):
+    inserted_ids: List[str] = []
+    errors: List[BulkCreateError] = []
+    enrichment_scheduled: int = 0
+
+
+class AccessibilityBatchRequest(BaseModel):
+    """
+    Processa as memórias do usuário ainda sem alt_text (todas, ou só as
+    de memory_ids); as que já têm texto são ignoradas.
+    """
+    memory_ids: Optional[List[str]] = None
+    limit: int = Field(200, ge=1, le=1000)
+
+
+class MemorySearchResponse(BaseModel):
+    items: List[MemoryPublic] = []
+    next_cursor: Optional[str] = None
+
+
+class TagCount(BaseModel):
+    tag: str
+    count: int
+
+
+class SimilarMemory(BaseModel):
+    memory: MemoryPublic
+    score: float
@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import Dict, Optional
+
+from pydantic import BaseModel, Field
+
+
+class UploadUrlRequest(BaseModel):
+    filename: Optional[str] = None
+    content_type: str = Field(..., min_length=1)
+
+
+class UploadUrlResponse(BaseModel):
+    """
+    URL SAS (somente escrita) para upload direto ao Blob.
+    O cliente faz PUT em upload_url com os headers de required_headers.
+    """
+    blob_name: str
+    blob_url: str
+    upload_url: str
+    expires_at: datetime
+    required_headers: Dict[str, str] = {}
+
+
+class UploadCompleteRequest(BaseModel):
+    blob_name: str = Field(..., min_length=1)
@@ -1,8 +1,10 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, EmailStr, Field
 
+from models.memory import TagCount
+
 
 class UserBase(BaseModel):
     name: str = Field(..., min_length=2)
@@ -21,3 +23,19 @@ class UserInDB(UserBase):
 
 class UserPublic(UserBase):
     id: str
+
+
+class UserStats(BaseModel):
+    """
+    GET /me/stats: leitura única de user_stats (ver core/user_stats.py).
+    """
+    memory_count: int = 0
+    relumination_count: int = 0  # memórias com Reluminação
+    relumination_renders: int = 0  # renders feitos (inclui refeitos)
+    tags: List[TagCount] = []
+    plan_tier: str = "beta_free"
+    relumination_credits: int = 0
+    relumination_used_this_month: int = 0
+    relumination_monthly_remaining: Optional[int] = None  # None = sem limite mensal
+    updated_at: Optional[datetime] = None
+    reconciled_at: Optional[datetime] = None
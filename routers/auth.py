@@ -1,12 +1,23 @@
 from datetime import datetime
+from typing import List
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from pymongo.errors import ServerSelectionTimeoutError
 
 from core.database import db
+from core.deps import get_current_user_id
+from core.refresh_tokens import (
+    RefreshTokenError,
+    issue_refresh_token,
+    list_sessions,
+    revoke_by_token,
+    revoke_device_sessions,
+    revoke_session,
+    rotate_refresh_token,
+)
 from core.security import get_password_hash, verify_password, create_access_token
 from models.user import UserCreate, UserPublic, UserInDB
-from models.auth import LoginData, Token
+from models.auth import LoginData, RefreshRequest, SessionPublic, Token
 
 router = APIRouter()
 
@@ -84,5 +95,61 @@ async def login(data: LoginData):
     if not verify_password(data.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Credenciais inválidas.")
 
+    # Um login por device: a sessão anterior do mesmo aparelho é revogada
+    if data.device_id:
+        await revoke_device_sessions(db, user.id, data.device_id)
+    refresh_token, refresh_expires_at = await issue_refresh_token(
+        db, user.id, device_id=data.device_id
+    )
+
     access_token = create_access_token({"sub": user.id})
-    return Token(access_token=access_token)
+    return Token(
+        access_token=access_token,
+        refresh_token=refresh_token,
+        refresh_expires_at=refresh_expires_at,
+    )
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(data: RefreshRequest):
+    """
+    Troca o refresh token por um novo par (access + refresh), sem senha.
+    O refresh token usado deixa de valer; reusá-lo revoga a sessão.
+    """
+    try:
+        user_id, refresh_token, refresh_expires_at = await rotate_refresh_token(
+            db, data.refresh_token
+        )
+    except RefreshTokenError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
+    return Token(
+        access_token=create_access_token({"sub": user_id}),
+        refresh_token=refresh_token,
+        refresh_expires_at=refresh_expires_at,
+    )
+
+
+@router.post("/logout", status_code=204)
+async def logout(data: RefreshRequest):
+    await revoke_by_token(db, data.refresh_token)
+    return Response(status_code=204)
+
+
+@router.get("/sessions", response_model=List[SessionPublic])
+async def get_sessions(user_id: str = Depends(get_current_user_id)):
+    return await list_sessions(db, user_id)
+
+
+@router.delete("/sessions/{session_id}", status_code=204)
+async def delete_session(session_id: str, user_id: str = Depends(get_current_user_id)):
+    if not await revoke_session(db, user_id, session_id):
+        raise HTTPException(status_code=404, detail="Sessão não encontrada.")
+    return Response(status_code=204)
+
+
+@router.delete("/devices/{device_id}", status_code=204)
+async def delete_device_sessions(device_id: str, user_id: str = Depends(get_current_user_id)):
+    if not await revoke_device_sessions(db, user_id, device_id):
+        raise HTTPException(status_code=404, detail="Nenhuma sessão ativa neste device.")
+    return Response(status_code=204)
@@ -1,12 +1,22 @@
 import os
 import uuid
-import requests
-from typing import Any, Dict, List
+from typing import Any, Dict, Optional
 
-from fastapi import APIRouter, UploadFile, File, Body, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, Body, Depends, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, Response
 from azure.storage.blob import BlobClient
-from openai import AzureOpenAI
+
+from core.accessibility import extract_vision_caption_and_tags
+from core.accessibility_cache import get_or_generate_accessibility, start_speculative_accessibility
+from core.database import db
+from core.deps import get_optional_user_id
+from core.metrics import observe_dependency, render_metrics
+from core.phash import find_and_record_near_duplicates
+from core.profiling import is_authorized, read_profile
+from core.resilience import DependencyUnavailable, is_transient
+from core.serialization import ORJSONResponse
+from core.vision import analyze_image_url
 
 router = APIRouter()
 
@@ -17,22 +27,6 @@ router = APIRouter()
 AZURE_STORAGE_URL = os.getenv("AZURE_STORAGE_URL", "").rstrip("/")
 AZURE_BLOB_CONNECTION_STRING = os.getenv("AZURE_BLOB_CONNECTION_STRING", "")
 
-VISION_ENDPOINT = os.getenv("VISION_ENDPOINT", "").rstrip("/")
-VISION_KEY = os.getenv("VISION_KEY", "")
-
-OPENAI_ENDPOINT = os.getenv("OPENAI_ENDPOINT", "")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
-OPENAI_DEPLOYMENT = os.getenv("OPENAI_DEPLOYMENT", "")
-
-if not OPENAI_ENDPOINT or not OPENAI_API_KEY or not OPENAI_DEPLOYMENT:
-    raise RuntimeError("OPENAI configs não definidas corretamente.")
-
-openai_client = AzureOpenAI(
-    azure_endpoint=OPENAI_ENDPOINT,
-    api_key=OPENAI_API_KEY,
-    api_version="2024-12-01-preview",
-)
-
 APP_NAME = "relluna-api"
 
 # ============================================================
@@ -47,12 +41,37 @@ async def root():
 async def health():
     return {"status": "ok", "app": APP_NAME}
 
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@router.get("/debug/profiles/{profile_id}", include_in_schema=False)
+async def get_profile(
+    profile_id: str,
+    kind: str = "txt",
+    x_relluna_profile: Optional[str] = Header(None),
+):
+    """
+    Perfil gravado pelo ProfilingMiddleware (kind=txt ou collapsed).
+    """
+    if not is_authorized(x_relluna_profile):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    content = read_profile(profile_id, kind)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado.")
+    return PlainTextResponse(content)
+
 # ============================================================
 # UPLOAD (Blob + Vision)
 # ============================================================
 
 @router.post("/upload")
-async def upload(file: UploadFile = File(...)):
+async def upload(
+    file: UploadFile = File(...),
+    user_id: Optional[str] = Depends(get_optional_user_id),
+):
     try:
         blob_name = f"{uuid.uuid4()}_{file.filename}"
         container_name = AZURE_STORAGE_URL.split("/")[-1]
@@ -64,39 +83,43 @@ async def upload(file: UploadFile = File(...)):
         )
 
         data = await file.read()
-        blob.upload_blob(data, overwrite=True)
+        with observe_dependency("blob", "upload"):
+            blob.upload_blob(data, overwrite=True)
         blob_url = f"{AZURE_STORAGE_URL}/{blob_name}"
 
-        analyze_url = (
-            f"{VISION_ENDPOINT}/vision/v3.2/analyze"
-            "?visualFeatures=Description,Tags,Faces"
-        )
-        headers = {
-            "Ocp-Apim-Subscription-Key": VISION_KEY,
-            "Content-Type": "application/json",
-        }
-        payload = {"url": blob_url}
+        vision_result = await run_in_threadpool(analyze_image_url, blob_url)
+
+        result = {"blob": blob_url, "vision": vision_result}
+        # Vision indisponível: devolve o upload mesmo assim, sem as tags
+        if "error" in vision_result:
+            result["degraded"] = ["vision"]
 
-        try:
-            r = requests.post(analyze_url, headers=headers, json=payload, timeout=20)
-            vision_result = r.json() if r.ok else {"error": r.text}
-        except Exception as ex:
-            vision_result = {"error": str(ex)}
+        # Adianta alt/short/long: o /accessibility seguinte só busca o resultado
+        result["accessibility_pending"] = start_speculative_accessibility(db, blob_url, vision_result)
 
-        return JSONResponse({"blob": blob_url, "vision": vision_result})
+        # Quase-duplicatas só fazem sentido com usuário identificado
+        if user_id:
+            dup = await find_and_record_near_duplicates(db, user_id, data, blob_url)
+            if dup:
+                result.update(dup)
+
+        return ORJSONResponse(result)
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        # Timeout/5xx no upload ao Blob (o Vision já volta degradado
+        # sem lançar): dependência indisponível, não bug
+        raise HTTPException(status_code=503 if is_transient(e) else 500, detail=str(e))
 
 # ============================================================
 # ACCESSIBILITY (ALT + SHORT + LONG)
 # ============================================================
 
 @router.post("/accessibility")
-async def accessibility(payload: Dict[str, Any] = Body(...)):
+async def accessibility(response: Response, payload: Dict[str, Any] = Body(...)):
     """
     ALT TEXT + SHORT DESCRIPTION + LONG DESCRIPTION
-    usando Vision + texto do usuário
+    usando Vision + texto do usuário.
+    Normalmente já adiantado pelo /upload (ver core/accessibility_cache.py).
     """
     try:
         blob_url = payload.get("blob_url")
@@ -110,91 +133,25 @@ async def accessibility(payload: Dict[str, Any] = Body(...)):
             )
 
         # Vision → caption + tags
-        desc = vision_result.get("description") or {}
-        captions: List[Dict[str, Any]] = desc.get("captions") or []
-        vision_caption = (
-            captions[0].get("text") if captions and isinstance(captions[0], dict)
-            else "Imagem."
-        )
-
-        tags_raw = vision_result.get("tags") or []
-        tag_names: List[str] = []
-        for t in tags_raw:
-            if isinstance(t, dict):
-                if t.get("name"):
-                    tag_names.append(t["name"])
-            else:
-                tag_names.append(str(t))
-
-        tags_str = ", ".join(tag_names) if tag_names else "memória pessoal"
-
-        # =======================
-        # ALT TEXT (1 frase)
-        # =======================
-        alt_prompt = (
-            "Gere um texto alternativo (alt text) em UMA frase, útil para uma pessoa "
-            "com deficiência visual, usando apenas o que o usuário descreveu e o que o Vision detectou.\n\n"
-            f"Descrição do usuário: {user_caption or '[vazia]'}\n"
-            f"Legenda do Vision: {vision_caption}\n"
-            f"Tags: {tags_str}\n"
-        )
+        vision_caption, tags_str = extract_vision_caption_and_tags(vision_result)
 
-        alt_resp = openai_client.chat.completions.create(
-            model=OPENAI_DEPLOYMENT,
-            messages=[{"role": "user", "content": alt_prompt}],
-            max_tokens=60,
-            temperature=0.2,
-        )
-        alt_msg = alt_resp.choices[0].message
-        alt_text = alt_msg.content.strip()
-
-        # =======================
-        # SHORT DESCRIPTION (1–2 frases)
-        # =======================
-        short_prompt = (
-            "Descreva a imagem em 1–2 frases, de forma objetiva e acessível.\n"
-            "Use apenas o que o usuário disse e o que o Vision detectou. Não invente nada.\n\n"
-            f"Descrição do usuário: {user_caption or '[vazia]'}\n"
-            f"Legenda do Vision: {vision_caption}\n"
-            f"Tags: {tags_str}\n"
+        # ALT (1 frase) + SHORT (1–2 frases) + LONG (3–6 frases), em paralelo;
+        # campos que falharem voltam null e listados em "degraded"
+        cached, source = await get_or_generate_accessibility(
+            db, blob_url, user_caption, vision_caption, tags_str
         )
-
-        short_resp = openai_client.chat.completions.create(
-            model=OPENAI_DEPLOYMENT,
-            messages=[{"role": "user", "content": short_prompt}],
-            max_tokens=80,
-            temperature=0.3,
-        )
-        short_description = short_resp.choices[0].message.content.strip()
-
-        # =======================
-        # LONG DESCRIPTION (3–6 frases)
-        # =======================
-        long_prompt = (
-            "Crie uma descrição acessível e detalhada (3–6 frases), "
-            "usando APENAS o texto do usuário, a legenda do Vision e as tags detectadas.\n"
-            "Não invente nomes, locais ou relações familiares não citadas.\n"
-            "Se o usuário mencionou 'mãos do meu avô', você pode repetir exatamente.\n\n"
-            f"Descrição do usuário: {user_caption or '[vazia]'}\n"
-            f"Legenda do Vision: {vision_caption}\n"
-            f"Tags: {tags_str}\n"
-        )
-
-        long_resp = openai_client.chat.completions.create(
-            model=OPENAI_DEPLOYMENT,
-            messages=[{"role": "user", "content": long_prompt}],
-            max_tokens=220,
-            temperature=0.3,
-        )
-        long_description = long_resp.choices[0].message.content.strip()
-
-        return {
-            "alt_text": alt_text,
-            "short_description": short_description,
-            "long_description": long_description,
-        }
+        response.headers["X-Accessibility-Source"] = source
+        result = dict(cached)
+        degraded = [field for field, text in result.items() if text is None]
+        if degraded:
+            result["degraded"] = degraded
+        return result
 
     except HTTPException:
         raise
+    except DependencyUnavailable as e:
+        headers = {"Retry-After": str(int(e.retry_after))} if e.retry_after else None
+        raise HTTPException(status_code=503, detail=str(e), headers=headers)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        # Timeout/5xx do Azure OpenAI em todos os campos: indisponível, não bug
+        raise HTTPException(status_code=503 if is_transient(e) else 500, detail=str(e))
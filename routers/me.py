@@ -0,0 +1,63 @@
+from datetime import datetime
+
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from core.database import db
+from core.deps import get_current_user_id
+from core.reluminations import BETA_MONTHLY_LIMIT
+from core.user_stats import QUOTA_FIELDS, USER_STATS_MAX_TAGS, reconcile_user_stats, tag_from_key
+from models.memory import TagCount
+from models.user import UserStats
+
+router = APIRouter()
+
+
+def _stats_to_public(doc: dict, tags_limit: int) -> UserStats:
+    plan = doc.get("plan_tier") or "beta_free"
+
+    # Virada de mês sem Reluminação nova: o contador do mês anterior não vale
+    used = doc.get("relumination_used_this_month") or 0
+    if doc.get("relumination_month_ref") != datetime.utcnow().strftime("%Y-%m"):
+        used = 0
+
+    tags = sorted(
+        ((tag_from_key(k), v) for k, v in (doc.get("tag_counts") or {}).items() if v > 0),
+        key=lambda item: (-item[1], item[0]),
+    )[:tags_limit]
+
+    return UserStats(
+        memory_count=max(doc.get("memory_count") or 0, 0),
+        relumination_count=max(doc.get("relumination_count") or 0, 0),
+        relumination_renders=doc.get("relumination_renders") or 0,
+        tags=[TagCount(tag=t, count=c) for t, c in tags],
+        plan_tier=plan,
+        relumination_credits=doc.get("relumination_credits") or 0,
+        relumination_used_this_month=used,
+        relumination_monthly_remaining=(
+            max(BETA_MONTHLY_LIMIT - used, 0) if plan == "beta_free" else None
+        ),
+        updated_at=doc.get("updated_at"),
+        reconciled_at=doc.get("reconciled_at"),
+    )
+
+
+@router.get("/stats", response_model=UserStats)
+async def get_my_stats(
+    tags_limit: int = Query(20, ge=0, le=USER_STATS_MAX_TAGS),
+    user_id: str = Depends(get_current_user_id),
+):
+    """
+    Contagens do painel em uma leitura pelo _id de user_stats.
+    """
+    doc = await db.user_stats.find_one({"_id": ObjectId(user_id)})
+    if doc is None or "reconciled_at" not in doc:
+        # Usuário anterior às estatísticas (ou só com $inc parciais): calcula da fonte uma vez
+        user_doc = await db.users.find_one(
+            {"_id": ObjectId(user_id)}, {f: 1 for f in QUOTA_FIELDS}
+        )
+        if not user_doc:
+            raise HTTPException(401, "Usuário não encontrado.")
+        doc = await reconcile_user_stats(db, user_doc)
+
+    return _stats_to_public(doc, tags_limit)
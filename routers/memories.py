@@ -1,49 +1,115 @@
+import asyncio
 from datetime import datetime
+import logging
 import os
-from typing import List
+import subprocess
+from typing import List, Literal, Optional, Union
 
 from bson import ObjectId
+from bson.errors import InvalidId
 from fastapi import (
     APIRouter,
+    BackgroundTasks,
+    Body,
     Depends,
     Header,
     HTTPException,
-    status,
+    Query,
+    Response,
     UploadFile,
     File,
 )
 
-from core.database import db
-from core.security import decode_access_token
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pymongo.errors import BulkWriteError
+
+from core.accessibility import enrich_memories
+
+from core.blob_storage import (
+    MAX_DIRECT_UPLOAD_BYTES,
+    create_upload_sas,
+    THUMBNAIL_MEDIA_TYPES,
+    delete_uploaded_blob,
+    generate_blob_thumbnail,
+    generate_blob_video_poster,
+    get_uploaded_blob_properties,
+    is_user_blob_name,
+    read_blob_head,
+    sniff_media_type,
+)
+from core.database import db, timeline_read_db, timeline_read_session
+from core.deps import get_current_user_id
+from core.embeddings import (
+    EMBEDDING_DIM,
+    embed_memories,
+    rebuild_user_index,
+    vector_from_binary,
+)
+from core.export import export_filename, iter_memories_ndjson, iter_memories_zip
+from core.indexes import TIMELINE_SUMMARY_FIELDS
+from core.llm import OPENAI_DEPLOYMENT, get_openai_async_client
+from core.media_derivatives import find_media_derivatives, record_media_derivatives
+from core.render_scheduler import RenderQueueFull, get_render_scheduler
+from core.resilience import without_deadline
 from core.reluminations import (
+    RELUMINATION_OUTPUT_DIR,
     generate_relumination_style1,
     check_and_consume_relumination_quota,
+    discard_relumination_output,
+    hls_master_path,
+    refund_relumination_quota,
 )
 
-from models.memory import MemoryCreate, MemoryPublic
+from core.phash import find_and_record_near_duplicates, remove_media_hashes
+from core.user_stats import (
+    record_memories_created,
+    record_memory_deleted,
+    record_relumination,
+)
+from core.video_probe import extract_poster_frame, poster_timestamp, probe_video
+from core.search import (
+    build_search_pipeline,
+    build_tag_facet_pipeline,
+    decode_search_cursor,
+    encode_search_cursor,
+)
+from core.serialization import TrustedJSONResponse
+from core.sync import (
+    after_cursor,
+    decode_sync_token,
+    encode_sync_token,
+    is_token_expired,
+    overlap_low_water,
+    rewind_cursor,
+)
+from core.vector_index import get_user_index
+from core.timeline_version import (
+    bump_timeline_version,
+    get_timeline_version,
+    etag_matches,
+    make_etag,
+)
+from core.vision import analyze_image_url
+
+from models.memory import (
+    AccessibilityBatchRequest,
+    MemoryBulkCreateResponse,
+    MemoryCreate,
+    MemoryPublic,
+    MemorySearchResponse,
+    SimilarMemory,
+    MemorySummary,
+    MemorySyncResponse,
+    TagCount,
+)
+from models.upload import UploadCompleteRequest, UploadUrlRequest, UploadUrlResponse
 
 router = APIRouter()
 
-API_BASE = "http://localhost:8000"  # usado para URLs absolutas no retorno
-
+logger = logging.getLogger(__name__)
 
-# -----------------------------
-# AUTH HELPERS
-# -----------------------------
-def get_current_user_id(authorization: str = Header(...)) -> str:
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token ausente ou inválido.",
-        )
-    token = authorization.split(" ", 1)[1]
-    try:
-        return decode_access_token(token)
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token inválido ou expirado.",
-        )
+API_BASE = "http://localhost:8000"  # usado para URLs absolutas no retorno
 
 
 # -----------------------------
@@ -65,8 +131,131 @@ async def upload_file(
         f.write(contents)
 
     media_url = f"{API_BASE}/uploads/{filename}"
+    content_type = file.content_type or ""
+
+    result = {"media_url": media_url, "phash": None, "near_duplicates": []}
+    if content_type.startswith("image/"):
+        result["media_type"] = "image"
+        dup = await find_and_record_near_duplicates(db, user_id, contents, media_url)
+        if dup:
+            result.update(dup)
+        await record_media_derivatives(db, user_id, media_url, "image")
+    elif content_type.startswith("video/"):
+        result["media_type"] = "video"
+        result.update(await run_in_threadpool(_probe_uploaded_video, filepath))
+        # Guardado no servidor: POST /memories/ copia daqui pela media_url
+        await record_media_derivatives(
+            db, user_id, media_url, "video", result["poster_url"], result["video_metadata"]
+        )
 
-    return {"media_url": media_url}
+    return result
+
+
+def _probe_uploaded_video(filepath: str) -> dict:
+    """
+    Metadados + pôster (uploads/<arquivo>.poster.jpg) de um vídeo recém-salvo.
+    Vídeo ilegível não derruba o upload: volta sem pôster nem metadados.
+    """
+    try:
+        meta = probe_video(filepath)
+        poster_path = f"{os.path.splitext(filepath)[0]}.poster.jpg"
+        extract_poster_frame(filepath, poster_path, poster_timestamp(meta["duration"]))
+    except (ValueError, RuntimeError, OSError, subprocess.TimeoutExpired) as e:
+        logger.warning("Falha ao processar vídeo %s: %s", filepath, e)
+        return {"poster_url": None, "video_metadata": None}
+
+    return {
+        "poster_url": f"{API_BASE}/uploads/{os.path.basename(poster_path)}",
+        "video_metadata": meta,
+    }
+
+
+# -----------------------------
+# UPLOAD DIRETO (SAS -> Blob)
+# -----------------------------
+@router.post("/upload-url", response_model=UploadUrlResponse)
+async def create_upload_url(
+    data: UploadUrlRequest,
+    user_id: str = Depends(get_current_user_id),
+):
+    if not data.content_type.startswith(("image/", "video/")):
+        raise HTTPException(400, "Tipo de arquivo não suportado.")
+
+    try:
+        sas = create_upload_sas(user_id, data.filename)
+    except RuntimeError as e:
+        raise HTTPException(503, str(e))
+
+    return UploadUrlResponse(**sas)
+
+
+@router.post("/upload-complete")
+async def complete_upload(
+    data: UploadCompleteRequest,
+    user_id: str = Depends(get_current_user_id),
+):
+    if not is_user_blob_name(user_id, data.blob_name):
+        raise HTTPException(403, "Blob não pertence a este usuário.")
+
+    props = await run_in_threadpool(get_uploaded_blob_properties, data.blob_name)
+    if props is None:
+        raise HTTPException(404, "Upload não encontrado no Blob.")
+
+    if props["size"] > MAX_DIRECT_UPLOAD_BYTES:
+        await run_in_threadpool(delete_uploaded_blob, data.blob_name)
+        raise HTTPException(413, "Arquivo excede o tamanho máximo permitido.")
+
+    # O content-type do blob é o que o cliente declarou: confere os bytes
+    head = await run_in_threadpool(read_blob_head, data.blob_name)
+    media_type = sniff_media_type(head)
+    if media_type is None:
+        await run_in_threadpool(delete_uploaded_blob, data.blob_name)
+        raise HTTPException(415, "Tipo de arquivo não suportado.")
+
+    blob_url = props["url"]
+    result = {"blob": blob_url, "media_type": media_type, "vision": None, "thumbnail_url": None}
+    degraded = []
+
+    if media_type.startswith("image/"):
+        # Vision e miniatura em paralelo; a URL da miniatura só volta se
+        # ela foi gravada (HEIC/AVIF: o Pillow não decodifica, fica sem)
+        thumbnail = None
+        if media_type in THUMBNAIL_MEDIA_TYPES:
+            thumbnail = asyncio.ensure_future(
+                run_in_threadpool(generate_blob_thumbnail, data.blob_name)
+            )
+        result["vision"] = await run_in_threadpool(analyze_image_url, blob_url)
+        if "error" in result["vision"]:
+            degraded.append("vision")
+        if thumbnail is not None:
+            try:
+                result["thumbnail_url"] = await thumbnail
+            except Exception as e:
+                logger.warning("Miniatura não gerada para %s: %s", data.blob_name, e)
+                degraded.append("thumbnail")
+    else:
+        # Vídeo: metadados + pôster (mesmo caminho do /upload-file)
+        try:
+            derived = await run_in_threadpool(generate_blob_video_poster, data.blob_name)
+        except (ValueError, RuntimeError, OSError, subprocess.TimeoutExpired) as e:
+            logger.warning("Falha ao processar vídeo %s: %s", data.blob_name, e)
+            derived = {"poster_url": None, "video_metadata": None}
+            degraded.append("poster")
+        result.update(derived)
+        result["thumbnail_url"] = derived["poster_url"]
+
+    await record_media_derivatives(
+        db,
+        user_id,
+        blob_url,
+        media_type.split("/", 1)[0],
+        result.get("poster_url"),
+        result.get("video_metadata"),
+    )
+
+    if degraded:
+        result["degraded"] = degraded
+    return result
 
 
 # -----------------------------
@@ -79,67 +268,531 @@ def _doc_to_memory(doc) -> MemoryPublic:
         main_caption=doc.get("main_caption", ""),
         media_url=doc.get("media_url"),
         tags=doc.get("tags", []),
+        media_type=doc.get("media_type"),
+        poster_url=doc.get("poster_url"),
+        video_metadata=doc.get("video_metadata"),
         alt_text=doc.get("alt_text"),
         short_description=doc.get("short_description"),
         long_description=doc.get("long_description"),
         created_at=doc["created_at"],
         relumination_url=doc.get("relumination_url"),
+        relumination_mp4_url=doc.get("relumination_mp4_url"),
         relumination_style=doc.get("relumination_style"),
     )
 
 
-# -----------------------------
-# CRUD MEMÓRIAS
-# -----------------------------
-@router.post("/", response_model=MemoryPublic, status_code=201)
-async def create_memory(
+def _doc_to_memory_dict(doc) -> dict:
+    """
+    Caminho rápido: mesmos campos de MemoryPublic, sem validação pydantic.
+    Usado apenas para documentos lidos do nosso próprio banco.
+    """
+    return {
+        "main_caption": doc.get("main_caption", ""),
+        "media_url": doc.get("media_url"),
+        "tags": doc.get("tags", []),
+        "media_type": doc.get("media_type"),
+        "poster_url": doc.get("poster_url"),
+        "video_metadata": doc.get("video_metadata"),
+        "alt_text": doc.get("alt_text"),
+        "short_description": doc.get("short_description"),
+        "long_description": doc.get("long_description"),
+        "id": str(doc["_id"]),
+        "user_id": str(doc["user_id"]),
+        "created_at": doc["created_at"],
+        "relumination_url": doc.get("relumination_url"),
+        "relumination_mp4_url": doc.get("relumination_mp4_url"),
+        "relumination_style": doc.get("relumination_style"),
+    }
+
+
+SUMMARY_PROJECTION = {"_id": 1, "user_id": 1, **{f: 1 for f in TIMELINE_SUMMARY_FIELDS}}
+
+
+def _doc_to_summary_dict(doc) -> dict:
+    return {
+        "id": str(doc["_id"]),
+        "user_id": str(doc["user_id"]),
+        "main_caption": doc.get("main_caption", ""),
+        "media_url": doc.get("media_url"),
+        "poster_url": doc.get("poster_url"),
+        "created_at": doc["created_at"],
+        "relumination_url": doc.get("relumination_url"),
+    }
+
+
+def _new_memory_doc(
     memory_in: MemoryCreate,
-    user_id: str = Depends(get_current_user_id),
-):
-    doc = {
+    user_id: str,
+    now: datetime,
+    derived: Optional[dict] = None,
+) -> dict:
+    """
+    derived: registro de media_derivatives da media_url (ou None).
+    """
+    derived = derived or {}
+    return {
         "user_id": ObjectId(user_id),
         "main_caption": memory_in.main_caption,
         "media_url": memory_in.media_url,
         "tags": memory_in.tags or [],
+        "media_type": derived.get("media_type"),
+        "poster_url": derived.get("poster_url"),
+        "video_metadata": derived.get("video_metadata"),
         "alt_text": memory_in.alt_text,
         "short_description": memory_in.short_description,
         "long_description": memory_in.long_description,
-        "created_at": datetime.utcnow(),
+        "created_at": now,
+        "updated_at": now,
         "relumination_url": None,
+        "relumination_mp4_url": None,
         "relumination_style": None,
     }
 
+
+# -----------------------------
+# CRUD MEMÓRIAS
+# -----------------------------
+@router.post("/", response_model=MemoryPublic, status_code=201)
+async def create_memory(
+    memory_in: MemoryCreate,
+    background_tasks: BackgroundTasks,
+    user_id: str = Depends(get_current_user_id),
+):
+    derived = await find_media_derivatives(db, user_id, [memory_in.media_url])
+    doc = _new_memory_doc(
+        memory_in, user_id, datetime.utcnow(), derived.get(memory_in.media_url)
+    )
+
     result = await db.timeline_items.insert_one(doc)
+    await bump_timeline_version(db, user_id)
+    await record_memories_created(db, user_id, [doc])
     doc["_id"] = result.inserted_id
+
+    if _has_accessibility_text(doc):
+        background_tasks.add_task(_run_embedding, user_id, [doc])
+
     return _doc_to_memory(doc)
 
 
-@router.get("/", response_model=List[MemoryPublic])
-async def list_memories(user_id: str = Depends(get_current_user_id)):
-    cursor = db.timeline_items.find(
-        {"user_id": ObjectId(user_id)}
-    ).sort("created_at", -1)
+MAX_BULK_CREATE = 500
+
+
+def _has_accessibility_text(doc: dict) -> bool:
+    return bool(doc.get("alt_text") or doc.get("short_description") or doc.get("long_description"))
+
+
+async def _run_embedding(user_id: str, docs: list) -> None:
+    try:
+        with without_deadline():
+            await embed_memories(db, user_id, docs)
+    except Exception:
+        logger.exception("Falha ao gerar embeddings (user %s)", user_id)
+
+
+async def _run_enrichment(user_id: str, docs: list) -> None:
+    try:
+        with without_deadline():
+            updated = await enrich_memories(
+                db, get_openai_async_client(), OPENAI_DEPLOYMENT, docs
+            )
+        if not updated:
+            return
+        await bump_timeline_version(db, user_id)
+
+        # Descrições novas → embeddings novos
+        enriched = await db.timeline_items.find(
+            {"_id": {"$in": [d["_id"] for d in docs]}, "alt_text": {"$ne": None}}
+        ).to_list(length=len(docs))
+    except Exception:
+        logger.exception("Falha no enriquecimento de acessibilidade (user %s)", user_id)
+        return
+    await _run_embedding(user_id, enriched)
 
-    results = []
+
+@router.post("/bulk", response_model=MemoryBulkCreateResponse, status_code=201)
+async def bulk_create_memories(
+    background_tasks: BackgroundTasks,
+    memories_in: List[MemoryCreate] = Body(..., min_length=1, max_length=MAX_BULK_CREATE),
+    enrich: bool = Query(False),
+    user_id: str = Depends(get_current_user_id),
+):
+    """
+    Criação em lote (importações). insert_many com ordered=False: um item
+    inválido não impede os demais. Com enrich=true, as memórias sem
+    acessibilidade entram no job de enriquecimento em background.
+    """
+    now = datetime.utcnow()
+    derived = await find_media_derivatives(db, user_id, (m.media_url for m in memories_in))
+    docs = [_new_memory_doc(m, user_id, now, derived.get(m.media_url)) for m in memories_in]
+
+    failed = {}
+    try:
+        await db.timeline_items.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        for err in e.details.get("writeErrors", []):
+            failed[err["index"]] = err.get("errmsg", "Erro ao inserir.")
+
+    inserted = [d for i, d in enumerate(docs) if i not in failed]
+    if inserted:
+        await bump_timeline_version(db, user_id)
+        await record_memories_created(db, user_id, inserted)
+
+    to_enrich = []
+    if enrich:
+        to_enrich = [d for d in inserted if not d.get("alt_text")]
+        if to_enrich:
+            background_tasks.add_task(_run_enrichment, user_id, to_enrich)
+
+    # As enriquecidas ganham embedding ao fim do enriquecimento
+    pending = {d["_id"] for d in to_enrich}
+    to_embed = [d for d in inserted if d["_id"] not in pending and _has_accessibility_text(d)]
+    if to_embed:
+        background_tasks.add_task(_run_embedding, user_id, to_embed)
+
+    return MemoryBulkCreateResponse(
+        inserted_ids=[str(d["_id"]) for d in inserted],
+        errors=[{"index": i, "message": msg} for i, msg in sorted(failed.items())],
+        enrichment_scheduled=len(to_enrich),
+    )
+
+
+@router.post("/accessibility/batch", status_code=202)
+async def batch_accessibility(
+    data: AccessibilityBatchRequest,
+    background_tasks: BackgroundTasks,
+    user_id: str = Depends(get_current_user_id),
+):
+    # Só as que continuam sem alt_text: o job não sobrescreve texto do usuário
+    query = {"user_id": ObjectId(user_id), "alt_text": {"$in": [None, ""]}}
+    if data.memory_ids:
+        try:
+            query["_id"] = {"$in": [ObjectId(m) for m in data.memory_ids]}
+        except (InvalidId, TypeError):
+            raise HTTPException(400, "ID inválido.")
+
+    docs = await db.timeline_items.find(
+        query,
+        {"main_caption": 1, "tags": 1, "user_id": 1},
+    ).to_list(length=data.limit)
+
+    if docs:
+        background_tasks.add_task(_run_enrichment, user_id, docs)
+
+    return {"scheduled": len(docs)}
+
+
+@router.post("/embeddings/batch", status_code=202)
+async def batch_embeddings(
+    background_tasks: BackgroundTasks,
+    limit: int = Query(500, ge=1, le=5000),
+    user_id: str = Depends(get_current_user_id),
+):
+    """
+    Gera embeddings das memórias do usuário que ainda não têm.
+    """
+    docs = await db.timeline_items.find(
+        {"user_id": ObjectId(user_id), "embedded_at": None},
+        {"main_caption": 1, "tags": 1, "alt_text": 1,
+         "short_description": 1, "long_description": 1},
+    ).to_list(length=limit)
+
+    if docs:
+        background_tasks.add_task(_run_embedding, user_id, docs)
+
+    return {"scheduled": len(docs)}
+
+
+CACHE_HEADERS = {"Cache-Control": "private, no-cache"}
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, **CACHE_HEADERS})
+
+
+@router.get("/", response_model=Union[List[MemoryPublic], List[MemorySummary]])
+async def list_memories(
+    view: Literal["full", "summary"] = Query("full"),
+    if_none_match: Optional[str] = Header(None),
+    user_id: str = Depends(get_current_user_id),
+):
+    if view == "summary":
+        projection, to_dict = SUMMARY_PROJECTION, _doc_to_summary_dict
+    else:
+        projection, to_dict = None, _doc_to_memory_dict
+
+    # Pode ler de um secundário (MONGO_TIMELINE_READ_PREFERENCE); a sessão
+    # causal garante que os itens são no mínimo tão novos quanto a versão.
+    reader = timeline_read_db()
+    async with timeline_read_session() as session:
+        # Versão lida ANTES da consulta: se algo mudar no meio, o próximo
+        # GET apenas recebe o corpo de novo (nunca um 304 desatualizado).
+        version = await get_timeline_version(reader, user_id, session=session)
+        etag = make_etag(user_id, version, view)
+        if etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+
+        cursor = reader.timeline_items.find(
+            {"user_id": ObjectId(user_id)},
+            projection,
+            session=session,
+        ).sort("created_at", -1)
+
+        results = []
+        async for doc in cursor:
+            results.append(to_dict(doc))
+    return TrustedJSONResponse(results, headers={"ETag": etag, **CACHE_HEADERS})
+
+
+@router.get("/sync", response_model=MemorySyncResponse)
+async def sync_memories(
+    token: Optional[str] = Query(None),
+    limit: int = Query(500, ge=1, le=2000),
+    user_id: str = Depends(get_current_user_id),
+):
+    """
+    Delta-sync: devolve apenas o que mudou desde `token`.
+    Sem token, devolve a timeline inteira (paginada por `limit`).
+    """
+    changed_cursor = deleted_cursor = low_water = None
+    if token:
+        try:
+            changed_cursor, deleted_cursor, issued_at, low_water = decode_sync_token(token)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+
+        if is_token_expired(issued_at):
+            return TrustedJSONResponse(
+                {
+                    "changed": [],
+                    "deleted": [],
+                    "sync_token": encode_sync_token(None, None),
+                    "has_more": False,
+                    "full_resync": True,
+                }
+            )
+
+    # Primeira página da rodada: fixa a janela de sobreposição
+    if low_water is None:
+        low_water = overlap_low_water()
+
+    uid = ObjectId(user_id)
+    sort = [("updated_at", 1), ("_id", 1)]
+
+    changed = []
+    cursor = db.timeline_items.find(
+        {"user_id": uid, **after_cursor("updated_at", changed_cursor)}
+    ).sort(sort).limit(limit)
     async for doc in cursor:
-        results.append(_doc_to_memory(doc))
-    return results
+        changed.append(_doc_to_memory_dict(doc))
+        changed_cursor = (doc["updated_at"], doc["_id"])
+
+    deleted = []
+    if token:
+        cursor = db.timeline_tombstones.find(
+            {"user_id": uid, **after_cursor("deleted_at", deleted_cursor)}
+        ).sort([("deleted_at", 1), ("_id", 1)]).limit(limit)
+        async for tomb in cursor:
+            deleted.append(str(tomb["memory_id"]))
+            deleted_cursor = (tomb["deleted_at"], tomb["_id"])
+    else:
+        # Sync inicial: tombstones anteriores a agora não interessam ao cliente.
+        last = await db.timeline_tombstones.find_one(
+            {"user_id": uid}, sort=[("deleted_at", -1), ("_id", -1)]
+        )
+        if last:
+            deleted_cursor = (last["deleted_at"], last["_id"])
+
+    has_more = len(changed) == limit or len(deleted) == limit
+    if has_more:
+        # No meio da paginação o keyset é exato (sem reenvio, sem laço)
+        sync_token = encode_sync_token(changed_cursor, deleted_cursor, low_water)
+    else:
+        sync_token = encode_sync_token(
+            rewind_cursor(changed_cursor, low_water),
+            rewind_cursor(deleted_cursor, low_water),
+        )
+
+    return TrustedJSONResponse(
+        {
+            "changed": changed,
+            "deleted": deleted,
+            "sync_token": sync_token,
+            "has_more": has_more,
+            "full_resync": False,
+        }
+    )
+
+
+@router.get("/search", response_model=MemorySearchResponse)
+async def search_memories(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    user_id: str = Depends(get_current_user_id),
+):
+    after = None
+    if cursor:
+        try:
+            after = decode_search_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+
+    docs = await timeline_read_db().timeline_items.aggregate(
+        build_search_pipeline(user_id, q, limit, after)
+    ).to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_search_cursor(last["_score"], last["_id"])
+
+    return TrustedJSONResponse(
+        {
+            "items": [_doc_to_memory_dict(d) for d in docs],
+            "next_cursor": next_cursor,
+        }
+    )
+
+
+@router.get("/tags", response_model=List[TagCount])
+async def tag_facets(
+    limit: int = Query(50, ge=1, le=500),
+    user_id: str = Depends(get_current_user_id),
+):
+    rows = await timeline_read_db().timeline_items.aggregate(
+        build_tag_facet_pipeline(user_id, limit)
+    ).to_list(length=limit)
+    return TrustedJSONResponse([{"tag": r["_id"], "count": r["count"]} for r in rows])
+
+
+@router.get("/export")
+async def export_memories(
+    format: Literal["ndjson", "zip"] = Query("ndjson"),
+    user_id: str = Depends(get_current_user_id),
+):
+    """
+    Exporta as memórias do usuário em streaming (NDJSON ou ZIP com mídias).
+    """
+    if format == "zip":
+        body = iter_memories_zip(timeline_read_db(), user_id, _doc_to_memory_dict)
+        media_type = "application/zip"
+    else:
+        body = iter_memories_ndjson(timeline_read_db(), user_id, _doc_to_memory_dict)
+        media_type = "application/x-ndjson"
+
+    filename = export_filename(user_id, format)
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 
 @router.get("/{memory_id}", response_model=MemoryPublic)
-async def get_memory(memory_id: str, user_id: str = Depends(get_current_user_id)):
+async def get_memory(
+    memory_id: str,
+    if_none_match: Optional[str] = Header(None),
+    user_id: str = Depends(get_current_user_id),
+):
     try:
         oid = ObjectId(memory_id)
     except:
         raise HTTPException(400, "ID inválido.")
 
+    version = await get_timeline_version(db, user_id)
+    etag = make_etag(user_id, version, memory_id)
+    if etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+
     doc = await db.timeline_items.find_one(
         {"_id": oid, "user_id": ObjectId(user_id)}
     )
     if not doc:
         raise HTTPException(404, "Memória não encontrada.")
 
-    return _doc_to_memory(doc)
+    return TrustedJSONResponse(
+        _doc_to_memory_dict(doc),
+        headers={"ETag": etag, **CACHE_HEADERS},
+    )
+
+
+@router.get("/{memory_id}/similar", response_model=List[SimilarMemory])
+async def similar_memories(
+    memory_id: str,
+    k: int = Query(10, ge=1, le=50),
+    user_id: str = Depends(get_current_user_id),
+):
+    """
+    "Memórias parecidas com esta": top-k por cosseno no índice vetorial local.
+    """
+    try:
+        oid = ObjectId(memory_id)
+    except:
+        raise HTTPException(400, "ID inválido.")
+
+    emb = await db.memory_embeddings.find_one(
+        {"_id": oid, "user_id": ObjectId(user_id)},
+    )
+    if not emb:
+        exists = await db.timeline_items.find_one(
+            {"_id": oid, "user_id": ObjectId(user_id)}, {"_id": 1}
+        )
+        if not exists:
+            raise HTTPException(404, "Memória não encontrada.")
+        raise HTTPException(409, "Memória ainda sem embedding.")
+
+    query = vector_from_binary(emb["vector"])
+    if query.shape[0] != EMBEDDING_DIM:
+        raise HTTPException(409, "Embedding com dimensão desatualizada.")
+
+    index = get_user_index(user_id, EMBEDDING_DIM)
+    if len(index) == 0:
+        await rebuild_user_index(db, user_id)
+
+    hits = index.search(query, k=k, exclude={memory_id})
+    if not hits:
+        return TrustedJSONResponse([])
+
+    docs = await db.timeline_items.find(
+        {"_id": {"$in": [ObjectId(h[0]) for h in hits]}, "user_id": ObjectId(user_id)},
+    ).to_list(length=len(hits))
+    by_id = {str(d["_id"]): d for d in docs}
+
+    return TrustedJSONResponse(
+        [
+            {"memory": _doc_to_memory_dict(by_id[mid]), "score": score}
+            for mid, score in hits
+            if mid in by_id  # apagada entre a busca e o find
+        ]
+    )
+
+
+@router.delete("/{memory_id}", status_code=204)
+async def delete_memory(memory_id: str, user_id: str = Depends(get_current_user_id)):
+    try:
+        oid = ObjectId(memory_id)
+    except:
+        raise HTTPException(400, "ID inválido.")
+
+    uid = ObjectId(user_id)
+    deleted = await db.timeline_items.find_one_and_delete(
+        {"_id": oid, "user_id": uid},
+        projection={"tags": 1, "relumination_url": 1, "media_url": 1},
+    )
+    if deleted is None:
+        raise HTTPException(404, "Memória não encontrada.")
+
+    # Tombstone para o delta-sync dos outros dispositivos
+    await db.timeline_tombstones.insert_one(
+        {"user_id": uid, "memory_id": oid, "deleted_at": datetime.utcnow()}
+    )
+    await db.memory_embeddings.delete_one({"_id": oid})
+    await run_in_threadpool(get_user_index(user_id, EMBEDDING_DIM).remove, [memory_id])
+    await remove_media_hashes(db, user_id, deleted.get("media_url"))
+    await bump_timeline_version(db, user_id)
+    await record_memory_deleted(db, user_id, deleted)
+    return Response(status_code=204)
 
 
 # -----------------------------
@@ -179,11 +832,12 @@ async def create_relumination_for_memory(
     ):
         raise HTTPException(409, "Esta memória já possui uma Reluminação.")
 
-    # cota/créditos
-    await check_and_consume_relumination_quota(user_doc, db)
-
-    # coleta dados
+    # coleta dados (vídeo: o pôster extraído no upload vira a imagem base)
     media_url = mem.get("media_url")
+    if mem.get("media_type") == "video":
+        media_url = mem.get("poster_url")
+        if not media_url:
+            raise HTTPException(400, "Vídeo sem pôster para a Reluminação.")
     if not media_url:
         raise HTTPException(400, "Memória sem mídia.")
 
@@ -196,21 +850,65 @@ async def create_relumination_for_memory(
 
     title = mem.get("main_caption") or "Um momento especial"
 
-    # gerar vídeo
-    video_path = generate_relumination_style1(media_url, narrative, title)
-    filename = os.path.basename(video_path)
+    # Admissão na fila de render ANTES de consumir cota/créditos
+    charge = None
+    try:
+        async with get_render_scheduler().admit(user_id, user_doc) as render_slot:
+            charge = await check_and_consume_relumination_quota(user_doc, db)
+
+            # gerar vídeo (thread dedicada, com teto de renders por nó)
+            # Cancelado com o render em andamento: o vídeo é apagado ao final
+            video_path = await render_slot.run(
+                generate_relumination_style1,
+                media_url,
+                narrative,
+                title,
+                on_abandoned=discard_relumination_output,
+            )
+    except RenderQueueFull as e:
+        # Recusa na admissão: nada foi debitado
+        retry_after = max(1, int(e.eta_seconds))
+        raise HTTPException(
+            429,
+            detail={
+                "message": "Fila de Reluminações cheia. Tente novamente em instantes.",
+                "reason": e.reason,
+                "eta_seconds": retry_after,
+            },
+            headers={"Retry-After": str(retry_after)},
+        )
+    except BaseException:
+        # Render falhou ou foi cancelado: devolve a cota. shield: o
+        # estorno termina mesmo se a requisição já estiver cancelada
+        if charge is not None:
+            await asyncio.shield(refund_relumination_quota(db, user_doc["_id"], charge))
+        raise
 
     # importante → sempre URL absoluta
-    public_url = f"{API_BASE}/media/reluminations/{filename}"
+    mp4_url = _relumination_public_url(video_path)
+
+    # Com HLS, relumination_url aponta para o master playlist (adaptativo);
+    # o MP4 faststart continua disponível para download/exportação
+    master_path = hls_master_path(video_path)
+    public_url = _relumination_public_url(master_path) if os.path.exists(master_path) else mp4_url
 
     await db.timeline_items.update_one(
         {"_id": mem["_id"]},
         {
             "$set": {
                 "relumination_url": public_url,
+                "relumination_mp4_url": mp4_url,
                 "relumination_style": 1,
+                "updated_at": datetime.utcnow(),
             }
         },
     )
+    await bump_timeline_version(db, user_id)
+    await record_relumination(db, user_id, first_for_memory=not mem.get("relumination_url"))
+
+    return {"relumination_url": public_url, "relumination_mp4_url": mp4_url, "style": 1}
+
 
-    return {"relumination_url": public_url, "style": 1}
+def _relumination_public_url(path: str) -> str:
+    relative = os.path.relpath(path, RELUMINATION_OUTPUT_DIR).replace(os.sep, "/")
+    return f"{API_BASE}/media/reluminations/{relative}"
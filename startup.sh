@@ -10,9 +10,19 @@ cd /home/site/wwwroot
 echo "Conteúdo de /home/site/wwwroot:"
 ls -R
 
+# Métricas Prometheus agregadas entre os workers (ver gunicorn.conf.py)
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/relluna-metrics}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+# GUNICORN_PRELOAD=1: importa o app e faz o warmup no master antes do fork
+# (WARMUP_RENDER=1 também pré-carrega o moviepy). Ver gunicorn.conf.py.
+export GUNICORN_PRELOAD=${GUNICORN_PRELOAD:-0}
+
 # Sobe a API FastAPI usando Gunicorn + UvicornWorker
 # OBS: o módulo é api.main:app (porque seu main.py está dentro da pasta api)
 gunicorn -k uvicorn.workers.UvicornWorker \
+  -c gunicorn.conf.py \
   -w 4 \
   -b 0.0.0.0:8000 \
   api.main:app